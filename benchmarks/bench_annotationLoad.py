@@ -0,0 +1,78 @@
+#!/usr/bin/python
+
+'''
+bench_annotationLoad.py
+
+Compares the old per-scaffold re-parsing of the gene annotation in
+cisRegion.hugeCisRegionCallingBehemoth with the single pass annotationLoad on
+a synthetic fragmented assembly (50,000 scaffolds by default).
+
+The per-scaffold approach is quadratic so it is only timed on a sample of
+scaffolds and extrapolated to the whole annotation.
+'''
+
+#import libraries
+import os
+import sys
+import csv
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'workflow', 'scripts'))
+
+import cisRegion
+from syntheticData import syntheticAnnotation
+
+
+def perScaffoldParse(BED_IN, chrom):
+    '''
+    Reproduces the gene library construction that used to happen for every
+    scaffold
+    '''
+    gene_dict = {}
+    with open(BED_IN) as GENEBED_archive:
+        for gene in csv.reader(GENEBED_archive, delimiter = '\t'):
+            if gene[0][0] != '#':
+                if gene[0] == chrom:
+                    gene_dict[gene[3]] = [gene[0], gene[1], gene[2], gene[5], gene[3]]
+    return(gene_dict)
+
+def main(n_scaffolds, genes_per_scaffold, sample):
+    '''
+    Time both approaches and report the extrapolated speedup
+    '''
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bed_path = os.path.join(tmp_dir, 'synthetic.bed')
+        syntheticAnnotation(bed_path, n_scaffolds, genes_per_scaffold)
+
+        t0 = time.perf_counter()
+        gene_annotation = cisRegion.annotationLoad(bed_path)
+        for chrom in sorted(cisRegion.scaffoldLister(gene_annotation)):
+            gene_dict = {gene_id: list(gene) for gene_id, gene in gene_annotation[chrom].items()}
+        single_pass = time.perf_counter() - t0
+
+        chroms = sorted(gene_annotation)[:sample]
+        t0 = time.perf_counter()
+        for chrom in chroms:
+            perScaffoldParse(bed_path, chrom)
+        per_scaffold = (time.perf_counter() - t0) / len(chroms) * n_scaffolds
+
+    print('scaffolds:\t'         + str(n_scaffolds))
+    print('genes:\t\t'           + str(n_scaffolds * genes_per_scaffold))
+    print('single pass:\t'       + '{:.2f}'.format(single_pass) + ' s')
+    print('per scaffold:\t'      + '{:.2f}'.format(per_scaffold) + ' s (extrapolated from ' + str(len(chroms)) + ' scaffolds)')
+    print('speedup:\t'           + '{:.0f}'.format(per_scaffold / single_pass) + 'x')
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('--scaffolds', type=int, default=50000, help='number of synthetic scaffolds')
+parser.add_argument('--genes',     type=int, default=2,     help='number of genes per scaffold')
+parser.add_argument('--sample',    type=int, default=20,    help='number of scaffolds to time the per scaffold parse on')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    main(args.scaffolds, args.genes, args.sample)
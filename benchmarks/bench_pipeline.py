@@ -0,0 +1,206 @@
+#!/usr/bin/python
+
+'''
+bench_pipeline.py
+
+Times the main stages of the pipeline on seeded synthetic data and records
+the results in a JSON history, so a slower or hungrier stage shows up when
+compared with the last run at the same settings.
+
+Each stage is timed over several repeats, keeping the fastest, and run once
+more under tracemalloc for its peak memory allocated. The stages are:
+
+    genomeLoad        loading the single line genome into a dictionary
+    scaffoldLengths   finding the scaffold lengths from the fasta index, with
+                      chromLimitFind
+    behemoth          hugeCisRegionCallingBehemoth over the annotation
+    parseBEDinput     cisRegion_displot.parseBEDinput of the cis regions
+    GTRDdecode        trackDBparser and ensemblIDextract of GTRD_parse_bigBed
+'''
+
+#import libraries
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import subprocess
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'workflow', 'scripts'))
+
+import cisRegion
+import cisRegion_displot
+import GTRD_parse_bigBed
+from fastaIndex import scaffoldLengths
+from syntheticData import syntheticAnnotation, syntheticGenome, syntheticTrackDB
+
+HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'history.json')
+
+# smallest changes in time and memory reported as regressions
+MIN_SECONDS = 0.05
+MIN_MB      = 1
+
+
+def measure(function, repeats, setup = None):
+    '''
+    Returns the fastest time in seconds of repeats calls of function, and the
+    peak memory in MB allocated by one more call. setup is called before each
+    call and its result passed to function
+    '''
+    times = []
+    for repeat in range(repeats):
+        argument = setup() if setup else None
+        t0 = time.perf_counter()
+        function(argument)
+        times.append(time.perf_counter() - t0)
+
+    argument = setup() if setup else None
+    tracemalloc.start()
+    function(argument)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return({'seconds': min(times), 'peak_mb': peak / 1e6})
+
+def gitCommit():
+    '''
+    Short hash of the commit benchmarked, None outside a git checkout
+    '''
+    try:
+        return(subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd = os.path.dirname(os.path.abspath(__file__)),
+                              capture_output = True, text = True, check = True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return(None)
+
+def runBenchmarks(settings, tmp_dir):
+    '''
+    Generates the synthetic data of the settings given and measures every stage
+    '''
+    bed_path   = os.path.join(tmp_dir, 'synthetic.bed')
+    fasta_path = os.path.join(tmp_dir, 'synthetic.fa')
+    tdb_path   = os.path.join(tmp_dir, 'trackDb.txt')
+    ref_path   = os.path.join(tmp_dir, 'reference.bed')
+
+    scaff_lengths = syntheticAnnotation(bed_path, settings['scaffolds'], settings['genes'], settings['seed'],
+                                        settings['overlap_rate'], settings['bidirectional_rate'], settings['duplicate_start_rate'])
+    syntheticGenome(fasta_path, scaff_lengths, settings['seed'])
+    syntheticTrackDB(tdb_path, ref_path, settings['tfs'], settings['seed'])
+
+    gene_annotation = cisRegion.annotationLoad(bed_path)
+    scaffold_set    = cisRegion.scaffoldLister(gene_annotation)
+    repeats         = settings['repeats']
+
+    def callDir():
+        # an empty directory for the outputs of each call
+        call_dir = os.path.join(tmp_dir, 'calls')
+        shutil.rmtree(call_dir, ignore_errors = True)
+        os.mkdir(call_dir)
+        return(call_dir)
+
+    def indexFree():
+        # time building the index rather than loading it
+        if os.path.isfile(fasta_path + '.fai'):
+            os.remove(fasta_path + '.fai')
+
+    results = {}
+    results['genomeLoad']      = measure(lambda _: cisRegion.genomeLoad(fasta_path), repeats)
+    results['scaffoldLengths'] = measure(lambda _: cisRegion.chromLimitFind(scaffold_set, scaffoldLengths(fasta_path)), repeats, indexFree)
+    results['behemoth']        = measure(lambda call_dir: cisRegion.hugeCisRegionCallingBehemoth(scaffold_set, gene_annotation, call_dir, scaff_lengths, settings['window']), repeats, callDir)
+
+    cis_bed = os.path.join(callDir(), 'cisRegions.bed')
+    cisRegion.hugeCisRegionCallingBehemoth(scaffold_set, gene_annotation, os.path.dirname(cis_bed), scaff_lengths, settings['window'])
+    results['parseBEDinput']   = measure(lambda _: cisRegion_displot.parseBEDinput(cis_bed), repeats)
+    results['GTRDdecode']      = measure(lambda _: (GTRD_parse_bigBed.trackDBparser(tdb_path), GTRD_parse_bigBed.ensemblIDextract(ref_path)), repeats)
+    return(results)
+
+def historyLoad(HISTORY_IN):
+    '''
+    Reads the list of previous runs, empty if there are none yet
+    '''
+    if not os.path.isfile(HISTORY_IN):
+        return([])
+    with open(HISTORY_IN) as history_file:
+        return(json.load(history_file))
+
+def historyWrite(history, HISTORY_OUT):
+    '''
+    Writes the list of runs via a temporary file, so an interrupted write
+    never loses the history
+    '''
+    tmp_path = HISTORY_OUT + '.tmp'
+    with open(tmp_path, 'w') as history_file:
+        json.dump(history, history_file, indent = 1)
+    os.replace(tmp_path, HISTORY_OUT)
+
+def compare(results, previous, TOLERANCE):
+    '''
+    Prints each stage against the last run at the same settings, returning the
+    stages slower or using more memory by more than the tolerance. Differences
+    under MIN_SECONDS or MIN_MB are timer and allocator noise, not regressions
+    '''
+    regressions = []
+    for stage, result in results.items():
+        line = stage.ljust(16) + '{:9.3f} s {:9.1f} MB'.format(result['seconds'], result['peak_mb'])
+        if previous and stage in previous['results']:
+            before = previous['results'][stage]
+            time_ratio = result['seconds'] / max(before['seconds'], 1e-9)
+            mem_ratio  = result['peak_mb'] / max(before['peak_mb'], 1e-9)
+            line = line + '   {:5.2f}x time {:5.2f}x memory vs {}'.format(time_ratio, mem_ratio, previous['commit'])
+            slower = time_ratio > 1 + TOLERANCE and result['seconds'] - before['seconds'] > MIN_SECONDS
+            larger = mem_ratio > 1 + TOLERANCE and result['peak_mb'] - before['peak_mb'] > MIN_MB
+            if slower or larger:
+                regressions.append(stage)
+                line = line + '   REGRESSION'
+        print(line)
+    return(regressions)
+
+def main(settings, HISTORY_OUT = HISTORY, TOLERANCE = 0.2, RECORD = True):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        results = runBenchmarks(settings, tmp_dir)
+
+    history  = historyLoad(HISTORY_OUT)
+    previous = ([run for run in history if run['settings'] == settings] or [None])[-1]
+    regressions = compare(results, previous, TOLERANCE)
+
+    if RECORD:
+        history.append({'date':     datetime.datetime.now().isoformat(timespec = 'seconds'),
+                        'commit':   gitCommit(),
+                        'python':   platform.python_version(),
+                        'machine':  platform.machine(),
+                        'settings': settings,
+                        'results':  results})
+        historyWrite(history, HISTORY_OUT)
+    return(regressions)
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('--scaffolds', type=int, default=500,  help='number of synthetic scaffolds')
+parser.add_argument('--genes',     type=int, default=20,   help='number of genes per scaffold')
+parser.add_argument('--tfs',       type=int, default=1000, help='number of transcription factors in the synthetic GTRD schema')
+parser.add_argument('--window',    type=int, default=5000, help='nucleotide length of the cis regions called')
+parser.add_argument('--seed',      type=int, default=1,    help='seed for the synthetic data')
+parser.add_argument('--overlap-rate',         type=float, default=0.05, help='fraction of genes starting within the previous gene')
+parser.add_argument('--bidirectional-rate',   type=float, default=0.1,  help='fraction of genes following a - strand gene to start head to head with it')
+parser.add_argument('--duplicate-start-rate', type=float, default=0.01, help='fraction of genes sharing the start and strand of the previous gene')
+parser.add_argument('--repeats',   type=int, default=3,    help='number of timed repeats of each stage, the fastest kept')
+parser.add_argument('--history',   type=str, default=HISTORY, help='path of the JSON history of runs')
+parser.add_argument('--tolerance', type=float, default=0.2, help='fractional slow down or memory growth reported as a regression')
+parser.add_argument('--no-record', action='store_true', help='compare with the history without adding this run to it')
+parser.add_argument('--fail-on-regression', action='store_true', help='exit with status 1 if any stage regressed')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    settings = {'scaffolds': args.scaffolds, 'genes': args.genes, 'tfs': args.tfs, 'window': args.window, 'seed': args.seed,
+                'overlap_rate': args.overlap_rate, 'bidirectional_rate': args.bidirectional_rate,
+                'duplicate_start_rate': args.duplicate_start_rate, 'repeats': args.repeats}
+
+    regressions = main(settings, args.history, args.tolerance, not args.no_record)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
@@ -0,0 +1,115 @@
+#!/usr/bin/python
+
+'''
+syntheticData.py
+
+Generate seeded synthetic genomes and annotations in the custom 7 column .bed
+format used by EMotEP, for benchmarking the pipeline scripts without real
+genomes.
+
+Besides the number of scaffolds and genes per scaffold, the rates of the gene
+arrangements the cis region calling has to resolve can be set: genes
+overlapping the previous gene, head to head bidirectional pairs, and genes
+sharing the start and strand of the previous gene.
+'''
+
+#import libraries
+import random
+import argparse
+
+import numpy as np
+
+
+def syntheticAnnotation(BED_OUT, n_scaffolds, genes_per_scaffold, seed = 1, OVERLAP_RATE = 0, BIDIRECTIONAL_RATE = 0, DUPLICATE_START_RATE = 0):
+    '''
+    Writes an annotation of genes on randomly sized scaffolds, non-overlapping
+    unless the rates of overlapping genes, bidirectional pairs or duplicate
+    starts are given, returns a dictionary of the scaffold lengths used
+    '''
+    rng = random.Random(seed)
+    scaff_lengths = {}
+    with open(BED_OUT, 'w') as out_file:
+        for scaff in range(n_scaffolds):
+            scaffold = 'scaffold_' + str(scaff)
+            position = rng.randint(1, 10000)
+            previous = None
+            for gene in range(genes_per_scaffold):
+                if previous and DUPLICATE_START_RATE and rng.random() < DUPLICATE_START_RATE:
+                    # share the start and strand of the previous gene
+                    start  = previous[0]
+                    stop   = start + rng.randint(300, 20000)
+                    strand = previous[2]
+                elif previous and OVERLAP_RATE and rng.random() < OVERLAP_RATE:
+                    # start within the previous gene
+                    start  = rng.randint(previous[0] + 1, previous[1] - 1)
+                    stop   = start + rng.randint(300, 20000)
+                    strand = rng.choice('+-')
+                elif previous and previous[2] == '-' and BIDIRECTIONAL_RATE and rng.random() < BIDIRECTIONAL_RATE:
+                    # start on the + strand shortly after a - strand gene, head to head
+                    start  = previous[1] + rng.randint(50, 2000)
+                    stop   = start + rng.randint(300, 20000)
+                    strand = '+'
+                else:
+                    start  = position + rng.randint(100, 10000)
+                    stop   = start + rng.randint(300, 20000)
+                    strand = rng.choice('+-')
+                gene_id  = 'gene_' + str(scaff) + '_' + str(gene)
+                out_file.write('\t'.join([scaffold, str(start), str(stop), gene_id, '.', strand, gene_id]) + '\n')
+                previous = (start, stop, strand)
+                position = max(position, stop)
+            scaff_lengths[scaffold] = position + rng.randint(100, 10000)
+    return(scaff_lengths)
+
+def syntheticGenome(FASTA_OUT, scaff_lengths, seed = 1, N_RATE = 0.001):
+    '''
+    Writes random single line sequences of the scaffold lengths given, with
+    runs of N starting at N_RATE of positions, as sequencePrep.py would
+    '''
+    rng = np.random.default_rng(seed)
+    bases = np.frombuffer(b'ACGT', dtype=np.uint8)
+    with open(FASTA_OUT, 'wb') as out_file:
+        for scaffold, length in scaff_lengths.items():
+            sequence = bases[rng.integers(0, 4, length)]
+            run_starts = np.flatnonzero(rng.random(length) < N_RATE)
+            run_lengths = rng.integers(1, 100, len(run_starts))
+            in_run = np.zeros(length + 1, dtype=np.int64)
+            np.add.at(in_run, run_starts, 1)
+            np.add.at(in_run, np.minimum(run_starts + run_lengths, length), -1)
+            sequence[np.cumsum(in_run[:length]) > 0] = ord('N')
+            out_file.write(b'>' + scaffold.encode() + b'\n' + sequence.tobytes() + b'\n')
+
+def syntheticTrackDB(TRACKDB_OUT, REF_BED_OUT, n_tfs, seed = 1):
+    '''
+    Writes a GTRD schema naming n_tfs transcription factors, and a reference
+    annotation giving the Ensembl id of each
+    '''
+    rng = random.Random(seed)
+    with open(TRACKDB_OUT, 'w') as tdb_file, open(REF_BED_OUT, 'w') as bed_file:
+        tdb_file.write('track GTRD\n')
+        items = []
+        for tf in range(n_tfs):
+            gene_name = 'tf' + str(tf)
+            items.append('TF' + str(tf) + '=' + 'Drosophila\\' + gene_name)
+            start = rng.randint(1, 10000000)
+            bed_file.write('\t'.join(['chr' + str(tf % 4), str(start), str(start + rng.randint(300, 20000)), 'FBgn' + str(tf).zfill(7), '.', rng.choice('+-'), gene_name]) + '\n')
+        tdb_file.write('    tf_name TF ' + ' '.join(items) + '\n')
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('BED_out',   type=str, help='path where the synthetic annotation should be written')
+parser.add_argument('SCAFFOLDS', type=int, help='number of scaffolds to generate')
+parser.add_argument('GENES',     type=int, help='number of genes per scaffold')
+parser.add_argument('--seed',    type=int, default=1, help='seed for the random number generator')
+parser.add_argument('--fasta',   type=str, default=None, help='path where a synthetic genome of the scaffolds should be written')
+parser.add_argument('--overlap-rate',         type=float, default=0, help='fraction of genes starting within the previous gene')
+parser.add_argument('--bidirectional-rate',   type=float, default=0, help='fraction of genes following a - strand gene to start head to head with it')
+parser.add_argument('--duplicate-start-rate', type=float, default=0, help='fraction of genes sharing the start and strand of the previous gene')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    scaff_lengths = syntheticAnnotation(args.BED_out, args.SCAFFOLDS, args.GENES, args.seed, args.overlap_rate, args.bidirectional_rate, args.duplicate_start_rate)
+    if args.fasta:
+        syntheticGenome(args.fasta, scaff_lengths, args.seed)
@@ -14,6 +14,7 @@ import os
 import sys
 import sphinx_rtd_theme
 sys.path.insert(0, os.path.abspath('..'))
+sys.path.insert(0, os.path.abspath('../workflow/scripts'))
 
 
 # -- Project information -----------------------------------------------------
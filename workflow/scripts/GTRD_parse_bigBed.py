@@ -12,17 +12,38 @@ It also uses the custom reference gene annotation bed used elsewhere in EMotEP
 to retreive the Ensembl id of the transcription factor in the
 bigbed file.
 
+Given a directory or glob of bigbed files instead, all transcription factors
+are converted in one batch, the decoding libraries being built once and the
+files converted in parallel. The batch is written as one bed per
+transcription factor, or as one merged bed sorted by coordinate. The peaks
+may also be written as bgzip (.bed.gz, tabix indexed), Arrow IPC (.arrow) or
+Parquet (.parquet) tables.
+
 '''
 
 #import libraries
 import os
+import sys
 import csv
+import glob
+import heapq
+import tempfile
+import contextlib
+import multiprocessing
 # Legacy as requires internet connection
 #import mygene
 import argparse
 
+import pandas as pd
 import pyBigWig as pbw
 
+from fileCache import cachedParse
+from regionTable import FORMAT_EXTENSIONS, regionsRead, regionsWrite
+
+# names of the columns of the peak beds, any remaining bigbed columns kept
+# after them
+PEAK_COLUMNS = ['chrom', 'start', 'stop', 'ensembl_id', 'gene_name']
+
 #Define custom functions
 def trackDBparser (trackDB):
     '''
@@ -34,19 +55,19 @@ def trackDBparser (trackDB):
     # iterate through the GTRD schema, extract tf indentifiers, store in memory
     with open(trackDB) as tDB:
         for line in tDB:
-            # filter short lines
-            if len(line.split()) > 1:
-                # extract tf identifiers
-                if line.split()[1] == 'tf_name':
-                    # extract coordinates of binding events
-                    for item in line.split()[3:]:
-                        tf_ident  = item.split('=')[0]
-                        gene_name = item.split('=')[1].split('\\')[-1]
-                        if tf_ident not in tf_indentifiers:
-                            tf_indentifiers[tf_ident] = [gene_name]
-                        else:
-                            if gene_name not in tf_indentifiers[tf_ident]:
-                                tf_indentifiers[tf_ident].append(gene_name)
+            fields = line.split()
+            # filter short lines, extract tf identifiers
+            if len(fields) > 1 and fields[1] == 'tf_name':
+                # extract coordinates of binding events
+                for item in fields[3:]:
+                    item_fields = item.split('=')
+                    tf_ident  = item_fields[0]
+                    gene_name = item_fields[1].split('\\')[-1]
+                    if tf_ident not in tf_indentifiers:
+                        tf_indentifiers[tf_ident] = [gene_name]
+                    else:
+                        if gene_name not in tf_indentifiers[tf_ident]:
+                            tf_indentifiers[tf_ident].append(gene_name)
     return(tf_indentifiers)
 
 def ensemblIDextract (ensemblGeneBed):
@@ -67,11 +88,135 @@ def ensemblIDextract (ensemblGeneBed):
                 sys.exit()
     return(ensembl_ids)
 
-def main (BIGBED, trackDB, BED, out_path):
+def bigBedConvert (BIGBED, TF_ID, ensemblDecoder, BED_OUT, WINDOW = 1000000, KEEP_REST = False):
+    '''
+    Decode the transcription factor of a bigbed and write its binding events
+    to bed with gene name and Ensembl id, scaffolds in sorted order.
+
+    Binding events are retrieved and written WINDOW nucleotides at a time, so
+    memory is bounded by the densest window rather than the largest scaffold.
+    KEEP_REST appends the remaining bigbed columns (summit, score...).
+    '''
+    # extract gene name using this schema
+    gene_name = TF_ID[os.path.basename(BIGBED).split('_')[1]][0]
+
+    # Legacy as requires internet connection
+    # use mygene tool to extract ensembl id
+    #ensembl_id = mg.query(gene_name, fields = 'ensembl.gene', species = 'fruitfly')['hits'][0]['ensembl']['gene']
+
+    #use reference annotation to retreive ensembl id
+    ensembl_id = ensemblDecoder[gene_name]
+
+    # open bigbed file
+    bb = pbw.open(BIGBED)
+
+    # intergrate this information with coordinates of binding events, write .bed
+    with open(BED_OUT, 'w', buffering = 1 << 20) as outfile:
+        for chrom, limit in sorted(bb.chroms().items()):
+            prefix = chrom + '\t'
+            suffix = '\t' + ensembl_id + '\t' + gene_name
+
+            for window_start in range(0, limit, WINDOW):
+                bindingEvents = bb.entries(chrom, window_start, min(window_start + WINDOW, limit), withString = KEEP_REST)
+
+                # events spanning the window start were written with the previous window
+                lines = []
+                for bindingEvent in bindingEvents or []:
+                    start = bindingEvent[0]
+                    if start < window_start:
+                        continue
+                    line = prefix + str(start) + '\t' + str(bindingEvent[1]) + suffix
+                    if KEEP_REST and bindingEvent[2]:
+                        line = line + '\t' + bindingEvent[2]
+                    lines.append(line + '\n')
+
+                outfile.write(''.join(lines))
+
+    bb.close()
+
+def bigBedBed (BIGBED, out_dir):
+    '''
+    Path of the bed written for a bigbed
+    '''
+    return(os.path.join(out_dir, os.path.basename(BIGBED).replace('.bb', '.bed')))
+
+def decoderInit (TF_ID, ensemblDecoder):
+    '''
+    Hold the decoding libraries in each worker of the conversion pool, so
+    they are passed to each worker once rather than with every file
+    '''
+    global worker_decoders
+    worker_decoders = (TF_ID, ensemblDecoder)
+
+def bigBedWorker (BIGBED, out_dir, WINDOW, KEEP_REST, FORMATS = ('bed',)):
+    '''
+    Convert one bigbed in a pool worker, returning the bed written or None if
+    the transcription factor could not be decoded
+    '''
+    BED_OUT = bigBedBed(BIGBED, out_dir)
+    try:
+        bigBedConvert(BIGBED, worker_decoders[0], worker_decoders[1], BED_OUT, WINDOW, KEEP_REST)
+    except (KeyError, IndexError):
+        print('Could not decode the transcription factor of ' + BIGBED + ' - omitting')
+        return(None)
+    peakTables(BED_OUT, FORMATS)
+    return(BED_OUT)
+
+def bedMerge (BED_LIST, BED_OUT):
+    '''
+    Merge coordinate sorted bed files into one sorted bed, streaming the
+    inputs so only one line per file is held in memory
+    '''
+    def bedKey (line):
+        fields = line.split('\t', 2)
+        return((fields[0], int(fields[1])))
+
+    bed_files = [open(bed) for bed in BED_LIST]
+    try:
+        with open(BED_OUT, 'w') as outfile:
+            outfile.writelines(heapq.merge(*bed_files, key = bedKey))
+    finally:
+        for bed_file in bed_files:
+            bed_file.close()
+
+def peakTables (BED_IN, FORMATS):
+    '''
+    Write the peaks of a bed in each of the other formats given, alongside it,
+    removing the bed if it is not among them. A bed without peaks gives empty
+    tables of the peak columns
+    '''
+    if list(FORMATS) == ['bed']:
+        return
+    if os.path.getsize(BED_IN) == 0:
+        peaks = pd.DataFrame({column: pd.Series(dtype = 'int64' if column in ('start', 'stop') else str) for column in PEAK_COLUMNS})
+    else:
+        peaks = regionsRead(BED_IN)
+        peaks.columns = (PEAK_COLUMNS + ['column_' + str(n) for n in range(len(PEAK_COLUMNS), peaks.shape[1])])[:peaks.shape[1]]
+    for table_format in FORMATS:
+        if table_format != 'bed':
+            regionsWrite(peaks, os.path.splitext(BED_IN)[0] + FORMAT_EXTENSIONS[table_format])
+    if 'bed' not in FORMATS:
+        os.remove(BED_IN)
+
+def bigBedList (BIGBED):
+    '''
+    List the bigbed files in a directory or matching a glob
+    '''
+    if os.path.isdir(BIGBED):
+        return(sorted(glob.glob(os.path.join(BIGBED, '*.bb'))))
+    return(sorted(glob.glob(BIGBED)))
+
+def main (BIGBED, trackDB, BED, out_path, THREADS = 1, MERGE = False, WINDOW = 1000000, KEEP_REST = False, CACHE_DIR = None, FORMATS = ('bed',)):
     '''
     Create a output dir if needed, generate decoding library, exctract gene name
     , use this to extract Ensembl ID. Write to bed file with gene name and
     Ensembl id.
+
+    A directory or glob of bigbeds is converted as a batch with THREADS
+    workers, optionally merged into GTRD_BED/GTRD_merged.bed. The decoding
+    libraries are cached in CACHE_DIR if given. Each bed written, the merged
+    bed in place of the per TF beds when merging, is also written in each of
+    FORMATS.
     '''
     # create outdir if needed
     if not os.path.isdir(os.path.join(out_path, 'GTRD_BED')):
@@ -82,47 +227,58 @@ def main (BIGBED, trackDB, BED, out_path):
     #mg = mygene.MyGeneInfo()
 
     # load annotation to retreive ensemble ids
-    ensemblDecoder = ensemblIDextract(BED)
+    ensemblDecoder = cachedParse(BED, ensemblIDextract, CACHE_DIR)
 
     # load schema dictionary
-    TF_ID = trackDBparser(trackDB)
+    TF_ID = cachedParse(trackDB, trackDBparser, CACHE_DIR)
 
-    # extract gene name using this schema
-    gene_name = TF_ID[os.path.basename(BIGBED).split('_')[1]][0]
-
-    # Legacy as requires internet connection
-    # use mygene tool to extract ensembl id
-    #ensembl_id = mg.query(gene_name, fields = 'ensembl.gene', species = 'fruitfly')['hits'][0]['ensembl']['gene']
+    # a single bigbed is converted directly
+    if os.path.isfile(BIGBED):
+        BED_OUT = bigBedBed(BIGBED, os.path.join(out_path, 'GTRD_BED'))
+        bigBedConvert(BIGBED, TF_ID, ensemblDecoder, BED_OUT, WINDOW, KEEP_REST)
+        peakTables(BED_OUT, FORMATS)
+        return
 
-    #use reference annotation to retreive ensembl id
-    ensembl_id = ensemblDecoder[gene_name]
+    bigbed_list = bigBedList(BIGBED)
+    if not bigbed_list:
+        print('No bigbed files found at ' + BIGBED)
+        sys.exit(1)
 
-    # open bigbed file
-    bb = pbw.open(BIGBED)
+    # per TF beds are intermediates when merging, removed whether or not the
+    # merge succeeds
+    bed_dir = os.path.join(out_path, 'GTRD_BED')
+    with (tempfile.TemporaryDirectory(dir = bed_dir) if MERGE else contextlib.nullcontext(bed_dir)) as bed_dir:
+        tasks = [(bigbed, bed_dir, WINDOW, KEEP_REST, ('bed',) if MERGE else FORMATS) for bigbed in bigbed_list]
+        with multiprocessing.Pool(max(1, min(THREADS, len(tasks))), decoderInit, (TF_ID, ensemblDecoder)) as pool:
+            bed_list = [bed for bed in pool.starmap(bigBedWorker, tasks) if bed is not None]
 
-    # intergrate this information with coordinates of binding events, write .bed
-    with open(os.path.join(out_path, 'GTRD_BED', os.path.basename(BIGBED).replace('.bb', '.bed')), 'w') as outfile:
-        for chrom, limit in bb.chroms().items():
+        print(str(len(bed_list)) + ' of ' + str(len(bigbed_list)) + ' bigbed files converted')
 
-            for bindingEvent in bb.entries(chrom, 0, limit):
-                start = bindingEvent[0]
-                stop  = bindingEvent[1]
+        if MERGE:
+            bedMerge(bed_list, os.path.join(out_path, 'GTRD_BED', 'GTRD_merged.bed'))
 
-                outfile.write('\t'.join([str(x) for x in [chrom, start, stop, ensembl_id, gene_name]]) + '\n')
+    if MERGE:
+        peakTables(os.path.join(out_path, 'GTRD_BED', 'GTRD_merged.bed'), FORMATS)
 
 # Define arguments used in the script
 parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
 
-parser.add_argument('BIGBED_in',  type=str, help='path to GTRD binding events in BIGBED format')
+parser.add_argument('BIGBED_in',  type=str, help='path to GTRD binding events in BIGBED format, or a directory or quoted glob of them')
 parser.add_argument('trackDB_in', type=str, help='path to GTRD textDB file for decoding TF identity')
 parser.add_argument('BED_in',     type=str, help='path to reference gene annotation in custom BED format')
 parser.add_argument('out_dir',    type=str, help='path to directory where the figure should be written')
+parser.add_argument('--threads',  type=int, default=1, help='number of processes converting a batch of bigbed files in parallel')
+parser.add_argument('--merge',    action='store_true', help='write a batch as one bed sorted by coordinate, GTRD_BED/GTRD_merged.bed')
+parser.add_argument('--window',   type=int, default=1000000, help='nucleotide length of the windows binding events are retrieved in')
+parser.add_argument('--keep-rest', action='store_true', help='keep the remaining bigbed columns (peak summit, score...) after the gene name')
+parser.add_argument('--cache-dir', type=str, default=None, help='path to directory where the parsed decoding libraries are cached between runs')
+parser.add_argument('--formats',  type=str, nargs='+', default=['bed'], choices=sorted(FORMAT_EXTENSIONS), help='formats the peaks are written in: bed, bed.gz (bgzip with a tabix index), arrow or parquet (need pyarrow)')
 
 if __name__ == '__main__':
 
     args = parser.parse_args()
 
-    main(args.BIGBED_in, args.trackDB_in, args.BED_in, args.out_dir)
+    main(args.BIGBED_in, args.trackDB_in, args.BED_in, args.out_dir, args.threads, args.merge, args.window, args.keep_rest, args.cache_dir, args.formats)
 
 __author__ = "Will Nash"
 __copyright__ = "Copyright 2020, The Earlham Institute"
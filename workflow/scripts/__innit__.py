@@ -1 +1 @@
-__all__ = ['cisRegion', 'cisRegion_displot']
+__all__ = ['GTRD_parse_bigBed', 'cisRegion', 'cisRegion_displot', 'cisRegion_engineCompare', 'fastaIndex', 'fileCache', 'gffParse', 'kmerIndex', 'motifScan', 'motifThresholds', 'orthology', 'peakIndex', 'peakMatch', 'regionTable', 'sequenceExtract', 'sequencePrep', 'twoBit']
@@ -9,16 +9,59 @@ Developed on protein coding genes in vertebrate genomes
 
 Accounts for overlapping annotations and those that share start sites
 
-Input: annotation (.bed), genome (.fasta)
-Output cisRegion annotation (.bed), list of flagged genes sharing start & strand (.txt)
+Input: annotation (.bed, or .gff/.gff3 parsed in process), genome (.fasta)
+Output cisRegion annotation (.bed, and/or .bed.gz, .arrow, .parquet), list of flagged genes sharing start & strand (.txt)
 '''
 
 #import libraries
 import os
 import sys
 import csv
+import array
+import bisect
+import pickle
+import inspect
+import hashlib
+import logging
 import argparse
-
+import multiprocessing
+
+import numpy  as np
+import pandas as pd
+
+from sequenceExtract import genomeOpen, fastaWrite
+from gffParse import isGFF, geneRecords
+from fileCache import fileHash, cacheWrite
+from regionTable import FORMAT_EXTENSIONS, tableFormat, regionsWrite
+
+logger = logging.getLogger('cisRegion')
+
+# reasons a gene's cis region is not reported
+REMOVE_NO_UPSTREAM           = 'NO_UPSTREAM'
+REMOVE_NESTED                = 'NESTED'
+REMOVE_BIDIRECTIONAL_OVERLAP = 'BIDIRECTIONAL_OVERLAP'
+REMOVE_SHARED_START          = 'SHARED_START'
+REMOVE_ZERO_LENGTH           = 'ZERO_LENGTH'
+REMOVE_SCAFFOLD_END          = 'SCAFFOLD_END'
+
+# rules giving the extent of a kept cis region
+KEEP_CALLED          = 'KEPT'
+KEEP_FULL_WINDOW     = 'FULL_WINDOW'
+KEEP_NEIGHBOUR_CLIP  = 'NEIGHBOUR_CLIP'
+KEEP_BIDIRECTIONAL   = 'BIDIRECTIONAL_SPLIT'
+KEEP_SCAFFOLD_CLIP   = 'SCAFFOLD_CLIP'
+NOT_CALLED           = 'NOT_CALLED'
+
+# version of the cached scaffold calls, raised when what they hold changes
+CACHE_VERSION = 1
+
+def logSetup(LOG_LEVEL):
+    '''
+    Sends log messages at or above LOG_LEVEL to stderr, also used to set up
+    the worker processes of the calling pool
+    '''
+    logging.basicConfig(level = LOG_LEVEL, format = '%(levelname)s\t%(message)s')
+    logger.setLevel(LOG_LEVEL)
 
 def asint(s):
     '''
@@ -45,42 +88,170 @@ def genomeLoad(genome_fasta):
             seq_dict[_id] = _seq
     return(seq_dict)
 
-def chromLimitFind (chrom_set, genomeFastaDict):
+def chromLimitFind (chrom_set, SCAFF_LENGTHS):
     '''
-    Compiles a dictionary containing the length of each scaffold
+    Compiles a dictionary containing the length of each annotated scaffold
     '''
     chrLim_dict = {}
     for chrom in chrom_set:
         try:
-            chrLim_dict[chrom] = len(genomeFastaDict[chrom])
+            chrLim_dict[chrom] = SCAFF_LENGTHS[chrom]
         except KeyError :
-            print ('Scaffold', chrom, 'not in fasta - omitting')
+            logger.warning('Scaffold %s not in fasta - omitting', chrom)
             pass
 
     return(chrLim_dict)
 
 
-def scaffoldLister(BED_IN):
+def annotationRows(BED_IN):
+    '''
+    Yields the rows of a .bed gene annotation, or the protein coding genes of a
+    .gff/.gff3 annotation in the same 7 column format
+    '''
+    if isGFF(BED_IN):
+        yield from geneRecords(BED_IN)
+    else:
+        with open(BED_IN) as GENEBED_archive:
+            yield from csv.reader(GENEBED_archive, delimiter = '\t')
+
+def annotationLoad(BED_IN):
+    '''
+    Parses the gene annotation once, grouping genes by scaffold so each scaffold
+    can be looked up rather than re-reading the file
+    '''
+    annotation_dict = {}
+    for gene in annotationRows(BED_IN):
+        if gene and gene[0][0] != '#':
+            try:
+                gene_dict = annotation_dict.setdefault(gene[0], {})
+                if gene[3] in gene_dict:
+                    logger.error('Break during gene library construction due to duplicate genes in annotation')
+                    logger.error('%s', gene)
+                    sys.exit()
+                else:
+                    gene_dict[gene[3]] = (gene[0], gene[1], gene[2], gene[5], gene[3])
+
+            except IndexError:
+                logger.error('Error during gene library construction')
+                logger.error('%s', gene)
+                sys.exit()
+
+    return(annotation_dict)
+
+def scaffoldLister(GENE_ANNOTATION):
     '''
-    Creates a set of scaffold ids - this is redundant to the above (change in
-    ver2.0)
+    Creates a set of scaffold ids from the parsed annotation
     '''
-    chr_list = []
-    with open(BED_IN) as GENEBED_archive:
-        for ge in GENEBED_archive:
-            if str(ge)[0] != '#':
-                chr_list.append(ge.split('\t')[0])
-    chr_set = set(chr_list)
+    chr_set = set(GENE_ANNOTATION)
     return(chr_set)
 
+class CisRegionTable:
+    '''
+    Compact column store of kept cis regions, with coordinates held in typed
+    arrays, written to .bed in a single buffered write
+    '''
+    def __init__(self):
+        self.scaffolds = []
+        self.scaffold_index = array.array('l')
+        self.starts    = array.array('q')
+        self.stops     = array.array('q')
+        self.gene_ids  = []
+        self.strands   = bytearray()
+        self.rules     = []
+
+    def __len__(self):
+        return(len(self.gene_ids))
+
+    def append(self, scaffold, start, stop, gene_id, gene_strand, rule = KEEP_CALLED):
+        if not self.scaffolds or self.scaffolds[-1] != scaffold:
+            self.scaffolds.append(scaffold)
+        self.scaffold_index.append(len(self.scaffolds) - 1)
+        self.starts.append(int(start))
+        self.stops.append(int(stop))
+        self.gene_ids.append(gene_id)
+        self.strands.append(ord(gene_strand))
+        self.rules.append(rule)
+
+    def extend(self, other):
+        offset = len(self.scaffolds)
+        self.scaffolds.extend(other.scaffolds)
+        self.scaffold_index.extend(array.array('l', (index + offset for index in other.scaffold_index)))
+        self.starts.extend(other.starts)
+        self.stops.extend(other.stops)
+        self.gene_ids.extend(other.gene_ids)
+        self.strands.extend(other.strands)
+        self.rules.extend(other.rules)
+
+    def rows(self):
+        for index, start, stop, gene_id, strand in zip(self.scaffold_index, self.starts, self.stops, self.gene_ids, self.strands):
+            yield(self.scaffolds[index], start, stop, gene_id, chr(strand))
+
+    def writeBED(self, BED_OUT):
+        atomicWrite(''.join(['%s\t%d\t%d\t%s\t1\t%s\n' % row for row in self.rows()]), BED_OUT)
+
+    def frame(self):
+        '''
+        The cis regions as a DataFrame of the .bed columns
+        '''
+        return(pd.DataFrame({'chrom':  np.array(self.scaffolds, dtype = object)[np.array(self.scaffold_index, dtype = np.int64)],
+                             'start':  np.array(self.starts, dtype = np.int64),
+                             'stop':   np.array(self.stops, dtype = np.int64),
+                             'name':   self.gene_ids,
+                             'score':  1,
+                             'strand': np.frombuffer(bytes(self.strands), dtype = 'S1').astype(str)}))
+
+    def writeTable(self, TABLE_OUT):
+        '''
+        Writes the cis regions in the format of the extension of TABLE_OUT
+        '''
+        if tableFormat(TABLE_OUT) == 'bed':
+            self.writeBED(TABLE_OUT)
+        else:
+            regionsWrite(self.frame(), TABLE_OUT)
+
+def atomicWrite(text, FILE_OUT):
+    '''
+    Writes text via a temporary file renamed over FILE_OUT, so a rerun replaces
+    the output whole and an interrupted run never leaves it partly written
+    '''
+    tmp_path = FILE_OUT + '.tmp' + str(os.getpid())
+    with open(tmp_path, 'w') as out_file:
+        out_file.write(text)
+    os.replace(tmp_path, FILE_OUT)
+
+def suffixPath(PATH, SUFFIX):
+    '''
+    Inserts a suffix before the extension of a path
+    '''
+    root, ext = os.path.splitext(PATH)
+    return(root + SUFFIX + ext)
+
+def decisionLogWrite(LOG_OUT, GENE_ANNOTATION, cis_table, remove_list):
+    '''
+    Writes the rule deciding the fate of every gene, with the gene and cis
+    region coordinates, as a .tsv in a single buffered write
+    '''
+    kept  = {gene_id: (start, stop, rule) for gene_id, start, stop, rule in zip(cis_table.gene_ids, cis_table.starts, cis_table.stops, cis_table.rules)}
+    lines = ['gene_id\trule\tscaffold\tgene_start\tgene_stop\tstrand\tcis_start\tcis_stop\n']
+    for chrom in sorted(GENE_ANNOTATION):
+        genes = GENE_ANNOTATION[chrom]
+        for gene_id in sorted(genes, key = lambda gene_id: (int(genes[gene_id][1]), asint(gene_id))):
+            gene = genes[gene_id]
+            if gene_id in kept:
+                cis_start, cis_stop, rule = kept[gene_id]
+            else:
+                cis_start, cis_stop, rule = '.', '.', remove_list.get(gene_id, NOT_CALLED)
+            lines.append('%s\t%s\t%s\t%s\t%s\t%s\t%s\t%s\n' % (gene_id, rule, chrom, gene[1], gene[2], gene[3], cis_start, cis_stop))
+    atomicWrite(''.join(lines), LOG_OUT)
+
 def outputFormat(output, scaffold, start, stop, gene_id, gene_strand):
     '''
-    write coordinates to output in bed format
+    record coordinates in the cis region table
     '''
-    print('Keeping: ' + '\t'.join([str(scaffold), str(start),str(stop), str(gene_id),'1', str(gene_strand)]))
-    output.write('\t'.join([str(scaffold), str(start),str(stop), str(gene_id),'1', str(gene_strand) + '\n']))
+    logger.debug('Keeping: %s\t%s\t%s\t%s\t1\t%s', scaffold, start, stop, gene_id, gene_strand)
+    output.append(scaffold, start, stop, gene_id, gene_strand)
 
-def hugeCisRegionCallingBehemoth(SCAF_LIST, BED_IN, OUTPUT_DIR, SCAFF_LIMS, CIS_WINDOW):
+def behemothChromosome(GENES, CHROM_LIMIT, CIS_WINDOW):
     '''
     This highly repetitive function works to call cis regions upstream of
     annotated genes. It excludes cis regions that overlap coding sequence. It
@@ -97,860 +268,1129 @@ def hugeCisRegionCallingBehemoth(SCAF_LIST, BED_IN, OUTPUT_DIR, SCAFF_LIMS, CIS_
     nested inside each other. This script should be able to handle such
     scenarios, but also still contains a kill switch if the annotation is too
     messy.
+
+    Works on the genes of one scaffold, returning a table of its cis regions
+    along with the genes removed (and the reason) and flagged on the scaffold.
     '''
-    remove_list       = []
-    same_strand_start = []
-    filename = os.path.basename(BED_IN)
+    remove_list       = {}
+    same_strand_start = {}
+
+    chrom = next(iter(GENES.values()))[0]
+    SCAFF_LIMS = {chrom: CHROM_LIMIT} if CHROM_LIMIT is not None else {}
+
+    logger.debug('Working with chromosome %s', chrom)
+    # copy the parsed records as the calling loop appends promoter coordinates
+    gene_dict = {gene_id: list(gene) for gene_id, gene in GENES.items()}
+
+    sorted_gene_list = [(k, gene_dict[k]) for k in sorted(gene_dict, key=asint)]
+
+    chrom_dict = {}
+    for gen in sorted_gene_list:
+        if gen[1][1] not in chrom_dict:
+            chrom_dict[gen[1][1]] = [gen]
+
+        else:
+            if chrom_dict[gen[1][1]][0][1][3] == gen[1][3]:
+
+                logger.debug('Recording gene %s with promoter overlap the same strand', gen[1][4])
+                same_strand_start[chrom_dict[gen[1][1]][0][1][4]] = None
+                same_strand_start[gen[1][4]] = None
+
+                chrom_dict[gen[1][1]].append(gen)
+
+            else:
+                chrom_dict[gen[1][1]].append(gen)
+
+    sorted_chrm_list = [(k, chrom_dict[k]) for k in sorted(chrom_dict, key=asint)]
+
+    count           = 0
+    switch          = 0
+    stored_start    = 0
+    stored_stop     = 0
+    stored_chr      = '@'
+    stored_strand   = '+'
+    strand_skip     = '@'
+    # with open(os.path.join(OUTPUT_DIR, filename[:-3] + str(CIS_WINDOW) + 'nt_cisRegions.stranded.bed'), 'w') as out_file:
+    out_file = CisRegionTable()
+    for gene in sorted_chrm_list:
+
+        #this removes genes that start at 0 on a scaffold
+        if int(gene[0]) == 0 and gene[1][0][1][3] == '+':
+            remove_list.setdefault(gene[1][0][1][4], REMOVE_NO_UPSTREAM)
+            logger.debug('Removing gene with no possible promoter')
+            stored_start = 1
+            count        = count + 1
+            continue
+
+        if switch == 0:
+            stored_stop = gene[1][0][1][2]
+            switch      = 1
+
+        if len(gene[1]) > 1:
+            logger.debug(' !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!! %s DUPLICATES!!!!!!!!!!!!!!!!!!!!!!!!!', len(gene[1]))
+            count = count + 1
+            stored_dup_start = '@'
+            stored_dup_stop  = '@'
+            stored_dup_prom  = '@'
+            for d_c, dup in enumerate(gene[1]):
+                logger.debug('--- On gene =\t%s %s', dup[0], dup[1][3])
+                logger.debug('pum')
+                if d_c > 0:
+
+                    if dup[1][4] in same_strand_start:
+                        logger.debug('\t%s is a start site same strand duplicate - mirroring promoter', dup[1][4])
+                        if stored_dup_prom == '@':
+                            logger.debug('No stored promoter to mirror - annotation not recorded')
+                            remove_list.setdefault(dup[1][4], REMOVE_SHARED_START)
+                        else:
+                            dup[1].append(stored_dup_prom)
+
+                        if dup[1][3] == '+':
+                            if int(dup[1][2]) > int(stored_stop) and int(dup[1][1]) < int(stored_start):
+                                logger.debug('\tRemoving duplicate startsite gene 2 as nested within previous gene')
+                                remove_list.setdefault(dup[1][4], REMOVE_SHARED_START)
+                            elif int(dup[1][2]) > int(stored_stop):
+                                stored_stop = int(dup[1][2])
+
+                        elif dup[1][3] == '-':
+                            if int(dup[1][2]) < int(stored_start):
+                                logger.debug('Gene overlapping - same start site on the negative strand - annotation not recorded')
+                                remove_list.setdefault(dup[1][4], REMOVE_SHARED_START)
+
+                            elif int(dup[1][2]) > int(stored_start):
+                                logger.debug('Previous gene overlapping - same start site on the negative strand - annotation not recorded')
+                                remove_list.setdefault(stored_dup_name, REMOVE_SHARED_START)
+                                remove_list.setdefault(dup[1][4], REMOVE_SHARED_START)
+
+                                try:
+                                    dup[1][5] = int(dup[1][2]) + CIS_WINDOW
+                                except(IndexError):
+                                    dup[1].append(int(dup[1][2]) + CIS_WINDOW)
+                                stored_start = int(dup[1][2])
 
-    for chrom in sorted(SCAF_LIST):
-        print('\n\nWorking with chromosome ' + chrom + '\n')
-        with open(BED_IN) as GENEBED_archive:
-            gene_dict = {}
-            for gene in csv.reader(GENEBED_archive, delimiter = '\t'):
-                if gene[0][0] != '#':
-                    if gene[0] == chrom:
-                        try:
-                            if gene[3] in gene_dict:
-                                print('\n\t!!!\tBreak during gene library construction due to duplicate genes in annotation')
-                                sys.exit()
                             else:
-                                gene_dict[gene[3]] = [gene[0], gene[1], gene[2], gene[5], gene[3]]
+                                logger.debug('%s is a start site same strand duplicate - mirroring promoter', dup[1][4])
+                                dup[1].append(stored_dup_prom)
 
-                        except:
-                            print('\n\n--- Error during gene library construction ---\n\n')
-                            print('\n'+ str(gene) +'\n')
-                            sys.exit()
-
-            sorted_gene_list = [(k, gene_dict[k]) for k in sorted(gene_dict, key=asint)]
-
-            chrom_dict = {}
-            for gen in sorted_gene_list:
-                if gen[1][1] not in chrom_dict:
-                    chrom_dict[gen[1][1]] = [gen]
-
-                else:
-                    if chrom_dict[gen[1][1]][0][1][3] == gen[1][3]:
-
-                        print('Recording gene ' + gen[1][4] + ' with promoter overlap the same strand')
-                        same_strand_start.append(chrom_dict[gen[1][1]][0][1][4])
-                        same_strand_start.append(gen[1][4])
-
-                        chrom_dict[gen[1][1]].append(gen)
 
+                        if d_c == len(gene[1]) - 1:
+                            stored_strand = dup[1][3]
                     else:
-                        chrom_dict[gen[1][1]].append(gen)
-
-            sorted_chrm_list = [(k, chrom_dict[k]) for k in sorted(chrom_dict, key=asint)]
-
-            count           = 0
-            switch          = 0
-            stored_start    = 0
-            stored_stop     = 0
-            stored_chr      = '@'
-            stored_strand   = '+'
-            strand_skip     = '@'
-            # with open(os.path.join(OUTPUT_DIR, filename[:-3] + str(CIS_WINDOW) + 'nt_cisRegions.stranded.bed'), 'w') as out_file:
-            with open(os.path.join(OUTPUT_DIR, 'cisRegions.bed'), 'a') as out_file:
-                for gene in sorted_chrm_list:
-
-                    #this removes genes that start at 0 on a scaffold
-                    if int(gene[0]) == 0 and gene[1][0][1][3] == '+':
-                        remove_list.append(gene[1][0][1][4])
-                        print('\n\n\nRemoving gene with no possible promoter\n\n\n\n')
-                        stored_start = 1
-                        count        = count + 1
-                        continue
+                        if dup[1][3] == '-':
 
-                    if switch == 0:
-                        stored_stop = gene[1][0][1][2]
-                        switch      = 1
-
-                    if len(gene[1]) > 1:
-                        print ('\n\n\n\n !!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!! ' + str(len(gene[1])) + ' DUPLICATES!!!!!!!!!!!!!!!!!!!!!!!!!\n\n\n\n\n')
-                        count = count + 1
-                        stored_dup_start = '@'
-                        stored_dup_stop  = '@'
-                        stored_dup_prom  = '@'
-                        for d_c, dup in enumerate(gene[1]):
-                            print('--- On gene =\t' + dup[0] + ' ' + dup[1][3])
-                            print('pum')
-                            if d_c > 0:
-
-                                if dup[1][4] in same_strand_start:
-                                    print('\t' + str(dup[1][4]) + ' is a start site same strand duplicate - mirroring promoter\n')
-                                    if stored_dup_prom == '@':
-                                        print('\nNo stored promoter to mirror - annotation not recorded\n')
-                                        remove_list.append(dup[1][4])
-                                    else:
-                                        dup[1].append(stored_dup_prom)
-
-                                    if dup[1][3] == '+':
-                                        if int(dup[1][2]) > int(stored_stop) and int(dup[1][1]) < int(stored_start):
-                                            print('\tRemoving duplicate startsite gene 2 as nested within previous gene\n')
-                                            remove_list.append(dup[1][4])
-                                        elif int(dup[1][2]) > int(stored_stop):
-                                            stored_stop = int(dup[1][2])
-
-                                    elif dup[1][3] == '-':
-                                        if int(dup[1][2]) < int(stored_start):
-                                            print('Gene overlapping - same start site on the negative strand - annotation not recorded\n')
-                                            remove_list.append(dup[1][4])
-
-                                        elif int(dup[1][2]) > int(stored_start):
-                                            print('Previous gene overlapping - same start site on the negative strand - annotation not recorded\n')
-                                            remove_list.append(stored_dup_name)
-                                            remove_list.append(dup[1][4])
+                            if int(dup[1][2]) >= int(stored_dup_stop):
+                                dup[1].append(int(dup[1][2]) + CIS_WINDOW)
+                                logger.debug('Gene %s,\tstop:\t%s,\treplaces with %s + %s', dup[1][4], dup[1][2], dup[1][2], CIS_WINDOW)
+                                stored_start = int(dup[1][2])
+                                stroed_stop  = int(dup[1][1])
+                            else:
+                                stored_start = int(stored_dup_stop)
+                                stroed_stop  = int(dup[1][1])
+                                remove_list.setdefault(dup[1][4], REMOVE_SHARED_START)
+                                logger.debug('Promoter overlapping CDS - promoter not annotated')
+                        elif dup[1][3] == '+':
+                            if stored_strand == '-':
+                                dist = int((int(dup[1][1]) - int(stored_start)) / 2)
+
+                                if dist <= 1:
+                                    logger.debug('Overlapping gene - promoter not annotated')
+                                    remove_list.setdefault(dup[1][4], REMOVE_BIDIRECTIONAL_OVERLAP)
+                                    logger.debug('Gene prior to overlapping pair also promoter not annotated due to overlap')
+                                    remove_list.setdefault(sorted_chrm_list[count - 2][1][0][1][4], REMOVE_BIDIRECTIONAL_OVERLAP)
+                                    continue
+
+                                elif dist < CIS_WINDOW :
+                                    logger.debug('Duplicate start site gene - calculating mid distance for promoter')
+                                    logger.debug('Gene %s,\tstart:\t%s,\treplaces with %s - %s', dup[1][4], dup[1][1], dup[1][1], int((int(dup[1][1])-int(stored_start))/2))
+                                    dup[1].append(int(int(dup[1][1]) - int((int(dup[1][1])-int(stored_start))/2)))
+
+                                    logger.debug('Adjusting previous promoter stop to: %s + %s', stored_start, int((int(dup[1][1])-int(stored_start))/2))
+                                    sorted_chrm_list[count-2][1][0][1][5] = int(int(stored_start) + int((int(dup[1][1])-int(stored_start))/2))
 
-                                            try:
-                                                dup[1][5] = int(dup[1][2]) + CIS_WINDOW
-                                            except(IndexError):
-                                                dup[1].append(int(dup[1][2]) + CIS_WINDOW)
-                                            stored_start = int(dup[1][2])
-
-                                        else:
-                                            print(str(dup[1][4]) + ' is a start site same strand duplicate - mirroring promoter\n')
-                                            dup[1].append(stored_dup_prom)
 
+                                else:
+                                    logger.debug('Gene %s,\tstart:\t%s,\treplaces with %s - %s', dup[1][4], dup[1][1], dup[1][1], CIS_WINDOW)
+                                    dup[1].append(int(dup[1][1]) - CIS_WINDOW)
 
-                                    if d_c == len(gene[1]) - 1:
-                                        stored_strand = dup[1][3]
+                            else:
+                                if int(dup[1][1]) - CIS_WINDOW >= stored_stop:
+                                    dup[1].append(int(dup[1][1]) - CIS_WINDOW)
+                                    logger.debug('Gene %s,\tstart:\t%s,\treplaces with %s - %s', dup[1][4], dup[1][1], dup[1][1], CIS_WINDOW)
+                                    stored_start = int(dup[1][1])
+                                    stroed_stop  = int(dup[1][2])
                                 else:
-                                    if dup[1][3] == '-':
+                                    dup[1].append(int(stored_stop))
+                                    logger.debug('Gene %s,\tstart:\t%s,\treplaces with %s', dup[1][4], dup[1][1], stored_stop)
+                                    stored_start = int(dup[1][1])
+                                    stroed_stop  = int(dup[1][2])
 
-                                        if int(dup[1][2]) >= int(stored_dup_stop):
-                                            dup[1].append(int(dup[1][2]) + CIS_WINDOW)
-                                            print('Gene ' + dup[1][4] + ',\tstop:\t' + str(dup[1][2]) + ',\treplaces with ' + dup[1][2] + ' + ' + str(CIS_WINDOW) + '\n')
-                                            stored_start = int(dup[1][2])
-                                            stroed_stop  = int(dup[1][1])
-                                        else:
-                                            stored_start = int(stored_dup_stop)
-                                            stroed_stop  = int(dup[1][1])
-                                            remove_list.append(dup[1][4])
-                                            print('Promoter overlapping CDS - promoter not annotated')
-                                    elif dup[1][3] == '+':
-                                        if stored_strand == '-':
-                                            dist = int((int(dup[1][1]) - int(stored_start)) / 2)
-
-                                            if dist <= 1:
-                                                print('\nOverlapping gene - promoter not annotated')
-                                                remove_list.append(dup[1][4])
-                                                print('\nGene prior to overlapping pair also promoter not annotated due to overlap')
-                                                remove_list.append(sorted_chrm_list[count - 2][1][0][1][4])
-                                                continue
-
-                                            elif dist < CIS_WINDOW :
-                                                print('Duplicate start site gene - calculating mid distance for promoter')
-                                                print('Gene ' + dup[1][4] + ',\tstart:\t' + str(dup[1][1]) + ',\treplaces with ' + dup[1][1] + ' - ' + str(int((int(dup[1][1])-int(stored_start))/2)))
-                                                dup[1].append(int(int(dup[1][1]) - int((int(dup[1][1])-int(stored_start))/2)))
-
-                                                print('Adjusting previous promoter stop to: ' + str(stored_start) + ' + ' +  str(int((int(dup[1][1])-int(stored_start))/2)))
-                                                sorted_chrm_list[count-2][1][0][1][5] = int(int(stored_start) + int((int(dup[1][1])-int(stored_start))/2))
+                            if stored_strand == dup[1][3] and int(dup[1][1]) >= int(stored_start):
+                                logger.debug('Removing promoter annotation as overlapping previous gene.')
+                                remove_list.setdefault(dup[1][4], REMOVE_SHARED_START)
 
+                            if int(dup[1][2]) > int(stored_dup_start):
+                                logger.debug('Promoter of gen prior to %s overlapping CDS. Promoter not annotated.', dup[1][4])
+                                remove_list.setdefault(stored_dup_name, REMOVE_SHARED_START)
 
-                                            else:
-                                                print('Gene ' + dup[1][4] + ',\tstart:\t' + str(dup[1][1]) + ',\treplaces with ' + dup[1][1] + ' - ' + str(CIS_WINDOW) + '\n')
-                                                dup[1].append(int(dup[1][1]) - CIS_WINDOW)
+                            if stored_dup_strand == '-' and int(stored_dup_start) > int(stored_start):
+                                stored_start = stored_dup_start
+                                if int(stored_dup_stop) > int(stored_stop):
+                                    stored_stop = stored_dup_stop
 
-                                        else:
-                                            if int(dup[1][1]) - CIS_WINDOW >= stored_stop:
-                                                dup[1].append(int(dup[1][1]) - CIS_WINDOW)
-                                                print('Gene ' + dup[1][4] + ',\tstart:\t' + str(dup[1][1]) + ',\treplaces with ' + dup[1][1] + ' - ' + str(CIS_WINDOW) + '\n')
-                                                stored_start = int(dup[1][1])
-                                                stroed_stop  = int(dup[1][2])
-                                            else:
-                                                dup[1].append(int(stored_stop))
-                                                print('Gene ' + dup[1][4] + ',\tstart:\t' + str(dup[1][1]) + ',\treplaces with ' + str(stored_stop) + '\n')
-                                                stored_start = int(dup[1][1])
-                                                stroed_stop  = int(dup[1][2])
+                else:
+                    stored_dup_name   = dup[1][4]
+                    stored_dup_strand = dup[1][3]
 
-                                        if stored_strand == dup[1][3] and int(dup[1][1]) >= int(stored_start):
-                                            print('Removing promoter annotation as overlapping previous gene.')
-                                            remove_list.append(dup[1][4])
+                    if dup[1][0] == stored_chr:
 
-                                        if int(dup[1][2]) > int(stored_dup_start):
-                                            print('Promoter of gen prior to ' + str(dup[1][4]) + ' overlapping CDS. Promoter not annotated.\n\n\n')
-                                            remove_list.append(stored_dup_name)
+                        if dup[1][3] == stored_strand:
 
-                                        if stored_dup_strand == '-' and int(stored_dup_start) > int(stored_start):
-                                            stored_start = stored_dup_start
-                                            if int(stored_dup_stop) > int(stored_stop):
-                                                stored_stop = stored_dup_stop
+                            if dup[1][3] == '-':
+                                if int(dup[1][1]) >= int(stored_start) + CIS_WINDOW:
+                                    logger.debug('Adding preliminary promoter annotation to dup gene 1')
+                                    dup[1].append(int(dup[1][2]) + CIS_WINDOW)
+                                    stored_dup_start = int(dup[1][2])
+                                    stored_dup_stop  = int(dup[1][1])
+                                else:
+                                    logger.debug('Genes closer than %s - editting previous promoter ', CIS_WINDOW) ####CHONDO
+
+                                    logger.debug('\tGene %s stop:\t%s\treplaces with %s', sorted_chrm_list[count-2][1][0][1][4].strip(), sorted_chrm_list[count-2][1][0][1][2], dup[1][1])
+
+                                    try:
+                                        if int(dup[1][1]) >= int(sorted_chrm_list[count-2][1][0][1][1]) and int(dup[1][2]) <= int(sorted_chrm_list[count-2][1][0][1][5]):
+                                            logger.debug('Previous gene as duplicates nested within it - removing annotations')
+                                            remove_list.setdefault(sorted_chrm_list[count-2][1][0][1][4].strip(), REMOVE_SHARED_START)
+                                            for dup in gene[1]:
+                                                logger.debug(dup[0])
+                                                remove_list.setdefault(dup[0], REMOVE_SHARED_START)
+                                    except IndexError:
+                                        if int(dup[1][1]) >= int(sorted_chrm_list[count-2][1][0][1][1]):
+                                            logger.debug('Previous gene as duplicates overlapping it - removing annotations')
+                                            remove_list.setdefault(sorted_chrm_list[count-2][1][0][1][4].strip(), REMOVE_SHARED_START)
+                                            for dup in gene[1]:
+                                                logger.debug(dup[0])
+                                                remove_list.setdefault(dup[0], REMOVE_SHARED_START)
+
+                                    for loc in range(len(sorted_chrm_list[count-2][1])):
+                                        try:
+                                            sorted_chrm_list[count-2][1][loc][1][5] = int(dup[1][1])
+                                        except IndexError:
+                                            pass
+
+                                    logger.debug('Adding preliminary promoter annotation to dup gene 1')
+                                    dup[1].append(int(dup[1][2]) + CIS_WINDOW)
+                                    stored_dup_start = int(dup[1][2])
+                                    stored_dup_stop  = int(dup[1][1])
+                                    stored_dup_prom  = int(dup[1][2]) + CIS_WINDOW
+
+                            elif dup[1][3] == '+' and int(dup[1][1]) - CIS_WINDOW <= 0:
+                                dup[1].append(0)
+                                logger.debug('Gene %s start:\t%s\treplaces with 0', dup[1][4], dup[1][1])
+                                stored_dup_start = int(dup[1][1])
+                                stored_dup_stop  = int(dup[1][2])
+                                stored_dup_prom  = int(dup[1][5])
 
                             else:
-                                stored_dup_name   = dup[1][4]
-                                stored_dup_strand = dup[1][3]
-
-                                if dup[1][0] == stored_chr:
+                                if int(dup[1][1]) >= int(stored_stop) + CIS_WINDOW:
+                                    logger.debug(stored_strand)
+                                    logger.debug(stored_start)
+                                    logger.debug(stored_stop)
+                                    logger.debug(stored_start - 5000)
+                                    logger.debug(stored_stop - 5000)
+
+                                    logger.debug('Gene %s start:\t%s\treplaces with %s - %s', dup[1][4], dup[1][1], dup[1][1], CIS_WINDOW)
+                                    dup[1].append(int(dup[1][1]) - CIS_WINDOW)
+                                    stored_dup_start = int(dup[1][1])
+                                    stored_dup_stop  = int(dup[1][2])
+                                    stored_dup_prom  = int(dup[1][5])
 
-                                    if dup[1][3] == stored_strand:
+                                else:
+                                    if int(dup[1][1]) > int(stored_start) and int(dup[1][2]) < int(stored_stop):
+                                        logger.debug('Duplicate start site nested within previous gene - promoter not annotated')
+                                        remove_list.setdefault(dup[1][4], REMOVE_SHARED_START)
+                                        stored_dup_start = int(dup[1][1])
+                                        stored_dup_stop  = int(dup[1][2])
+
+                                    elif int(dup[1][1]) < int(stored_start):
+                                        logger.debug('Duplicate start site overlaps previous gene on same strand - promoter not annotated')
+                                        remove_list.setdefault(dup[1][4], REMOVE_SHARED_START)
+                                        stored_dup_start = int(dup[1][1])
+                                        stored_dup_stop  = int(dup[1][2])
 
-                                        if dup[1][3] == '-':
-                                            if int(dup[1][1]) >= int(stored_start) + CIS_WINDOW:
-                                                print('\nAdding preliminary promoter annotation to dup gene 1\n')
-                                                dup[1].append(int(dup[1][2]) + CIS_WINDOW)
-                                                stored_dup_start = int(dup[1][2])
-                                                stored_dup_stop  = int(dup[1][1])
-                                            else:
-                                                print('\nGenes closer than ' + str(CIS_WINDOW) + ' - editting previous promoter \n') ####CHONDO
-
-                                                print('\tGene ' + sorted_chrm_list[count-2][1][0][1][4].strip() + ' stop:\t' + str(sorted_chrm_list[count-2][1][0][1][2]) + '\treplaces with ' +  str(dup[1][1]))
-
-                                                try:
-                                                    if int(dup[1][1]) >= int(sorted_chrm_list[count-2][1][0][1][1]) and int(dup[1][2]) <= int(sorted_chrm_list[count-2][1][0][1][5]):
-                                                        print('\nPrevious gene as duplicates nested within it - removing annotations')
-                                                        remove_list.append(sorted_chrm_list[count-2][1][0][1][4].strip())
-                                                        for dup in gene[1]:
-                                                            print(dup[0])
-                                                            remove_list.append(dup[0])
-                                                except IndexError:
-                                                    if int(dup[1][1]) >= int(sorted_chrm_list[count-2][1][0][1][1]):
-                                                        print('\nPrevious gene as duplicates overlapping it - removing annotations')
-                                                        remove_list.append(sorted_chrm_list[count-2][1][0][1][4].strip())
-                                                        for dup in gene[1]:
-                                                            print(dup[0])
-                                                            remove_list.append(dup[0])
-
-                                                for loc in range(len(sorted_chrm_list[count-2][1])):
-                                                    try:
-                                                        sorted_chrm_list[count-2][1][loc][1][5] = int(dup[1][1])
-                                                    except IndexError:
-                                                        pass
-
-                                                print('\nAdding preliminary promoter annotation to dup gene 1\n')
-                                                dup[1].append(int(dup[1][2]) + CIS_WINDOW)
-                                                stored_dup_start = int(dup[1][2])
-                                                stored_dup_stop  = int(dup[1][1])
-                                                stored_dup_prom  = int(dup[1][2]) + CIS_WINDOW
-                                                print('\n')
-
-                                        elif dup[1][3] == '+' and int(dup[1][1]) - CIS_WINDOW <= 0:
-                                            dup[1].append(0)
-                                            print('Gene ' + dup[1][4] + ' start:\t' + str(dup[1][1]) + '\treplaces with 0')
-                                            print('\n')
+                                    else:
+                                        if int(dup[1][1]) - int(stored_stop) > 0:
+                                            logger.debug('Gene %s start:\t%s\treplaces with %s - %s', dup[1][4], dup[1][1], dup[1][1], int(dup[1][1]) - int(stored_stop))
+                                            dup[1].append(int(stored_stop))
                                             stored_dup_start = int(dup[1][1])
                                             stored_dup_stop  = int(dup[1][2])
                                             stored_dup_prom  = int(dup[1][5])
 
                                         else:
-                                            if int(dup[1][1]) >= int(stored_stop) + CIS_WINDOW:
-                                                print(stored_strand)
-                                                print(stored_start)
-                                                print(stored_stop)
-                                                print(stored_start - 5000)
-                                                print(stored_stop - 5000)
-
-                                                print('Gene ' + dup[1][4] + ' start:\t' + str(dup[1][1]) + '\treplaces with ' + dup[1][1] + ' - ' + str(CIS_WINDOW) + '\n')
-                                                dup[1].append(int(dup[1][1]) - CIS_WINDOW)
-                                                print('\n')
-                                                stored_dup_start = int(dup[1][1])
-                                                stored_dup_stop  = int(dup[1][2])
-                                                stored_dup_prom  = int(dup[1][5])
+                                            logger.debug('Gene %s start:\t%s\toverlaps previous stop: %s. No promoter annotated.', dup[1][4], dup[1][1], stored_stop)
+                                            remove_list.setdefault(dup[1][4], REMOVE_SHARED_START)
+                                            stored_dup_start = int(dup[1][1])
+                                            stored_dup_stop  = int(dup[1][2])
 
-                                            else:
-                                                if int(dup[1][1]) > int(stored_start) and int(dup[1][2]) < int(stored_stop):
-                                                    print('Duplicate start site nested within previous gene - promoter not annotated')
-                                                    remove_list.append(dup[1][4])
-                                                    stored_dup_start = int(dup[1][1])
-                                                    stored_dup_stop  = int(dup[1][2])
-
-                                                elif int(dup[1][1]) < int(stored_start):
-                                                    print('Duplicate start site overlaps previous gene on same strand - promoter not annotated')
-                                                    remove_list.append(dup[1][4])
-                                                    stored_dup_start = int(dup[1][1])
-                                                    stored_dup_stop  = int(dup[1][2])
-
-                                                else:
-                                                    if int(dup[1][1]) - int(stored_stop) > 0:
-                                                        print('Gene ' + dup[1][4] + ' start:\t' + str(dup[1][1]) + '\treplaces with ' + dup[1][1] + ' - ' + str(int(dup[1][1]) - int(stored_stop)))
-                                                        dup[1].append(int(stored_stop))
-                                                        print('\n')
-                                                        stored_dup_start = int(dup[1][1])
-                                                        stored_dup_stop  = int(dup[1][2])
-                                                        stored_dup_prom  = int(dup[1][5])
-
-                                                    else:
-                                                        print('Gene ' + dup[1][4] + ' start:\t' + str(dup[1][1]) + '\toverlaps previous stop: ' + str(stored_stop) + '. No promoter annotated.\n')
-                                                        remove_list.append(dup[1][4])
-                                                        stored_dup_start = int(dup[1][1])
-                                                        stored_dup_stop  = int(dup[1][2])
-
-                                    elif dup[1][3] != stored_strand:
-                                        print('pum')
-                                        if dup[1][3] == '+':
-                                            if int(dup[1][1]) < int(stored_start) and int(dup[1][2]) > int(stored_stop):
-                                                print('\tRemoving duplicate start site gene 1 as overlapping/nested within previous gene\n')
-                                                remove_list.append(dup[1][4])
-                                                stored_dup_start = int(dup[1][1])
-                                                stored_dup_stop  = int(dup[1][2])
-
-                                                print('\tAlso removing previous gene on -ve strand due to overlap\n\n')
-                                                remove_list.append(sorted_chrm_list[count-2][1][0][1][4])
+                        elif dup[1][3] != stored_strand:
+                            logger.debug('pum')
+                            if dup[1][3] == '+':
+                                if int(dup[1][1]) < int(stored_start) and int(dup[1][2]) > int(stored_stop):
+                                    logger.debug('\tRemoving duplicate start site gene 1 as overlapping/nested within previous gene')
+                                    remove_list.setdefault(dup[1][4], REMOVE_SHARED_START)
+                                    stored_dup_start = int(dup[1][1])
+                                    stored_dup_stop  = int(dup[1][2])
 
-                                            else:
-                                                if (stored_start + CIS_WINDOW) > int(dup[1][1]) and stored_start < int(dup[1][2]):
-                                                    dist = int(dup[1][1]) - stored_start
-                                                    print('Stored start:\t' + str(stored_start))
-                                                    print('Querey start:\t' + str(dup[1][1]))
-                                                    print('The distance between the genes is:\t' + str(dist))
-
-                                                    if dist <= 1:
-                                                        stored_dup_start = int(dup[1][1])
-                                                        stored_dup_stop  = int(dup[1][2])
-
-                                                        print('\nOverlapping gene - promoter not annotated')
-                                                        remove_list.append(dup[1][4])
-                                                        print('\nGene prior to overlapping pair also promoter not annotated due to overlap')
-                                                        remove_list.append(sorted_chrm_list[count-2][1][0][1][4])
-                                                        continue
-
-                                                    else:
-                                                        print('Allowed promoter region is\t' + str(int(dist/2)))
-                                                        try:
-                                                            print('Gene ' + str(sorted_chrm_list[count-2][1][0][1][4]) + ',\tstop:\t' + str(sorted_chrm_list[count-2][1][0][1][5]) + '\treplaces with ' + str(sorted_chrm_list[count-2][1][0][1][2]) + ' + ' + str(int(dist/2)))
-                                                            sorted_chrm_list[count-2][1][0][1][5] = int(sorted_chrm_list[count-2][1][0][1][2]) + int(dist/2)
-                                                        except IndexError:
-                                                            print('Gene ' + str(sorted_chrm_list[count-2][1][0][1][4]) + ',\tstop:\t' + str(sorted_chrm_list[count-2][1][0][1][2]) + '\treplaces with ' + str(sorted_chrm_list[count-2][1][0][1][2]) + ' + ' + str(int(dist/2)))
-                                                            sorted_chrm_list[count-2][1][0][1].append(int(sorted_chrm_list[count-2][1][0][1][2]) + int(dist/2))
-
-                                                        print('Gene ' + dup[1][4].strip() + ',\tstart:\t' + str(dup[1][1]) + '\treplaces with ' + str(dup[1][1]) + ' - ' + str(int(dist/2)))
-                                                        dup[1].append(int(dup[1][1]) - int(dist/2))
-                                                        stored_dup_start = int(dup[1][1])
-                                                        stored_dup_stop  = int(dup[1][2])
-                                                        stored_dup_prom  = int(dup[1][5])
-                                                        print('\n')
-
-                                                elif int(dup[1][1]) - CIS_WINDOW <= 0:
-                                                    dup[1].append(0)
-                                                    print('Gene ' + dup[1][4].strip() + ',\tstop:\t' + str(dup[1][1]) + ',\treplaces with 0')
-                                                    stored_dup_start = int(dup[1][1])
-                                                    stored_dup_stop  = int(dup[1][2])
-                                                    stored_dup_prom  = int(dup[1][5])
-                                                    print('\n')
-
-                                                else:
-                                                    if int(dup[1][1]) - CIS_WINDOW >= int(stored_stop):
-                                                        print('Gene ' + dup[1][4] + ' start:\t' + str(dup[1][1]) + '\treplaces with ' + dup[1][1] + ' - ' + str(CIS_WINDOW) + '\n')
-                                                        gene[1][0][1].append(int(dup[1][1]) - CIS_WINDOW)
-                                                        stored_dup_start = int(dup[1][1])
-                                                        stored_dup_stop  = int(dup[1][2])
-                                                        stored_dup_prom  = int(dup[1][5])
-
-                                                    else:
-                                                        print('\nGenes closer than ' + str(CIS_WINDOW) + ' - taking shorter promoter\n')
-                                                        print('Gene ' + dup[1][4] + ' start:\t' + str(dup[1][1]) + '\treplaces with ' + str(stored_stop))
-                                                        dup[1].append(int(stored_stop))
-                                                        stored_dup_start = int(dup[1][1])
-                                                        stored_dup_stop  = int(dup[1][2])
-                                                        stored_dup_prom  = int(dup[1][5])
+                                    logger.debug('\tAlso removing previous gene on -ve strand due to overlap')
+                                    remove_list.setdefault(sorted_chrm_list[count-2][1][0][1][4], REMOVE_BIDIRECTIONAL_OVERLAP)
+
+                                else:
+                                    if (stored_start + CIS_WINDOW) > int(dup[1][1]) and stored_start < int(dup[1][2]):
+                                        dist = int(dup[1][1]) - stored_start
+                                        logger.debug('Stored start:\t%s', stored_start)
+                                        logger.debug('Querey start:\t%s', dup[1][1])
+                                        logger.debug('The distance between the genes is:\t%s', dist)
+
+                                        if dist <= 1:
+                                            stored_dup_start = int(dup[1][1])
+                                            stored_dup_stop  = int(dup[1][2])
+
+                                            logger.debug('Overlapping gene - promoter not annotated')
+                                            remove_list.setdefault(dup[1][4], REMOVE_BIDIRECTIONAL_OVERLAP)
+                                            logger.debug('Gene prior to overlapping pair also promoter not annotated due to overlap')
+                                            remove_list.setdefault(sorted_chrm_list[count-2][1][0][1][4], REMOVE_BIDIRECTIONAL_OVERLAP)
+                                            continue
 
                                         else:
-                                            print('pum')
-                                            print(stored_start)
-                                            print(stored_stop)
-                                            print(dup[1])
-                                            dup[1].append(int(dup[1][2]) + CIS_WINDOW)
-
-                                            if int(dup[1][1]) >= int(stored_stop) and int(dup[1][2]) <= int(stored_start):
-                                                print('\nDuplicate is nested within earlier gene - removing annotation\n')
-                                                remove_list.append(dup[0])
-                                            else:
-                                                print('Gene ' + dup[1][4] + ',\tstop:\t' + str(dup[1][1]) + ',\treplaces with ' + dup[1][2] + ' + ' + str(CIS_WINDOW) + '\n')
-                                                print('\n')
-                                            stored_dup_start = int(dup[1][2])
-                                            stored_dup_stop  = int(dup[1][1])
+                                            logger.debug('Allowed promoter region is\t%s', int(dist/2))
+                                            try:
+                                                previous_stop = sorted_chrm_list[count-2][1][0][1][5]
+                                                logger.debug('Gene %s,\tstop:\t%s\treplaces with %s + %s', sorted_chrm_list[count-2][1][0][1][4], previous_stop, sorted_chrm_list[count-2][1][0][1][2], int(dist/2))
+                                                sorted_chrm_list[count-2][1][0][1][5] = int(sorted_chrm_list[count-2][1][0][1][2]) + int(dist/2)
+                                            except IndexError:
+                                                logger.debug('Gene %s,\tstop:\t%s\treplaces with %s + %s', sorted_chrm_list[count-2][1][0][1][4], sorted_chrm_list[count-2][1][0][1][2], sorted_chrm_list[count-2][1][0][1][2], int(dist/2))
+                                                sorted_chrm_list[count-2][1][0][1].append(int(sorted_chrm_list[count-2][1][0][1][2]) + int(dist/2))
+
+                                            logger.debug('Gene %s,\tstart:\t%s\treplaces with %s - %s', dup[1][4].strip(), dup[1][1], dup[1][1], int(dist/2))
+                                            dup[1].append(int(dup[1][1]) - int(dist/2))
+                                            stored_dup_start = int(dup[1][1])
+                                            stored_dup_stop  = int(dup[1][2])
                                             stored_dup_prom  = int(dup[1][5])
 
+                                    elif int(dup[1][1]) - CIS_WINDOW <= 0:
+                                        dup[1].append(0)
+                                        logger.debug('Gene %s,\tstop:\t%s,\treplaces with 0', dup[1][4].strip(), dup[1][1])
+                                        stored_dup_start = int(dup[1][1])
+                                        stored_dup_stop  = int(dup[1][2])
+                                        stored_dup_prom  = int(dup[1][5])
 
-                                elif dup[1][0] != stored_chr:
-                                    print('First of two start site duplicates is at the start of a new scaffold...\n')
-                                    if dup[1][3] == '+':
-                                        if int(dup[1][1]) - CIS_WINDOW <= 0:
-                                            dup[1].append(0)
-                                            print('Gene ' + dup[1][4].strip() + ',\tstop:\t' + str(dup[1][1]) + ',\treplaces with 0')
+                                    else:
+                                        if int(dup[1][1]) - CIS_WINDOW >= int(stored_stop):
+                                            logger.debug('Gene %s start:\t%s\treplaces with %s - %s', dup[1][4], dup[1][1], dup[1][1], CIS_WINDOW)
+                                            gene[1][0][1].append(int(dup[1][1]) - CIS_WINDOW)
                                             stored_dup_start = int(dup[1][1])
                                             stored_dup_stop  = int(dup[1][2])
                                             stored_dup_prom  = int(dup[1][5])
 
-                                            print('\n')
                                         else:
-                                            dup[1].append(int(dup[1][1]) - CIS_WINDOW)
-                                            print('Gene ' + dup[1][4].strip() + ',\tstop:\t' + str(dup[1][1]) + ',\treplaces with ' + str(dup[1][1]) + ' - ' + str(CIS_WINDOW) + '\n')
+                                            logger.debug('Genes closer than %s - taking shorter promoter', CIS_WINDOW)
+                                            logger.debug('Gene %s start:\t%s\treplaces with %s', dup[1][4], dup[1][1], stored_stop)
+                                            dup[1].append(int(stored_stop))
                                             stored_dup_start = int(dup[1][1])
                                             stored_dup_stop  = int(dup[1][2])
                                             stored_dup_prom  = int(dup[1][5])
 
-                    else:
-                        print('--- On gene =\t' + gene[1][0][0] + ' ' + gene[1][0][1][3])
-
-                        count = count + 1
-
-                        if gene[1][0][1][0] == stored_chr:
+                            else:
+                                logger.debug('pum')
+                                logger.debug(stored_start)
+                                logger.debug(stored_stop)
+                                logger.debug(dup[1])
+                                dup[1].append(int(dup[1][2]) + CIS_WINDOW)
+
+                                if int(dup[1][1]) >= int(stored_stop) and int(dup[1][2]) <= int(stored_start):
+                                    logger.debug('Duplicate is nested within earlier gene - removing annotation')
+                                    remove_list.setdefault(dup[0], REMOVE_SHARED_START)
+                                else:
+                                    logger.debug('Gene %s,\tstop:\t%s,\treplaces with %s + %s', dup[1][4], dup[1][1], dup[1][2], CIS_WINDOW)
+                                stored_dup_start = int(dup[1][2])
+                                stored_dup_stop  = int(dup[1][1])
+                                stored_dup_prom  = int(dup[1][5])
+
+
+                    elif dup[1][0] != stored_chr:
+                        logger.debug('First of two start site duplicates is at the start of a new scaffold...')
+                        if dup[1][3] == '+':
+                            if int(dup[1][1]) - CIS_WINDOW <= 0:
+                                dup[1].append(0)
+                                logger.debug('Gene %s,\tstop:\t%s,\treplaces with 0', dup[1][4].strip(), dup[1][1])
+                                stored_dup_start = int(dup[1][1])
+                                stored_dup_stop  = int(dup[1][2])
+                                stored_dup_prom  = int(dup[1][5])
 
-                            if gene[1][0][1][3] == stored_strand:
+                            else:
+                                dup[1].append(int(dup[1][1]) - CIS_WINDOW)
+                                logger.debug('Gene %s,\tstop:\t%s,\treplaces with %s - %s', dup[1][4].strip(), dup[1][1], dup[1][1], CIS_WINDOW)
+                                stored_dup_start = int(dup[1][1])
+                                stored_dup_stop  = int(dup[1][2])
+                                stored_dup_prom  = int(dup[1][5])
 
-                                if gene[1][0][1][3] == '-':
+        else:
+            logger.debug('--- On gene =\t%s %s', gene[1][0][0], gene[1][0][1][3])
 
-                                    if int(gene[1][0][1][2]) == int(stored_start) and int(gene[1][0][1][1]) == int(stored_stop):
+            count = count + 1
 
-                                        print('\n' + str(gene))
-                                        print(stored_start)
-                                        print('\n\n\nExact duplicate gene discovered on opposite strand - manually consult annotation...\n\n\n')
-                                        sys.exit()
+            if gene[1][0][1][0] == stored_chr:
 
-                                    print('Gene ' + gene[1][0][1][4].strip() + ' stop:\t' + str(gene[1][0][1][2]) + '\treplaces with ' + gene[1][0][1][2] + ' + ' + str(CIS_WINDOW) + '\n')
-                                    gene[1][0][1].append(int(gene[1][0][1][2]) + CIS_WINDOW)
+                if gene[1][0][1][3] == stored_strand:
 
-                                    strand_skip = '@'
+                    if gene[1][0][1][3] == '-':
 
-                                    if int(gene[1][0][1][1]) >= int(stored_start) + CIS_WINDOW:
+                        if int(gene[1][0][1][2]) == int(stored_start) and int(gene[1][0][1][1]) == int(stored_stop):
 
-                                        stored_start = int(gene[1][0][1][2])
-                                        stored_stop  = int(gene[1][0][1][1])
+                            logger.debug('%s', gene)
+                            logger.debug(stored_start)
+                            logger.debug('Exact duplicate gene discovered on opposite strand - manually consult annotation...')
+                            sys.exit()
 
-                                    else:
+                        logger.debug('Gene %s stop:\t%s\treplaces with %s + %s', gene[1][0][1][4].strip(), gene[1][0][1][2], gene[1][0][1][2], CIS_WINDOW)
+                        gene[1][0][1].append(int(gene[1][0][1][2]) + CIS_WINDOW)
 
-                                        print('\nGenes closer than ' + str(CIS_WINDOW) + ' - editting previous promoter\n')
+                        strand_skip = '@'
 
-                                        if len(sorted_chrm_list[count-2][1]) == 1:
+                        if int(gene[1][0][1][1]) >= int(stored_start) + CIS_WINDOW:
 
-                                            if int(stored_start) > int(gene[1][0][1][2]) > int(stored_stop):
-                                                print('Gene nested or overlapping previous gene on same strand - promoter not annotated\n')
-                                                remove_list.append(gene[1][0][1][4])
+                            stored_start = int(gene[1][0][1][2])
+                            stored_stop  = int(gene[1][0][1][1])
 
-                                            if int(gene[1][0][1][2]) >= int(stored_start) > int(gene[1][0][1][1]):
-                                                print('Gene nested or overlapping previous gene on same strand - promoter not annotated\n')
-                                                remove_list.append(gene[1][0][1][4])
-                                                print('Previous gene nested or overlapping previous gene on same strand - promoter annotation removed\n')
-                                                remove_list.append(sorted_chrm_list[count-2][1][0][1][4])
-                                                stored_start = int(gene[1][0][1][2])
-                                                stored_stop  = int(gene[1][0][1][1])
+                        else:
 
-                                            else:
+                            logger.debug('Genes closer than %s - editting previous promoter', CIS_WINDOW)
 
-                                                if gene[1][0][1][4] not in remove_list:
+                            if len(sorted_chrm_list[count-2][1]) == 1:
 
-                                                    if sorted_chrm_list[count-2][1][0][0] not in remove_list:
+                                if int(stored_start) > int(gene[1][0][1][2]) > int(stored_stop):
+                                    logger.debug('Gene nested or overlapping previous gene on same strand - promoter not annotated')
+                                    remove_list.setdefault(gene[1][0][1][4], REMOVE_NESTED)
 
-                                                        print('\tGene ' + sorted_chrm_list[count-2][1][0][1][4] + ' stop:\t' + str(sorted_chrm_list[count-2][1][0][1][2]) + '\treplaces with ' +  gene[1][0][1][1])
+                                if int(gene[1][0][1][2]) >= int(stored_start) > int(gene[1][0][1][1]):
+                                    logger.debug('Gene nested or overlapping previous gene on same strand - promoter not annotated')
+                                    remove_list.setdefault(gene[1][0][1][4], REMOVE_NESTED)
+                                    logger.debug('Previous gene nested or overlapping previous gene on same strand - promoter annotation removed')
+                                    remove_list.setdefault(sorted_chrm_list[count-2][1][0][1][4], REMOVE_NESTED)
+                                    stored_start = int(gene[1][0][1][2])
+                                    stored_stop  = int(gene[1][0][1][1])
 
-                                                        if len(sorted_chrm_list[count-2][1][0][1]) == 6:
-                                                            sorted_chrm_list[count-2][1][0][1][5] = int(gene[1][0][1][1])
-                                                        else:
-                                                            sorted_chrm_list[count-2][1][0][1].append(gene[1][0][1][1])
+                                else:
 
-                                                        if sorted_chrm_list[count-2][1][0][1][4] not in remove_list:
-                                                            stored_start = int(gene[1][0][1][2])
-                                                            stored_stop  = int(gene[1][0][1][1])
+                                    if gene[1][0][1][4] not in remove_list:
 
-                                                    else:
-                                                        print('Gene to be edited is to be removed - skipping')
-                                                        stored_start = int(gene[1][0][1][2])
-                                                        stored_stop  = int(gene[1][0][1][1])
+                                        if sorted_chrm_list[count-2][1][0][0] not in remove_list:
 
-                                        elif len(sorted_chrm_list[count-2][1]) == 2:
-                                            if sorted_chrm_list[count-2][1][1][1][3] == gene[1][0][1][3]:
-                                                print('\tGene ' + sorted_chrm_list[count-2][1][1][1][4] + ' stop:\t' + str(sorted_chrm_list[count-2][1][1][1][2]) + '\t + replaces with ' +  gene[1][0][1][1])
+                                            logger.debug('\tGene %s stop:\t%s\treplaces with %s', sorted_chrm_list[count-2][1][0][1][4], sorted_chrm_list[count-2][1][0][1][2], gene[1][0][1][1])
 
-                                                try:
-                                                    sorted_chrm_list[count-2][1][1][1][5] = int(gene[1][0][1][1])
-                                                except(IndexError):
-                                                    print('\n\t!!! Missing annotation appended...\n')
-                                                    sorted_chrm_list[count-2][1][1][1].append(int(gene[1][0][1][1]))
+                                            if len(sorted_chrm_list[count-2][1][0][1]) == 6:
+                                                sorted_chrm_list[count-2][1][0][1][5] = int(gene[1][0][1][1])
                                             else:
-                                                print('\tGene ' + sorted_chrm_list[count-2][1][0][1][4] + ' stop:\t' + str(sorted_chrm_list[count-2][1][0][1][2]) + '\t + replaces with ' +  gene[1][0][1][1])
+                                                sorted_chrm_list[count-2][1][0][1].append(gene[1][0][1][1])
+
+                                            if sorted_chrm_list[count-2][1][0][1][4] not in remove_list:
+                                                stored_start = int(gene[1][0][1][2])
+                                                stored_stop  = int(gene[1][0][1][1])
 
-                                                try:
-                                                    sorted_chrm_list[count-2][1][0][1][5] = int(gene[1][0][1][1])
-                                                except(IndexError):
-                                                    print('\n\t!!! Missing annotation appended...\n')
-                                                    sorted_chrm_list[count-2][1][0][1].append(int(gene[1][0][1][1]))
+                                        else:
+                                            logger.debug('Gene to be edited is to be removed - skipping')
                                             stored_start = int(gene[1][0][1][2])
                                             stored_stop  = int(gene[1][0][1][1])
 
-                                    print('\n')
+                            elif len(sorted_chrm_list[count-2][1]) == 2:
+                                if sorted_chrm_list[count-2][1][1][1][3] == gene[1][0][1][3]:
+                                    logger.debug('\tGene %s stop:\t%s\t + replaces with %s', sorted_chrm_list[count-2][1][1][1][4], sorted_chrm_list[count-2][1][1][1][2], gene[1][0][1][1])
 
-                                elif gene[1][0][1][3] == '+':
+                                    try:
+                                        sorted_chrm_list[count-2][1][1][1][5] = int(gene[1][0][1][1])
+                                    except(IndexError):
+                                        logger.debug('\t!!! Missing annotation appended...')
+                                        sorted_chrm_list[count-2][1][1][1].append(int(gene[1][0][1][1]))
+                                else:
+                                    logger.debug('\tGene %s stop:\t%s\t + replaces with %s', sorted_chrm_list[count-2][1][0][1][4], sorted_chrm_list[count-2][1][0][1][2], gene[1][0][1][1])
 
-                                    if stored_start == 0:
-                                        gene[1][0][1].append(0)
-                                        print('Gene ' + gene[1][0][1][4].strip() + ' start:\t' + str(gene[1][0][1][1]) + '\treplaces with 0')
-                                        stored_start  = int(gene[1][0][1][1])
-                                        stored_stop   = int(gene[1][0][1][2])
-                                        stored_strand = gene[1][0][1][3]
-                                        print('\n')
+                                    try:
+                                        sorted_chrm_list[count-2][1][0][1][5] = int(gene[1][0][1][1])
+                                    except(IndexError):
+                                        logger.debug('\t!!! Missing annotation appended...')
+                                        sorted_chrm_list[count-2][1][0][1].append(int(gene[1][0][1][1]))
+                                stored_start = int(gene[1][0][1][2])
+                                stored_stop  = int(gene[1][0][1][1])
 
-                                    else:
 
-                                        if int(gene[1][0][1][1]) - CIS_WINDOW >= int(stored_stop):
-                                            print('Gene ' + gene[1][0][1][4].strip() + ' start:\t' + str(gene[1][0][1][1]) + '\treplaces with ' + gene[1][0][1][1] + ' - ' + str(CIS_WINDOW) + '\n')
-                                            gene[1][0][1].append(int(gene[1][0][1][1]) - CIS_WINDOW)
-                                            stored_start = int(gene[1][0][1][1])
-                                            stored_stop  = int(gene[1][0][1][2])
-                                            strand_skip = '@'
+                    elif gene[1][0][1][3] == '+':
 
-                                        elif int(stored_stop) > int(gene[1][0][1][1]) > int(stored_start):
-                                            print('Gene nested or overlapping previous gene on same strand - promoter not annotated\n')
-                                            remove_list.append(gene[1][0][1][4])
+                        if stored_start == 0:
+                            gene[1][0][1].append(0)
+                            logger.debug('Gene %s start:\t%s\treplaces with 0', gene[1][0][1][4].strip(), gene[1][0][1][1])
+                            stored_start  = int(gene[1][0][1][1])
+                            stored_stop   = int(gene[1][0][1][2])
+                            stored_strand = gene[1][0][1][3]
 
-                                        else:
+                        else:
 
-                                            print('\nGenes closer than ' + str(CIS_WINDOW) + ' - taking shorter promoter\n')
+                            if int(gene[1][0][1][1]) - CIS_WINDOW >= int(stored_stop):
+                                logger.debug('Gene %s start:\t%s\treplaces with %s - %s', gene[1][0][1][4].strip(), gene[1][0][1][1], gene[1][0][1][1], CIS_WINDOW)
+                                gene[1][0][1].append(int(gene[1][0][1][1]) - CIS_WINDOW)
+                                stored_start = int(gene[1][0][1][1])
+                                stored_stop  = int(gene[1][0][1][2])
+                                strand_skip = '@'
 
-                                            print('Gene ' + gene[1][0][1][4].strip() + ' start:\t' + str(gene[1][0][1][1]) + '\treplaces with ' + gene[1][0][1][1] + ' - ' + str(int(gene[1][0][1][1]) - int(stored_stop)))
+                            elif int(stored_stop) > int(gene[1][0][1][1]) > int(stored_start):
+                                logger.debug('Gene nested or overlapping previous gene on same strand - promoter not annotated')
+                                remove_list.setdefault(gene[1][0][1][4], REMOVE_NESTED)
 
-                                            gene[1][0][1].append(int(stored_stop))
-                                            stored_start = int(gene[1][0][1][1])
-                                            stored_stop  = int(gene[1][0][1][2])
-                                            strand_skip = '@'
+                            else:
 
-                                        print('\n')
+                                logger.debug('Genes closer than %s - taking shorter promoter', CIS_WINDOW)
 
-                                    stored_strand = gene[1][0][1][3]
+                                logger.debug('Gene %s start:\t%s\treplaces with %s - %s', gene[1][0][1][4].strip(), gene[1][0][1][1], gene[1][0][1][1], int(gene[1][0][1][1]) - int(stored_stop))
 
-                            elif gene[1][0][1][3] != stored_strand:
-                                print ('Current strand: '+ gene[1][0][1][3] + ' | Stored strand: ' + stored_strand)
+                                gene[1][0][1].append(int(stored_stop))
+                                stored_start = int(gene[1][0][1][1])
+                                stored_stop  = int(gene[1][0][1][2])
+                                strand_skip = '@'
 
-                                if gene[1][0][1][3] == '+':
 
-                                    if int(stored_start + CIS_WINDOW) > int(gene[1][0][1][1]) and stored_start < int(gene[1][0][1][2]):
-                                        dist = int(gene[1][0][1][1]) - int(stored_start)
-                                        print('Stored start:\t' + str(stored_start))
-                                        print('Querey start:\t' + str(gene[1][0][1][1]))
-                                        print('The distance between the genes is:\t' + str(dist))
+                        stored_strand = gene[1][0][1][3]
 
-                                        if dist <= 1:
-                                            print('\nOverlapping gene - promoter not annotated')
+                elif gene[1][0][1][3] != stored_strand:
+                    logger.debug('Current strand: %s | Stored strand: %s', gene[1][0][1][3], stored_strand)
 
-                                            remove_list.append(gene[1][0][1][4])
-                                            print('Also removing previous promoter annotation due to overlap')
-                                            remove_list.append(sorted_chrm_list[count-2][1][0][1][4])
-                                            stored_start = int(gene[1][0][1][1])
-                                            stored_stop  = int(gene[1][0][1][2])
-                                            print('\n')
-                                            strand_skip  = '@'
+                    if gene[1][0][1][3] == '+':
 
-                                        else:
+                        if int(stored_start + CIS_WINDOW) > int(gene[1][0][1][1]) and stored_start < int(gene[1][0][1][2]):
+                            dist = int(gene[1][0][1][1]) - int(stored_start)
+                            logger.debug('Stored start:\t%s', stored_start)
+                            logger.debug('Querey start:\t%s', gene[1][0][1][1])
+                            logger.debug('The distance between the genes is:\t%s', dist)
 
-                                            print('Allowed promoter region is\t' + str(int(dist/2)))
-
-                                            if len(sorted_chrm_list[count-2][1]) == 1:
-
-                                                if strand_skip == '@':
-                                                    print('Gene ' + str(sorted_chrm_list[count-2][1][0][1][4].strip()) + '  stop:  ' + str(sorted_chrm_list[count-2][1][0][1][5]) + '\treplaces with\t' + str(sorted_chrm_list[count-2][1][0][1][2]) + ' + ' + str(int(dist/2)))
-                                                    print('Gene ' + gene[1][0][1][4] + ' start:  ' + str(gene[1][0][1][1]) + '\treplaces with\t' + str(gene[1][0][1][1]) + ' - ' + str(int(dist/2)))
-                                                    gene[1][0][1].append(int(gene[1][0][1][1]) - int(dist/2))
-
-                                                    sorted_chrm_list[count-2][1][0][1][5] = int(sorted_chrm_list[count-2][1][0][1][2]) + int(dist/2)
-                                                    stored_start = int(gene[1][0][1][1])
-                                                    stored_stop  = int(gene[1][0][1][2])
-                                                    print('\n')
-                                                else:
-                                                    print(strand_skip)
-                                                    try:
-                                                        print('PREVIOUS Gene ' + str(sorted_chrm_list[count-nesting_counter][1][0][1][4].strip()) + '  stop:  ' + str(sorted_chrm_list[count-nesting_counter][1][0][1][5]) + '\treplaces with\t' + str(sorted_chrm_list[count-nesting_counter][1][0][1][2]) + ' + ' + str(int(dist/2)))
-                                                        print('Gene ' + gene[1][0][1][4] + ' start:  ' + str(gene[1][0][1][1]) + '\treplaces with\t' + str(gene[1][0][1][1]) + ' - ' + str(int(dist/2)))
-                                                        gene[1][0][1].append(int(gene[1][0][1][1]) - int(dist/2))
-
-                                                        sorted_chrm_list[count-nesting_counter][1][0][1][5] = int(sorted_chrm_list[count-nesting_counter][1][0][1][2]) + int(dist/2)
-                                                        stored_start = int(gene[1][0][1][1])
-                                                        stored_stop  = int(gene[1][0][1][2])
-                                                        print('\n')
-                                                    except IndexError:
-                                                        print(str(sorted_chrm_list[count-4][1][0][1][4].strip()))
-                                                        print(str(sorted_chrm_list[count-3][1][0][1][4].strip()))
-                                                        print(str(sorted_chrm_list[count-2][1][0][1][4].strip()))
-                                                        print(count)
-                                                        print(nesting_counter)
-                                                        print(str(sorted_chrm_list[count-nesting_counter][1][0][1][4].strip()))
-                                                        print('fooked')
-                                                        # print('PREVIOUS Gene ' + str(sorted_chrm_list[count-4][1][0][1][4].strip()) + '  stop:  ' + str(sorted_chrm_list[count-4][1][0][1][5]) + '\treplaces with\t' + str(sorted_chrm_list[count-3][1][0][1][2]) + ' + ' + str(int(dist/2)))
-                                                        # print('Gene ' + gene[1][0][1][4] + ' start:  ' + str(gene[1][0][1][1]) + '\treplaces with\t' + str(gene[1][0][1][1]) + ' - ' + str(int(dist/2)))
-                                                        # gene[1][0][1].append(int(gene[1][0][1][1]) - int(dist/2))
-                                                        #
-                                                        # sorted_chrm_list[count-4][1][0][1][5] = int(sorted_chrm_list[count-4][1][0][1][2]) + int(dist/2)
-                                                        # stored_start = int(gene[1][0][1][1])
-                                                        # stored_stop  = int(gene[1][0][1][2])
-                                                        # print('\n')
-
-                                            elif len(sorted_chrm_list[count-2][1]) > 1:
-
-                                                if dup[1][3] != sorted_chrm_list[count-2][1][0][1][3]:
-                                                    try:
-                                                        print('Gene ' + str(sorted_chrm_list[count-2][1][0][1][4]) + '  stop:  ' + str(sorted_chrm_list[count-2][1][0][1][5]) + '\treplaces with\t' + str(sorted_chrm_list[count-2][1][0][1][2]) + ' + ' + str(int(dist/2)))
-                                                    except(IndexError):
-                                                        print('\n\t!!! Missing annotation appended to dup 1...\n')
-                                                        sorted_chrm_list[count-2][1][0][1].append(int(sorted_chrm_list[count-2][1][0][1][2]) + int(dist/2))
-                                                else:
-
-                                                    try:
-                                                        print('Gene ' + str(sorted_chrm_list[count-2][1][-1][1][4].strip()) + '  stop:  ' + str(sorted_chrm_list[count-2][1][-1][1][5]) + '\treplaces with\t' + str(sorted_chrm_list[count-2][1][-1][1][2]) + ' + ' + str(int(dist/2)))
-
-                                                        for loc in range(len(sorted_chrm_list[count-2][1])):
-                                                            sorted_chrm_list[count-2][1][loc][1][5] = int(sorted_chrm_list[count-2][1][-1][1][2]) + int(dist/2)
-
-                                                    except(IndexError):
-                                                        print('\n\t!!! Missing annotation appended to dup 2...\n')
-                                                        sorted_chrm_list[count-2][1][-1][1].append(int(sorted_chrm_list[count-2][1][-1][1][2]) + int(dist/2))
-
-                                                print('Gene ' + gene[1][0][1][4] + ' start:  ' + str(gene[1][0][1][1]) + '\treplaces with\t' + str(gene[1][0][1][1]) + ' - ' + str(int(dist/2)))
-                                                gene[1][0][1].append(int(gene[1][0][1][1]) - int(dist/2))
-
-                                                try:
-                                                    print(sorted_chrm_list[count-2][1][1][1][5])
-                                                except(KeyError):
-                                                    print('None stored')
-
-                                                stored_start = int(gene[1][0][1][1])
-                                                stored_stop  = int(gene[1][0][1][2])
-                                                print('\n')
-                                            strand_skip  = '@'
-
-                                    elif int(gene[1][0][1][1]) - CIS_WINDOW <= 0:
-
-                                        if int(gene[1][0][1][1]) - int(stored_stop) > 0:
-                                            gene[1][0][1].append(0)
-                                            print('Gene ' + gene[1][0][1][4].strip() + ' start:\t' + str(gene[1][0][1][1]) + '\treplaces with 0\n')
-                                            stored_start = int(gene[1][0][1][1])
-                                            print('\n')
+                            if dist <= 1:
+                                logger.debug('Overlapping gene - promoter not annotated')
 
-                                        else:
-                                            remove_list.append(gene[1][0][1][4])
-                                            print('Gene overlapping previous on negative strand - promoter not annotated\n')
+                                remove_list.setdefault(gene[1][0][1][4], REMOVE_BIDIRECTIONAL_OVERLAP)
+                                logger.debug('Also removing previous promoter annotation due to overlap')
+                                remove_list.setdefault(sorted_chrm_list[count-2][1][0][1][4], REMOVE_BIDIRECTIONAL_OVERLAP)
+                                stored_start = int(gene[1][0][1][1])
+                                stored_stop  = int(gene[1][0][1][2])
+                                strand_skip  = '@'
 
-                                        strand_skip  = '@'
+                            else:
 
-                                    elif int(stored_start + CIS_WINDOW) > int(gene[1][0][1][1]) and int(stored_start) >= int(gene[1][0][1][2]):
-                                        print('Gene nested within another - promoter not annotated')
-                                        remove_list.append(gene[1][0][1][4])
-                                        if strand_skip == '@':
-                                            nesting_counter = 3
-                                        else:
-                                            nesting_counter = nesting_counter + 1
-                                        print(nesting_counter)
-                                        strand_skip = stored_strand
-                                        print('\n')
+                                logger.debug('Allowed promoter region is\t%s', int(dist/2))
 
-                                    else:
-                                        gene[1][0][1].append(int(gene[1][0][1][1]) - CIS_WINDOW)
-                                        print('Gene ' + gene[1][0][1][4].strip() + ' start:\t' + str(gene[1][0][1][1]) + '\treplaces with ' + gene[1][0][1][1] + ' - ' + str(CIS_WINDOW) + '\n')
+                                if len(sorted_chrm_list[count-2][1]) == 1:
+
+                                    if strand_skip == '@':
+                                        previous_stop = sorted_chrm_list[count-2][1][0][1][5]
+                                        logger.debug('Gene %s  stop:  %s\treplaces with\t%s + %s', sorted_chrm_list[count-2][1][0][1][4].strip(), previous_stop, sorted_chrm_list[count-2][1][0][1][2], int(dist/2))
+                                        logger.debug('Gene %s start:  %s\treplaces with\t%s - %s', gene[1][0][1][4], gene[1][0][1][1], gene[1][0][1][1], int(dist/2))
+                                        gene[1][0][1].append(int(gene[1][0][1][1]) - int(dist/2))
+
+                                        sorted_chrm_list[count-2][1][0][1][5] = int(sorted_chrm_list[count-2][1][0][1][2]) + int(dist/2)
                                         stored_start = int(gene[1][0][1][1])
                                         stored_stop  = int(gene[1][0][1][2])
-                                        strand_skip  = '@'
-                                        print('\n')
+                                    else:
+                                        logger.debug(strand_skip)
+                                        try:
+                                            previous_stop = sorted_chrm_list[count-nesting_counter][1][0][1][5]
+                                            logger.debug('PREVIOUS Gene %s  stop:  %s\treplaces with\t%s + %s', sorted_chrm_list[count-nesting_counter][1][0][1][4].strip(), previous_stop, sorted_chrm_list[count-nesting_counter][1][0][1][2], int(dist/2))
+                                            logger.debug('Gene %s start:  %s\treplaces with\t%s - %s', gene[1][0][1][4], gene[1][0][1][1], gene[1][0][1][1], int(dist/2))
+                                            gene[1][0][1].append(int(gene[1][0][1][1]) - int(dist/2))
+
+                                            sorted_chrm_list[count-nesting_counter][1][0][1][5] = int(sorted_chrm_list[count-nesting_counter][1][0][1][2]) + int(dist/2)
+                                            stored_start = int(gene[1][0][1][1])
+                                            stored_stop  = int(gene[1][0][1][2])
+                                        except IndexError:
+                                            logger.debug('%s', sorted_chrm_list[count-4][1][0][1][4].strip())
+                                            logger.debug('%s', sorted_chrm_list[count-3][1][0][1][4].strip())
+                                            logger.debug('%s', sorted_chrm_list[count-2][1][0][1][4].strip())
+                                            logger.debug(count)
+                                            logger.debug(nesting_counter)
+                                            logger.debug('%s', sorted_chrm_list[count-nesting_counter][1][0][1][4].strip())
+                                            logger.debug('fooked')
+                                            # print('PREVIOUS Gene ' + str(sorted_chrm_list[count-4][1][0][1][4].strip()) + '  stop:  ' + str(sorted_chrm_list[count-4][1][0][1][5]) + '\treplaces with\t' + str(sorted_chrm_list[count-3][1][0][1][2]) + ' + ' + str(int(dist/2)))
+                                            # print('Gene ' + gene[1][0][1][4] + ' start:  ' + str(gene[1][0][1][1]) + '\treplaces with\t' + str(gene[1][0][1][1]) + ' - ' + str(int(dist/2)))
+                                            # gene[1][0][1].append(int(gene[1][0][1][1]) - int(dist/2))
+                                            #
+                                            # sorted_chrm_list[count-4][1][0][1][5] = int(sorted_chrm_list[count-4][1][0][1][2]) + int(dist/2)
+                                            # stored_start = int(gene[1][0][1][1])
+                                            # stored_stop  = int(gene[1][0][1][2])
+                                            # print('\n')
+
+                                elif len(sorted_chrm_list[count-2][1]) > 1:
+
+                                    if dup[1][3] != sorted_chrm_list[count-2][1][0][1][3]:
+                                        try:
+                                            previous_stop = sorted_chrm_list[count-2][1][0][1][5]
+                                            logger.debug('Gene %s  stop:  %s\treplaces with\t%s + %s', sorted_chrm_list[count-2][1][0][1][4], previous_stop, sorted_chrm_list[count-2][1][0][1][2], int(dist/2))
+                                        except(IndexError):
+                                            logger.debug('\t!!! Missing annotation appended to dup 1...')
+                                            sorted_chrm_list[count-2][1][0][1].append(int(sorted_chrm_list[count-2][1][0][1][2]) + int(dist/2))
+                                    else:
 
-                                else:
-                                    gene[1][0][1].append(int(gene[1][0][1][2]) + CIS_WINDOW)
-                                    print('Gene ' + gene[1][0][1][4].strip() + ' stop:\t' + str(gene[1][0][1][2]) + '\treplaces with ' + gene[1][0][1][2] + ' + ' + str(CIS_WINDOW) + '\n')
+                                        try:
+                                            previous_stop = sorted_chrm_list[count-2][1][-1][1][5]
+                                            logger.debug('Gene %s  stop:  %s\treplaces with\t%s + %s', sorted_chrm_list[count-2][1][-1][1][4].strip(), previous_stop, sorted_chrm_list[count-2][1][-1][1][2], int(dist/2))
 
-                                    if strand_skip == gene[1][0][1][3] and int(stored_start) + CIS_WINDOW > int(gene[1][0][1][1]):
+                                            for loc in range(len(sorted_chrm_list[count-2][1])):
+                                                sorted_chrm_list[count-2][1][loc][1][5] = int(sorted_chrm_list[count-2][1][-1][1][2]) + int(dist/2)
 
-                                        print('\nGene prior to nested genes closer than ' + str(CIS_WINDOW) + ' - editting previous promoter\n')
+                                        except(IndexError):
+                                            logger.debug('\t!!! Missing annotation appended to dup 2...')
+                                            sorted_chrm_list[count-2][1][-1][1].append(int(sorted_chrm_list[count-2][1][-1][1][2]) + int(dist/2))
 
-                                        if len(sorted_chrm_list[count-2][1]) == 1:
+                                    logger.debug('Gene %s start:  %s\treplaces with\t%s - %s', gene[1][0][1][4], gene[1][0][1][1], gene[1][0][1][1], int(dist/2))
+                                    gene[1][0][1].append(int(gene[1][0][1][1]) - int(dist/2))
 
-                                            if int(stored_start) > int(gene[1][0][1][2]) > int(stored_stop):
-                                                print('Gene nested or overlapping previous gene on same strand - promoter not annotated\n')
-                                                remove_list.append(gene[1][0][1][4])
+                                    if logger.isEnabledFor(logging.DEBUG):
+                                        try:
+                                            logger.debug(sorted_chrm_list[count-2][1][1][1][5])
+                                        except(KeyError, IndexError):
+                                            logger.debug('None stored')
 
-                                            if int(gene[1][0][1][2]) > int(stored_start) > int(gene[1][0][1][1]):
-                                                print('Previous gene nested or overlapping previous gene on same strand - promoter annotation removed\n')
-                                                remove_list.append(sorted_chrm_list[count-2][1][0][1][4])
+                                    stored_start = int(gene[1][0][1][1])
+                                    stored_stop  = int(gene[1][0][1][2])
+                                strand_skip  = '@'
 
-                                            else:
+                        elif int(gene[1][0][1][1]) - CIS_WINDOW <= 0:
 
-                                                if sorted_chrm_list[count-2][1][0][1][4] in remove_list:
-                                                    print('\tGene ' + sorted_chrm_list[count-3][1][0][1][4] + ' stop:\t' + str(sorted_chrm_list[count-3][1][0][1][2]) + '\treplaces with ' +  gene[1][0][1][1])
-                                                    strand_skip = '@'
+                            if int(gene[1][0][1][1]) - int(stored_stop) > 0:
+                                gene[1][0][1].append(0)
+                                logger.debug('Gene %s start:\t%s\treplaces with 0', gene[1][0][1][4].strip(), gene[1][0][1][1])
+                                stored_start = int(gene[1][0][1][1])
 
-                                                elif sorted_chrm_list[count-3][1][0][1][4] not in remove_list:
-                                                    print('\tGene ' + sorted_chrm_list[count-3][1][0][1][4] + ' stop:\t' + str(sorted_chrm_list[count-3][1][0][1][2]) + '\treplaces with ' +  gene[1][0][1][1])
-                                                    sorted_chrm_list[count-3][1][0][1][5] = int(gene[1][0][1][1])
-                                                    strand_skip = '@'
+                            else:
+                                remove_list.setdefault(gene[1][0][1][4], REMOVE_BIDIRECTIONAL_OVERLAP)
+                                logger.debug('Gene overlapping previous on negative strand - promoter not annotated')
 
-                                                elif sorted_chrm_list[count-4][1][0][1][4] not in remove_list:
-                                                    print('\tGene ' + sorted_chrm_list[count-3][1][0][1][4] + ' stop:\t' + str(sorted_chrm_list[count-4][1][0][1][2]) + '\treplaces with ' +  gene[1][0][1][1])
-                                                    sorted_chrm_list[count-4][1][0][1][5] = int(gene[1][0][1][1])
-                                                    strand_skip = '@'
+                            strand_skip  = '@'
 
-                                                else:
-                                                    print('\n\n\nToooo much nesting - this script cannot handle the level of gene overlap in the annotation provided\n\n\n')
-                                                    sys.exit()
+                        elif int(stored_start + CIS_WINDOW) > int(gene[1][0][1][1]) and int(stored_start) >= int(gene[1][0][1][2]):
+                            logger.debug('Gene nested within another - promoter not annotated')
+                            remove_list.setdefault(gene[1][0][1][4], REMOVE_NESTED)
+                            if strand_skip == '@':
+                                nesting_counter = 3
+                            else:
+                                nesting_counter = nesting_counter + 1
+                            logger.debug(nesting_counter)
+                            strand_skip = stored_strand
 
-                                        elif len(sorted_chrm_list[count-2][1]) == 2:
-                                            if sorted_chrm_list[count-2][1][1][1][3] == gene[1][0][1][3]:
+                        else:
+                            gene[1][0][1].append(int(gene[1][0][1][1]) - CIS_WINDOW)
+                            logger.debug('Gene %s start:\t%s\treplaces with %s - %s', gene[1][0][1][4].strip(), gene[1][0][1][1], gene[1][0][1][1], CIS_WINDOW)
+                            stored_start = int(gene[1][0][1][1])
+                            stored_stop  = int(gene[1][0][1][2])
+                            strand_skip  = '@'
 
-                                                print('\tGene ' + sorted_chrm_list[count-2][1][1][1][4] + ' stop:\t' + str(sorted_chrm_list[count-2][1][1][1][2]) + '\t + replaces with ' +  gene[1][0][1][1])
+                    else:
+                        gene[1][0][1].append(int(gene[1][0][1][2]) + CIS_WINDOW)
+                        logger.debug('Gene %s stop:\t%s\treplaces with %s + %s', gene[1][0][1][4].strip(), gene[1][0][1][2], gene[1][0][1][2], CIS_WINDOW)
 
-                                                try:
-                                                    sorted_chrm_list[count-2][1][1][1][5] = int(gene[1][0][1][1])
-                                                except(IndexError):
-                                                    print('\n\t!!! Missing annotation appended...\n')
-                                                    sorted_chrm_list[count-2][1][1][1].append(int(gene[1][0][1][1]))
-                                            else:
-                                                print('\tGene ' + sorted_chrm_list[count-(2+len(sorted_chrm_list[count-2][1]))][1][0][1][4] + ' stop:\t' + str(sorted_chrm_list[count-(2+len(sorted_chrm_list[count-2][1]))][1][0][1][2]) + '\t + replaces with ' +  gene[1][0][1][1])
+                        if strand_skip == gene[1][0][1][3] and int(stored_start) + CIS_WINDOW > int(gene[1][0][1][1]):
 
-                                                try:
-                                                    sorted_chrm_list[count-(2+len(sorted_chrm_list[count-2][1]))][1][0][1][5] = int(gene[1][0][1][1])
-                                                except(IndexError):
-                                                    print('\n\t!!! Missing annotation appended...\n')
-                                                    sorted_chrm_list[count-(2+len(sorted_chrm_list[count-2][1]))][1][0][1].append(int(gene[1][0][1][1]))
+                            logger.debug('Gene prior to nested genes closer than %s - editting previous promoter', CIS_WINDOW)
 
-                                    print('\n')
+                            if len(sorted_chrm_list[count-2][1]) == 1:
 
-                                    stored_start = int(gene[1][0][1][2])
-                                    stored_stop  = int(gene[1][0][1][1])
+                                if int(stored_start) > int(gene[1][0][1][2]) > int(stored_stop):
+                                    logger.debug('Gene nested or overlapping previous gene on same strand - promoter not annotated')
+                                    remove_list.setdefault(gene[1][0][1][4], REMOVE_NESTED)
+
+                                if int(gene[1][0][1][2]) > int(stored_start) > int(gene[1][0][1][1]):
+                                    logger.debug('Previous gene nested or overlapping previous gene on same strand - promoter annotation removed')
+                                    remove_list.setdefault(sorted_chrm_list[count-2][1][0][1][4], REMOVE_NESTED)
 
-                                if strand_skip == '@':
-                                    stored_strand = gene[1][0][1][3]
                                 else:
-                                    stored_strand = strand_skip
 
-                        elif gene[1][0][1][0] != stored_chr:
+                                    if sorted_chrm_list[count-2][1][0][1][4] in remove_list:
+                                        logger.debug('\tGene %s stop:\t%s\treplaces with %s', sorted_chrm_list[count-3][1][0][1][4], sorted_chrm_list[count-3][1][0][1][2], gene[1][0][1][1])
+                                        strand_skip = '@'
 
-                            if gene[1][0][1][3] == '-':
-                                print('Gene ' + gene[1][0][1][4] + ' stop:\t' + str(gene[1][0][1][2]) + '\treplaces with ' + gene[1][0][1][2] + ' + ' + str(CIS_WINDOW) + '\n')
-                                gene[1][0][1].append(int(gene[1][0][1][2])+ CIS_WINDOW)
-                                stored_start  = int(gene[1][0][1][2])
-                                stored_stop   = int(gene[1][0][1][1])
-                                stored_strand = gene[1][0][1][3]
+                                    elif sorted_chrm_list[count-3][1][0][1][4] not in remove_list:
+                                        logger.debug('\tGene %s stop:\t%s\treplaces with %s', sorted_chrm_list[count-3][1][0][1][4], sorted_chrm_list[count-3][1][0][1][2], gene[1][0][1][1])
+                                        sorted_chrm_list[count-3][1][0][1][5] = int(gene[1][0][1][1])
+                                        strand_skip = '@'
 
-                            elif gene[1][0][1][3] == '+' and int(gene[1][0][1][1]) - CIS_WINDOW <= 0:
-                                gene[1][0][1].append(0)
-                                print('Gene ' + gene[1][0][1][4] + ' start:\t' + str(gene[1][0][1][1]) + '\treplaces with 0')
-                                stored_start = int(gene[1][0][1][1])
-                                stored_stop  = int(gene[1][0][1][2])
+                                    elif sorted_chrm_list[count-4][1][0][1][4] not in remove_list:
+                                        logger.debug('\tGene %s stop:\t%s\treplaces with %s', sorted_chrm_list[count-3][1][0][1][4], sorted_chrm_list[count-4][1][0][1][2], gene[1][0][1][1])
+                                        sorted_chrm_list[count-4][1][0][1][5] = int(gene[1][0][1][1])
+                                        strand_skip = '@'
 
-                            else:
-                                print('Gene ' + gene[1][0][1][4] + ' start:\t' + str(gene[1][0][1][1]) + '\treplaces with '+ gene[1][0][1][1] + ' - ' + str(CIS_WINDOW) + '\n')
-                                gene[1][0][1].append(int(gene[1][0][1][1]) - CIS_WINDOW)
-                                stored_start = int(gene[1][0][1][1])
-                                stored_stop  = int(gene[1][0][1][2])
+                                    else:
+                                        logger.debug('Toooo much nesting - this script cannot handle the level of gene overlap in the annotation provided')
+                                        sys.exit()
 
-                            stored_chr = gene[1][0][1][0]
+                            elif len(sorted_chrm_list[count-2][1]) == 2:
+                                if sorted_chrm_list[count-2][1][1][1][3] == gene[1][0][1][3]:
 
-                for stored_cisRegion_coords in sorted_chrm_list:
+                                    logger.debug('\tGene %s stop:\t%s\t + replaces with %s', sorted_chrm_list[count-2][1][1][1][4], sorted_chrm_list[count-2][1][1][1][2], gene[1][0][1][1])
 
-                    if len(stored_cisRegion_coords[1]) > 1:
+                                    try:
+                                        sorted_chrm_list[count-2][1][1][1][5] = int(gene[1][0][1][1])
+                                    except(IndexError):
+                                        logger.debug('\t!!! Missing annotation appended...')
+                                        sorted_chrm_list[count-2][1][1][1].append(int(gene[1][0][1][1]))
+                                else:
+                                    logger.debug('\tGene %s stop:\t%s\t + replaces with %s', sorted_chrm_list[count-(2+len(sorted_chrm_list[count-2][1]))][1][0][1][4], sorted_chrm_list[count-(2+len(sorted_chrm_list[count-2][1]))][1][0][1][2], gene[1][0][1][1])
 
-                        for duplicate_cisRegion_coords in stored_cisRegion_coords[1]:
+                                    try:
+                                        sorted_chrm_list[count-(2+len(sorted_chrm_list[count-2][1]))][1][0][1][5] = int(gene[1][0][1][1])
+                                    except(IndexError):
+                                        logger.debug('\t!!! Missing annotation appended...')
+                                        sorted_chrm_list[count-(2+len(sorted_chrm_list[count-2][1]))][1][0][1].append(int(gene[1][0][1][1]))
 
-                            if duplicate_cisRegion_coords[1][4] not in remove_list:
 
-                                # print('Keeping: ' + str(duplicate_cisRegion_coords))
+                        stored_start = int(gene[1][0][1][2])
+                        stored_stop  = int(gene[1][0][1][1])
 
-                                if duplicate_cisRegion_coords[1][3] == '+':
+                    if strand_skip == '@':
+                        stored_strand = gene[1][0][1][3]
+                    else:
+                        stored_strand = strand_skip
 
-                                    if int(duplicate_cisRegion_coords[1][1]) - int(duplicate_cisRegion_coords[1][5]) != 0:
-                                        #out_file.write(duplicate_cisRegion_coords[1][0] + '\t' + str(int(duplicate_cisRegion_coords[1][5])) + '\t' + str(duplicate_cisRegion_coords[1][1]) + '\t' + str(duplicate_cisRegion_coords[0]) + '\t1\t' + str(duplicate_cisRegion_coords[1][3]) + '\n')
-                                        outputFormat(out_file, duplicate_cisRegion_coords[1][0], duplicate_cisRegion_coords[1][5], duplicate_cisRegion_coords[1][1], duplicate_cisRegion_coords[0], duplicate_cisRegion_coords[1][3])
+            elif gene[1][0][1][0] != stored_chr:
 
-                                    else:
+                if gene[1][0][1][3] == '-':
+                    logger.debug('Gene %s stop:\t%s\treplaces with %s + %s', gene[1][0][1][4], gene[1][0][1][2], gene[1][0][1][2], CIS_WINDOW)
+                    gene[1][0][1].append(int(gene[1][0][1][2])+ CIS_WINDOW)
+                    stored_start  = int(gene[1][0][1][2])
+                    stored_stop   = int(gene[1][0][1][1])
+                    stored_strand = gene[1][0][1][3]
 
-                                        print('--- ' + str(duplicate_cisRegion_coords[0]) + ' removed as ZERO LENGTH' + '\t' + duplicate_cisRegion_coords[1][3] + '\t' + duplicate_cisRegion_coords[1][1] + '\t' + duplicate_cisRegion_coords[1][2])
-                                        remove_list.append(duplicate_cisRegion_coords[0])
+                elif gene[1][0][1][3] == '+' and int(gene[1][0][1][1]) - CIS_WINDOW <= 0:
+                    gene[1][0][1].append(0)
+                    logger.debug('Gene %s start:\t%s\treplaces with 0', gene[1][0][1][4], gene[1][0][1][1])
+                    stored_start = int(gene[1][0][1][1])
+                    stored_stop  = int(gene[1][0][1][2])
 
-                                elif duplicate_cisRegion_coords[1][3] == '-':
+                else:
+                    logger.debug('Gene %s start:\t%s\treplaces with %s - %s', gene[1][0][1][4], gene[1][0][1][1], gene[1][0][1][1], CIS_WINDOW)
+                    gene[1][0][1].append(int(gene[1][0][1][1]) - CIS_WINDOW)
+                    stored_start = int(gene[1][0][1][1])
+                    stored_stop  = int(gene[1][0][1][2])
 
-                                    if int(duplicate_cisRegion_coords[1][5]) > int(SCAFF_LIMS[duplicate_cisRegion_coords[1][0]]):
+                stored_chr = gene[1][0][1][0]
 
-                                        if int(SCAFF_LIMS[duplicate_cisRegion_coords[1][0]]) - int(duplicate_cisRegion_coords[1][2]) != 0:
+    for stored_cisRegion_coords in sorted_chrm_list:
 
-                                            print('\n\n\n END OF SCAFF REACHED  -- CLIPPING STOP ANNOT FROM ' + str(duplicate_cisRegion_coords[1][5]) + ' to ' + str(SCAFF_LIMS[duplicate_cisRegion_coords[1][0]]) + '\n\n\n')
+        if len(stored_cisRegion_coords[1]) > 1:
 
-                                            # out_file.write(duplicate_cisRegion_coords[1][0] + '\t' + str(int(duplicate_cisRegion_coords[1][2])) + '\t' + str(SCAFF_LIMS[duplicate_cisRegion_coords[1][0]]) + '\t' + str(duplicate_cisRegion_coords[0]) + '\t1\t' + str(duplicate_cisRegion_coords[1][3]) + '\n')
-                                            outputFormat(out_file, duplicate_cisRegion_coords[1][0], duplicate_cisRegion_coords[1][2], str(SCAFF_LIMS[duplicate_cisRegion_coords[1][0]]), duplicate_cisRegion_coords[0], duplicate_cisRegion_coords[1][3])
-                                        else:
-                                            print('--- ' + str(duplicate_cisRegion_coords[0]) + ' removed as ZERO LENGTH AND END OF SCAFF' + '\t' + duplicate_cisRegion_coords[1][3] + '\t' + duplicate_cisRegion_coords[1][1] + '\t' + duplicate_cisRegion_coords[1][2])
-                                            remove_list.append(duplicate_cisRegion_coords[0])
+            for duplicate_cisRegion_coords in stored_cisRegion_coords[1]:
 
-                                    elif int(duplicate_cisRegion_coords[1][5]) - int(duplicate_cisRegion_coords[1][2]) != 0:
-                                        # out_file.write(duplicate_cisRegion_coords[1][0] + '\t' + str(int(duplicate_cisRegion_coords[1][2])) + '\t' + str(duplicate_cisRegion_coords[1][5]) + '\t' + str(duplicate_cisRegion_coords[0]) + '\t1\t' + str(duplicate_cisRegion_coords[1][3]) + '\n')
-                                        outputFormat(out_file, duplicate_cisRegion_coords[1][0], duplicate_cisRegion_coords[1][2], duplicate_cisRegion_coords[1][5], duplicate_cisRegion_coords[0], duplicate_cisRegion_coords[1][3])
+                if duplicate_cisRegion_coords[1][4] not in remove_list:
 
-                                    else:
-                                        print('--- ' + str(duplicate_cisRegion_coords[0]) + ' removed as ZERO LENGTH' + '\t' + duplicate_cisRegion_coords[1][3] + '\t' + duplicate_cisRegion_coords[1][1] + '\t' + duplicate_cisRegion_coords[1][2])
-                                        remove_list.append(duplicate_cisRegion_coords[0])
+                    # print('Keeping: ' + str(duplicate_cisRegion_coords))
+
+                    if duplicate_cisRegion_coords[1][3] == '+':
 
+                        if int(duplicate_cisRegion_coords[1][1]) - int(duplicate_cisRegion_coords[1][5]) != 0:
+                            #out_file.write(duplicate_cisRegion_coords[1][0] + '\t' + str(int(duplicate_cisRegion_coords[1][5])) + '\t' + str(duplicate_cisRegion_coords[1][1]) + '\t' + str(duplicate_cisRegion_coords[0]) + '\t1\t' + str(duplicate_cisRegion_coords[1][3]) + '\n')
+                            outputFormat(out_file, duplicate_cisRegion_coords[1][0], duplicate_cisRegion_coords[1][5], duplicate_cisRegion_coords[1][1], duplicate_cisRegion_coords[0], duplicate_cisRegion_coords[1][3])
+
+                        else:
+
+                            logger.debug('--- %s removed as ZERO LENGTH\t%s\t%s\t%s', duplicate_cisRegion_coords[0], duplicate_cisRegion_coords[1][3], duplicate_cisRegion_coords[1][1], duplicate_cisRegion_coords[1][2])
+                            remove_list.setdefault(duplicate_cisRegion_coords[0], REMOVE_ZERO_LENGTH)
+
+                    elif duplicate_cisRegion_coords[1][3] == '-':
+
+                        if int(duplicate_cisRegion_coords[1][5]) > int(SCAFF_LIMS[duplicate_cisRegion_coords[1][0]]):
+
+                            if int(SCAFF_LIMS[duplicate_cisRegion_coords[1][0]]) - int(duplicate_cisRegion_coords[1][2]) != 0:
+
+                                logger.debug(' END OF SCAFF REACHED  -- CLIPPING STOP ANNOT FROM %s to %s', duplicate_cisRegion_coords[1][5], SCAFF_LIMS[duplicate_cisRegion_coords[1][0]])
+
+                                # out_file.write(duplicate_cisRegion_coords[1][0] + '\t' + str(int(duplicate_cisRegion_coords[1][2])) + '\t' + str(SCAFF_LIMS[duplicate_cisRegion_coords[1][0]]) + '\t' + str(duplicate_cisRegion_coords[0]) + '\t1\t' + str(duplicate_cisRegion_coords[1][3]) + '\n')
+                                outputFormat(out_file, duplicate_cisRegion_coords[1][0], duplicate_cisRegion_coords[1][2], str(SCAFF_LIMS[duplicate_cisRegion_coords[1][0]]), duplicate_cisRegion_coords[0], duplicate_cisRegion_coords[1][3])
                             else:
-                                print('--- ' + str(duplicate_cisRegion_coords[1][4]) + ' removed' + '\t' + duplicate_cisRegion_coords[1][3] + '\t' + duplicate_cisRegion_coords[1][1] + '\t' + duplicate_cisRegion_coords[1][2])
-                    else:
+                                logger.debug('--- %s removed as ZERO LENGTH AND END OF SCAFF\t%s\t%s\t%s', duplicate_cisRegion_coords[0], duplicate_cisRegion_coords[1][3], duplicate_cisRegion_coords[1][1], duplicate_cisRegion_coords[1][2])
+                                remove_list.setdefault(duplicate_cisRegion_coords[0], REMOVE_SCAFFOLD_END)
 
-                        if stored_cisRegion_coords[1][0][1][4] not in remove_list:
+                        elif int(duplicate_cisRegion_coords[1][5]) - int(duplicate_cisRegion_coords[1][2]) != 0:
+                            # out_file.write(duplicate_cisRegion_coords[1][0] + '\t' + str(int(duplicate_cisRegion_coords[1][2])) + '\t' + str(duplicate_cisRegion_coords[1][5]) + '\t' + str(duplicate_cisRegion_coords[0]) + '\t1\t' + str(duplicate_cisRegion_coords[1][3]) + '\n')
+                            outputFormat(out_file, duplicate_cisRegion_coords[1][0], duplicate_cisRegion_coords[1][2], duplicate_cisRegion_coords[1][5], duplicate_cisRegion_coords[0], duplicate_cisRegion_coords[1][3])
 
-                            # print('Keeping: ' + str(stored_cisRegion_coords))
+                        else:
+                            logger.debug('--- %s removed as ZERO LENGTH\t%s\t%s\t%s', duplicate_cisRegion_coords[0], duplicate_cisRegion_coords[1][3], duplicate_cisRegion_coords[1][1], duplicate_cisRegion_coords[1][2])
+                            remove_list.setdefault(duplicate_cisRegion_coords[0], REMOVE_ZERO_LENGTH)
 
-                            if stored_cisRegion_coords[1][0][1][3] == '+':
+                else:
+                    logger.debug('--- %s removed\t%s\t%s\t%s', duplicate_cisRegion_coords[1][4], duplicate_cisRegion_coords[1][3], duplicate_cisRegion_coords[1][1], duplicate_cisRegion_coords[1][2])
+        else:
 
-                                if int(stored_cisRegion_coords[1][0][1][1]) - int(stored_cisRegion_coords[1][0][1][5]) != 0:
-                                    # out_file.write(str(stored_cisRegion_coords[1][0][1][0]) + '\t' + str(stored_cisRegion_coords[1][0][1][5]) + '\t' + str(stored_cisRegion_coords[1][0][1][1]) + '\t' + str(stored_cisRegion_coords[1][0][1][4].strip()) + '\t1\t' + str(stored_cisRegion_coords[1][0][1][3].strip()) + '\n')
-                                    outputFormat(out_file, stored_cisRegion_coords[1][0][1][0], stored_cisRegion_coords[1][0][1][5], stored_cisRegion_coords[1][0][1][1], stored_cisRegion_coords[1][0][1][4].strip(), stored_cisRegion_coords[1][0][1][3].strip())
+            if stored_cisRegion_coords[1][0][1][4] not in remove_list:
 
-                                else:
+                # print('Keeping: ' + str(stored_cisRegion_coords))
 
-                                    print('--- ' + str(stored_cisRegion_coords[1][0][1][4]) + ' removed as ZERO LENGTH' + '\t' + str(stored_cisRegion_coords[1][0][1][3]) + '\t' + str(stored_cisRegion_coords[1][0][1][1]) + '\t' + str(stored_cisRegion_coords[1][0][1][2]))
+                if stored_cisRegion_coords[1][0][1][3] == '+':
 
+                    if int(stored_cisRegion_coords[1][0][1][1]) - int(stored_cisRegion_coords[1][0][1][5]) != 0:
+                        # out_file.write(str(stored_cisRegion_coords[1][0][1][0]) + '\t' + str(stored_cisRegion_coords[1][0][1][5]) + '\t' + str(stored_cisRegion_coords[1][0][1][1]) + '\t' + str(stored_cisRegion_coords[1][0][1][4].strip()) + '\t1\t' + str(stored_cisRegion_coords[1][0][1][3].strip()) + '\n')
+                        outputFormat(out_file, stored_cisRegion_coords[1][0][1][0], stored_cisRegion_coords[1][0][1][5], stored_cisRegion_coords[1][0][1][1], stored_cisRegion_coords[1][0][1][4].strip(), stored_cisRegion_coords[1][0][1][3].strip())
 
-                            elif stored_cisRegion_coords[1][0][1][3] == '-':
+                    else:
 
-                                if int(stored_cisRegion_coords[1][0][1][5]) > int(SCAFF_LIMS[stored_cisRegion_coords[1][0][1][0]]):
+                        logger.debug('--- %s removed as ZERO LENGTH\t%s\t%s\t%s', stored_cisRegion_coords[1][0][1][4], stored_cisRegion_coords[1][0][1][3], stored_cisRegion_coords[1][0][1][1], stored_cisRegion_coords[1][0][1][2])
 
-                                    if int(stored_cisRegion_coords[1][0][1][2]) - int(SCAFF_LIMS[stored_cisRegion_coords[1][0][1][0]]) != 0:
-                                        print('\n\n\n END OF SCAFF REACHED  -- CLIPPING STOP ANNOT FROM ' + str(stored_cisRegion_coords[1][0][1][5]) + ' to ' + str(SCAFF_LIMS[stored_cisRegion_coords[1][0][1][0]]) + '\n\n\n')
-                                        # out_file.write(str(stored_cisRegion_coords[1][0][1][0]) + '\t' + str(stored_cisRegion_coords[1][0][1][2]) + '\t' + str(SCAFF_LIMS[stored_cisRegion_coords[1][0][1][0]]) + '\t' + str(stored_cisRegion_coords[1][0][1][4].strip()) + '\t1\t' + str(stored_cisRegion_coords[1][0][1][3].strip()) + '\n')
-                                        outputFormat(out_file, stored_cisRegion_coords[1][0][1][0], stored_cisRegion_coords[1][0][1][2], SCAFF_LIMS[stored_cisRegion_coords[1][0][1][0]], stored_cisRegion_coords[1][0][1][4].strip(), stored_cisRegion_coords[1][0][1][3].strip())
 
-                                    else:
-                                        print('--- ' + str(stored_cisRegion_coords[1][0][1][4]) + ' removed as ZERO LENGTH AT END OF SCAFF' + '\t' + str(stored_cisRegion_coords[1][0][1][3]) + '\t' + str(stored_cisRegion_coords[1][0][1][1]) + '\t' + str(stored_cisRegion_coords[1][0][1][2]))
-                                        remove_list.append(stored_cisRegion_coords[1][0][1][4])
+                elif stored_cisRegion_coords[1][0][1][3] == '-':
 
-                                elif int(stored_cisRegion_coords[1][0][1][2]) - stored_cisRegion_coords[1][0][1][5] != 0:
-                                    # out_file.write(str(stored_cisRegion_coords[1][0][1][0]) + '\t' + str(stored_cisRegion_coords[1][0][1][2]) + '\t' + str(stored_cisRegion_coords[1][0][1][5]) + '\t' + str(stored_cisRegion_coords[1][0][1][4].strip()) + '\t1\t' + str(stored_cisRegion_coords[1][0][1][3].strip()) + '\n')
-                                    outputFormat(out_file, stored_cisRegion_coords[1][0][1][0], stored_cisRegion_coords[1][0][1][2], stored_cisRegion_coords[1][0][1][5], stored_cisRegion_coords[1][0][1][4].strip(), stored_cisRegion_coords[1][0][1][3].strip())
+                    if int(stored_cisRegion_coords[1][0][1][5]) > int(SCAFF_LIMS[stored_cisRegion_coords[1][0][1][0]]):
 
-                                else:
+                        if int(stored_cisRegion_coords[1][0][1][2]) - int(SCAFF_LIMS[stored_cisRegion_coords[1][0][1][0]]) != 0:
+                            logger.debug(' END OF SCAFF REACHED  -- CLIPPING STOP ANNOT FROM %s to %s', stored_cisRegion_coords[1][0][1][5], SCAFF_LIMS[stored_cisRegion_coords[1][0][1][0]])
+                            # out_file.write(str(stored_cisRegion_coords[1][0][1][0]) + '\t' + str(stored_cisRegion_coords[1][0][1][2]) + '\t' + str(SCAFF_LIMS[stored_cisRegion_coords[1][0][1][0]]) + '\t' + str(stored_cisRegion_coords[1][0][1][4].strip()) + '\t1\t' + str(stored_cisRegion_coords[1][0][1][3].strip()) + '\n')
+                            outputFormat(out_file, stored_cisRegion_coords[1][0][1][0], stored_cisRegion_coords[1][0][1][2], SCAFF_LIMS[stored_cisRegion_coords[1][0][1][0]], stored_cisRegion_coords[1][0][1][4].strip(), stored_cisRegion_coords[1][0][1][3].strip())
 
-                                    print('--- ' + str(stored_cisRegion_coords[1][0][1][4]) + ' removed as ZERO LENGTH' + '\t' + str(stored_cisRegion_coords[1][0][1][3]) + '\t' + str(stored_cisRegion_coords[1][0][1][1]) + '\t' + str(stored_cisRegion_coords[1][0][1][2]))
-                                    remove_list.append(stored_cisRegion_coords[1][0][1][4])
                         else:
-                            print('--- ' + str(stored_cisRegion_coords[1][0][1][4]) + ' removed' + '\t' + str(stored_cisRegion_coords[1][0][1][3]) + '\t' + str(stored_cisRegion_coords[1][0][1][1]) + '\t' + str(stored_cisRegion_coords[1][0][1][2]))
+                            logger.debug('--- %s removed as ZERO LENGTH AT END OF SCAFF\t%s\t%s\t%s', stored_cisRegion_coords[1][0][1][4], stored_cisRegion_coords[1][0][1][3], stored_cisRegion_coords[1][0][1][1], stored_cisRegion_coords[1][0][1][2])
+                            remove_list.setdefault(stored_cisRegion_coords[1][0][1][4], REMOVE_SCAFFOLD_END)
+
+                    elif int(stored_cisRegion_coords[1][0][1][2]) - stored_cisRegion_coords[1][0][1][5] != 0:
+                        # out_file.write(str(stored_cisRegion_coords[1][0][1][0]) + '\t' + str(stored_cisRegion_coords[1][0][1][2]) + '\t' + str(stored_cisRegion_coords[1][0][1][5]) + '\t' + str(stored_cisRegion_coords[1][0][1][4].strip()) + '\t1\t' + str(stored_cisRegion_coords[1][0][1][3].strip()) + '\n')
+                        outputFormat(out_file, stored_cisRegion_coords[1][0][1][0], stored_cisRegion_coords[1][0][1][2], stored_cisRegion_coords[1][0][1][5], stored_cisRegion_coords[1][0][1][4].strip(), stored_cisRegion_coords[1][0][1][3].strip())
+
+                    else:
+
+                        logger.debug('--- %s removed as ZERO LENGTH\t%s\t%s\t%s', stored_cisRegion_coords[1][0][1][4], stored_cisRegion_coords[1][0][1][3], stored_cisRegion_coords[1][0][1][1], stored_cisRegion_coords[1][0][1][2])
+                        remove_list.setdefault(stored_cisRegion_coords[1][0][1][4], REMOVE_ZERO_LENGTH)
+            else:
+                logger.debug('--- %s removed\t%s\t%s\t%s', stored_cisRegion_coords[1][0][1][4], stored_cisRegion_coords[1][0][1][3], stored_cisRegion_coords[1][0][1][1], stored_cisRegion_coords[1][0][1][2])
+
+    cis_regions = out_file
+
+    return(cis_regions, remove_list, same_strand_start)
+
+def callerDigest(CHROM_CALLER):
+    '''
+    Hash of the source of the module defining a calling function, so the
+    cached calls of any earlier version of the calling code are not reused
+    '''
+    return(fileHash(inspect.getsourcefile(CHROM_CALLER)))
+
+def scaffoldKey(CHROM_CALLER, chrom, CIS_WINDOW, caller_digest):
+    '''
+    Name of the cache entry of a scaffold called by a version of a calling
+    function with a window size
+    '''
+    return(hashlib.sha256(repr((CACHE_VERSION, CHROM_CALLER.__name__, caller_digest, chrom, CIS_WINDOW)).encode()).hexdigest()[:32] + '.pickle')
+
+def scaffoldDigest(GENES, CHROM_LIMIT):
+    '''
+    Hash of the genes and length of a scaffold, the inputs of its calls
+    '''
+    return(hashlib.sha256(repr((sorted(GENES.items()), CHROM_LIMIT)).encode()).hexdigest())
+
+def scaffoldCacheLoad(CACHE_PATH, digest):
+    '''
+    Returns the cached calls of a scaffold if they were made from the same
+    genes and length, otherwise None
+    '''
+    try:
+        with open(CACHE_PATH, 'rb') as cache_file:
+            entry = pickle.load(cache_file)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return(None)
+    return(entry['result'] if entry['digest'] == digest else None)
+
+def chromosomeMap(CHROM_CALLER, SCAF_LIST, GENE_ANNOTATION, SCAFF_LIMS, CIS_WINDOW, THREADS = 1, CACHE_DIR = None):
+    '''
+    Runs a per scaffold calling function over every scaffold, farming the
+    scaffolds out to a process pool when more than one thread is requested.
+    The largest scaffolds are submitted first, results are returned in sorted
+    scaffold order whatever the number of threads.
+
+    With a CACHE_DIR the calls of each scaffold are kept there, keyed by the
+    calling function, its source and window, and only scaffolds whose genes
+    or length have changed since are called again
+    '''
+    chroms  = sorted(SCAF_LIST)
+    tasks   = [(GENE_ANNOTATION[chrom], SCAFF_LIMS.get(chrom), CIS_WINDOW) for chrom in chroms]
+    results = [None] * len(tasks)
+
+    if CACHE_DIR:
+        os.makedirs(CACHE_DIR, exist_ok = True)
+        caller_digest = callerDigest(CHROM_CALLER)
+        cache_paths = [os.path.join(CACHE_DIR, scaffoldKey(CHROM_CALLER, chrom, CIS_WINDOW, caller_digest)) for chrom in chroms]
+        digests     = [scaffoldDigest(task[0], task[1]) for task in tasks]
+        results     = [scaffoldCacheLoad(path, digest) for path, digest in zip(cache_paths, digests)]
+        logger.info('Scaffolds reused from cache:\t%s of %s', len(tasks) - results.count(None), len(tasks))
+
+    missing = [n for n, result in enumerate(results) if result is None]
+    if THREADS <= 1 or len(missing) <= 1:
+        for n in missing:
+            results[n] = CHROM_CALLER(*tasks[n])
+    else:
+        by_size   = sorted(missing, key = lambda n: len(tasks[n][0]), reverse = True)
+        chunksize = max(1, len(by_size) // (THREADS * 8))
+        with multiprocessing.Pool(min(THREADS, len(by_size)), logSetup, (logger.getEffectiveLevel(),)) as pool:
+            sized_results = pool.starmap(CHROM_CALLER, [tasks[n] for n in by_size], chunksize)
+        for n, result in zip(by_size, sized_results):
+            results[n] = result
+
+    if CACHE_DIR:
+        for n in missing:
+            cacheWrite({'digest': digests[n], 'result': results[n]}, cache_paths[n])
+    return(results)
+
+def cisRegionCalling(CHROM_CALLER, SCAF_LIST, GENE_ANNOTATION, OUTPUT_DIR, SCAFF_LIMS, CIS_WINDOW, THREADS = 1, DECISION_LOG = None, CACHE_DIR = None, SUFFIX = '', FORMATS = ('bed',)):
+    '''
+    Calls cis regions on every scaffold with a per scaffold calling function,
+    writing the cis regions in each of FORMATS and the genes flagged as
+    sharing a start site on the same strand, and optionally the decision made
+    for every gene, each named with SUFFIX. Returns the table of cis regions
+    '''
+    results = chromosomeMap(CHROM_CALLER, SCAF_LIST, GENE_ANNOTATION, SCAFF_LIMS, CIS_WINDOW, THREADS, CACHE_DIR)
+    return(cisRegionWrite(results, SCAF_LIST, GENE_ANNOTATION, OUTPUT_DIR, DECISION_LOG, SUFFIX, FORMATS))
+
+def cisRegionWrite(results, SCAF_LIST, GENE_ANNOTATION, OUTPUT_DIR, DECISION_LOG = None, SUFFIX = '', FORMATS = ('bed',)):
+    '''
+    Gathers the calls of every scaffold into one table, writing the cis
+    regions in each of FORMATS, the flagged genes and optionally the decision
+    log
+    '''
+    remove_list       = {}
+    same_strand_start = {}
+    cis_table         = CisRegionTable()
+
+    for cis_regions, removed, flagged in results:
+        cis_table.extend(cis_regions)
+        remove_list.update(removed)
+        same_strand_start.update(flagged)
+
+    table_outs = [os.path.join(OUTPUT_DIR, 'cisRegions' + SUFFIX + FORMAT_EXTENSIONS[table_format]) for table_format in FORMATS]
+    flag_out   = os.path.join(OUTPUT_DIR, 'same_strand+start' + SUFFIX + '.out')
+    for table_out in table_outs:
+        cis_table.writeTable(table_out)
 
     # with open(os.path.join(OUTPUT_DIR, filename[:-3] + 'same_strand+start.out'), 'w') as out2:
-    with open(os.path.join(OUTPUT_DIR, 'same_strand+start.out'), 'w') as out2:
-        for out in same_strand_start:
-            if out not in remove_list:
-                out2.write(str(out) + '\n')
+    atomicWrite(''.join([str(out) + '\n' for out in same_strand_start if out not in remove_list]), flag_out)
+
+    if DECISION_LOG:
+        decisionLogWrite(suffixPath(DECISION_LOG, SUFFIX), {chrom: GENE_ANNOTATION[chrom] for chrom in SCAF_LIST}, cis_table, remove_list)
+
     # print('\n\n\nOutputs:\n\t' + os.path.join(OUTPUT_DIR, filename[:-3] + str(CIS_WINDOW) + 'nt_cisRegions.stranded.bed') + '\n\t' + os.path.join(OUTPUT_DIR, filename[:-3] + 'same_strand+start.out') + '\n\n')
-    print('\n\n\nOutputs:\n\t' + os.path.join(OUTPUT_DIR, 'cisRegions.bed') + '\n\t' + os.path.join(OUTPUT_DIR, 'same_strand+start.out') + '\n\n')
+    logger.info('Outputs:\n\t%s', '\n\t'.join(table_outs + [flag_out]))
 
+    return(cis_table)
 
-def main(GENE_BED, GENOME_FASTA, ntWINDOW, OUTPUT_DIR):
-    print('\n\ncisRegion.py\n\n')
-    print('Loading annotations from:\t' + GENE_BED)
-    print('Loading sequences from:\t'   + GENOME_FASTA)
-    print('Extracting cisRegions of:\t' + GENOME_FASTA + 'nt')
-    print('Writing cis annotations to:\t' + OUTPUT_DIR + '\n')
+def hugeCisRegionCallingBehemoth(SCAF_LIST, GENE_ANNOTATION, OUTPUT_DIR, SCAFF_LIMS, CIS_WINDOW, THREADS = 1, DECISION_LOG = None, CACHE_DIR = None, SUFFIX = '', FORMATS = ('bed',)):
+    '''
+    Calls cis regions on every scaffold with behemothChromosome
+    '''
+    return(cisRegionCalling(behemothChromosome, SCAF_LIST, GENE_ANNOTATION, OUTPUT_DIR, SCAFF_LIMS, CIS_WINDOW, THREADS, DECISION_LOG, CACHE_DIR, SUFFIX, FORMATS))
 
-    # create a list of scaffold IDs
-    scaffold_set = scaffoldLister(GENE_BED)
+def sweepChromosome(GENES, CHROM_LIMIT, CIS_WINDOW):
+    '''
+    Calls cis regions for the genes of one scaffold with a single pass over
+    the genes sorted by coordinate.
+
+    Each gene's upstream window is clipped by the nearest gene body upstream
+    of its TSS. Where the neighbouring genes are on opposite strands and face
+    each other (a bidirectional promoter) the shared region is split at the
+    midpoint. Genes whose TSS lies inside another gene, and genes left with no
+    upstream sequence, are removed. Genes sharing a start site on the same
+    strand are flagged, and all receive the same (mirrored) window.
+
+    Returns a table of the kept regions, a dictionary of removed genes and the
+    reason, and an ordered dictionary of the flagged genes
+    '''
+    return(sweepChromosomeWindows(GENES, CHROM_LIMIT, (CIS_WINDOW,))[0])
 
-    # create a dictionary of the lengths of all scaffolds
-    scaff_limits = chromLimitFind(scaffold_set, genomeLoad(GENOME_FASTA))
+def sweepChromosomeWindows(GENES, CHROM_LIMIT, CIS_WINDOWS):
+    '''
+    Calls the cis regions of every window size given for the genes of one
+    scaffold in the single pass of sweepChromosome. Sorting the genes, the
+    reach of the genes upstream, nested genes and shared start sites do not
+    depend on the window so are found once, and only the clipping of each
+    region is repeated per window.
 
-    #call cis regions - to be updated
-    hugeCisRegionCallingBehemoth(scaffold_set, GENE_BED, OUTPUT_DIR, scaff_limits, ntWINDOW)
+    Returns the results of sweepChromosome for each window, in order
+    '''
+    sorted_genes = sorted(GENES.values(), key = lambda gene: (int(gene[1]), asint(gene[4])))
+    starts  = [int(gene[1]) for gene in sorted_genes]
+    stops   = [int(gene[2]) for gene in sorted_genes]
+    strands = [gene[3] for gene in sorted_genes]
+
+    # furthest gene body end among the genes starting before each position,
+    # and whether it is the TSS of a gene on the negative strand
+    reach       = [-1]
+    reach_minus = [False]
+    for stop, strand in zip(stops, strands):
+        if stop > reach[-1]:
+            reach.append(stop)
+            reach_minus.append(strand == '-')
+        else:
+            reach.append(reach[-1])
+            reach_minus.append(reach_minus[-1] or (stop == reach[-1] and strand == '-'))
+
+    # start sites with at least one gene on the positive strand
+    plus_starts = {start for start, strand in zip(starts, strands) if strand == '+'}
+
+    removed = [{} for CIS_WINDOW in CIS_WINDOWS]
+    flagged = {}
+    windows = [[] for CIS_WINDOW in CIS_WINDOWS]
+    for count, gene in enumerate(sorted_genes):
+        start, stop, strand = starts[count], stops[count], strands[count]
+
+        # same strand shared start sites are compared to the first gene at the site
+        first = bisect.bisect_left(starts, start)
+        if first != count and strands[first] == strand:
+            flagged[sorted_genes[first][4]] = None
+            flagged[gene[4]] = None
+
+        if strand == '+':
+            if start == 0:
+                for window_removed in removed:
+                    window_removed[gene[4]] = REMOVE_NO_UPSTREAM
+                continue
+            upstream = bisect.bisect_left(starts, start)
+            if reach[upstream] > start:
+                for window_removed in removed:
+                    window_removed[gene[4]] = REMOVE_NESTED
+                continue
+            dist = start - reach[upstream]
+            for n, CIS_WINDOW in enumerate(CIS_WINDOWS):
+                if reach_minus[upstream] and dist < CIS_WINDOW:
+                    if dist <= 1:
+                        removed[n][gene[4]] = REMOVE_BIDIRECTIONAL_OVERLAP
+                        continue
+                    cis_start, rule = start - int(dist / 2), KEEP_BIDIRECTIONAL
+                elif start - CIS_WINDOW >= max(reach[upstream], 0):
+                    cis_start, rule = start - CIS_WINDOW, KEEP_FULL_WINDOW
+                else:
+                    cis_start, rule = max(reach[upstream], 0), KEEP_NEIGHBOUR_CLIP
+                windows[n].append((cis_start, start, gene, rule))
+
+        else:
+            upstream = bisect.bisect_left(starts, stop)
+            if reach[upstream] > stop:
+                for window_removed in removed:
+                    window_removed[gene[4]] = REMOVE_NESTED
+                continue
+            for n, CIS_WINDOW in enumerate(CIS_WINDOWS):
+                cis_stop, rule = stop + CIS_WINDOW, KEEP_FULL_WINDOW
+                if upstream < len(starts):
+                    dist = starts[upstream] - stop
+                    if starts[upstream] in plus_starts and dist < CIS_WINDOW:
+                        if dist <= 1:
+                            removed[n][gene[4]] = REMOVE_BIDIRECTIONAL_OVERLAP
+                            continue
+                        cis_stop, rule = stop + int(dist / 2), KEEP_BIDIRECTIONAL
+                    elif starts[upstream] < cis_stop:
+                        cis_stop, rule = starts[upstream], KEEP_NEIGHBOUR_CLIP
+                if CHROM_LIMIT is not None and CHROM_LIMIT < cis_stop:
+                    cis_stop, rule = CHROM_LIMIT, KEEP_SCAFFOLD_CLIP
+                windows[n].append((stop, cis_stop, gene, rule))
+
+    results = []
+    for window_regions, window_removed in zip(windows, removed):
+        regions = CisRegionTable()
+        for cis_start, cis_stop, gene, rule in window_regions:
+            if cis_stop <= cis_start:
+                window_removed[gene[4]] = REMOVE_ZERO_LENGTH
+            else:
+                regions.append(gene[0], cis_start, cis_stop, gene[4], gene[3], rule)
+        results.append((regions, window_removed, dict(flagged)))
+
+    return(results)
+
+def sweepCisRegionCalling(SCAF_LIST, GENE_ANNOTATION, OUTPUT_DIR, SCAFF_LIMS, CIS_WINDOW, THREADS = 1, DECISION_LOG = None, CACHE_DIR = None, SUFFIX = '', FORMATS = ('bed',)):
+    '''
+    Calls cis regions on every scaffold with sweepChromosome, writing the same
+    outputs as hugeCisRegionCallingBehemoth
+    '''
+    return(cisRegionCalling(sweepChromosome, SCAF_LIST, GENE_ANNOTATION, OUTPUT_DIR, SCAFF_LIMS, CIS_WINDOW, THREADS, DECISION_LOG, CACHE_DIR, SUFFIX, FORMATS))
+
+def multiWindowCalling(SCAF_LIST, GENE_ANNOTATION, OUTPUT_DIR, SCAFF_LIMS, CIS_WINDOWS, THREADS = 1, DECISION_LOG = None, CACHE_DIR = None, FORMATS = ('bed',)):
+    '''
+    Calls the cis regions of every window size on every scaffold with one
+    pass of sweepChromosomeWindows, writing the outputs of each window named
+    _<WINDOW>nt. Returns the table of cis regions of each window
+    '''
+    results = chromosomeMap(sweepChromosomeWindows, SCAF_LIST, GENE_ANNOTATION, SCAFF_LIMS, tuple(CIS_WINDOWS), THREADS, CACHE_DIR)
+    return([cisRegionWrite([result[n] for result in results], SCAF_LIST, GENE_ANNOTATION, OUTPUT_DIR, DECISION_LOG, '_' + str(CIS_WINDOW) + 'nt', FORMATS)
+            for n, CIS_WINDOW in enumerate(CIS_WINDOWS)])
+
+def windowsWriteBED(cis_tables, CIS_WINDOWS, BED_OUT):
+    '''
+    Writes the cis regions of every window to one .bed, the window size in a
+    7th column, or to one table in the format of the extension of BED_OUT
+    '''
+    if tableFormat(BED_OUT) != 'bed':
+        regionsWrite(pd.concat([cis_table.frame().assign(window = CIS_WINDOW) for cis_table, CIS_WINDOW in zip(cis_tables, CIS_WINDOWS)], ignore_index = True), BED_OUT)
+        return
+    atomicWrite(''.join(['%s\t%d\t%d\t%s\t1\t%s\t%d\n' % (row + (CIS_WINDOW,)) for cis_table, CIS_WINDOW in zip(cis_tables, CIS_WINDOWS) for row in cis_table.rows()]), BED_OUT)
+
+# cis region calling engines selectable from the command line
+CALLING_ENGINES = {'legacy': hugeCisRegionCallingBehemoth,
+                   'sweep':  sweepCisRegionCalling}
+
+def main(GENE_BED, GENOME_FASTA, ntWINDOWS, OUTPUT_DIR, ENGINE = 'legacy', THREADS = 1, DECISION_LOG = None, FASTA_OUT = None, CACHE_DIR = None, NAME_BY_WINDOW = False, WINDOWS_BED = None, FORMATS = ('bed',)):
+    logger.info('cisRegion.py')
+    logger.info('Loading annotations from:\t%s', GENE_BED)
+    logger.info('Loading sequences from:\t%s', GENOME_FASTA)
+    logger.info('Extracting cisRegions of:\t%s', ', '.join([str(window) + 'nt' for window in ntWINDOWS]))
+    logger.info('Writing cis annotations to:\t%s', OUTPUT_DIR)
+
+    # parse the annotation once, grouped by scaffold
+    gene_annotation = annotationLoad(GENE_BED)
+
+    # create a list of scaffold IDs
+    scaffold_set = scaffoldLister(gene_annotation)
+
+    with genomeOpen(GENOME_FASTA) as genome:
+        # create a dictionary of the lengths of all scaffolds from the fasta index
+        scaff_limits = chromLimitFind(scaffold_set, genome.lengths())
+
+        # call cis regions of every window with the chosen engine, outputs
+        # named by window when there are several. The sweep engine calls
+        # every window in one pass over each scaffold
+        NAME_BY_WINDOW = NAME_BY_WINDOW or len(ntWINDOWS) > 1
+        suffixes = ['_' + str(ntWINDOW) + 'nt' if NAME_BY_WINDOW else '' for ntWINDOW in ntWINDOWS]
+        if ENGINE == 'sweep' and NAME_BY_WINDOW:
+            cis_tables = multiWindowCalling(scaffold_set, gene_annotation, OUTPUT_DIR, scaff_limits, ntWINDOWS, THREADS, DECISION_LOG, CACHE_DIR, FORMATS)
+        else:
+            cis_tables = [CALLING_ENGINES[ENGINE](scaffold_set, gene_annotation, OUTPUT_DIR, scaff_limits, ntWINDOW, THREADS, DECISION_LOG, CACHE_DIR, suffix, FORMATS)
+                          for ntWINDOW, suffix in zip(ntWINDOWS, suffixes)]
+
+        if WINDOWS_BED:
+            windowsWriteBED(cis_tables, ntWINDOWS, WINDOWS_BED)
+
+        # extract the cis region sequences from the genome already opened
+        if FASTA_OUT:
+            for cis_table, suffix in zip(cis_tables, suffixes):
+                fastaWrite(cis_table.rows(), genome, suffixPath(FASTA_OUT, suffix))
+                logger.info('Sequences written to:\t%s', suffixPath(FASTA_OUT, suffix))
 
 parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
 
-parser.add_argument('BED_in',   type=str, help='path to cisRegion annotation in .BED format')
-parser.add_argument('FASTA_in', type=str, help='path to genome sequences in .FASTA format')
-parser.add_argument('WINDOW',   type=int, help='integer value describing nucleotide length of max cis region to be extracted')
+parser.add_argument('BED_in',   type=str, help='path to gene annotation in .BED format, or .GFF/.GFF3 converted in process')
+parser.add_argument('FASTA_in', type=str, help='path to genome sequences in .FASTA or packed .2bit format')
+parser.add_argument('WINDOW',   type=int, nargs='+', help='integer value(s) describing nucleotide length of max cis region to be extracted, outputs named _<WINDOW>nt when several')
 parser.add_argument('OUT_dir',  type=str, help='path to directory where the output should be written')
+parser.add_argument('--engine', type=str, default='legacy', choices=sorted(CALLING_ENGINES), help='cis region calling engine, sweep makes one sorted pass per scaffold')
+parser.add_argument('--threads', type=int, default=1, help='number of processes used to call scaffolds in parallel')
+parser.add_argument('--log-level', type=str, default='WARNING', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='level of messages written to stderr, DEBUG reports every gene')
+parser.add_argument('--emit-fasta', type=str, default=None, help='path to write the cis region sequences in .FASTA format, negative strand regions reverse complemented')
+parser.add_argument('--decision-log', type=str, default=None, help='path to write a .tsv of the rule deciding the cis region of every gene')
+parser.add_argument('--cache-dir', type=str, default=None, help='directory keeping the calls of each scaffold, so reruns only call scaffolds whose genes have changed')
+parser.add_argument('--name-by-window', action='store_true', help='name outputs _<WINDOW>nt even when a single window is given')
+parser.add_argument('--windows-bed', type=str, default=None, help='path to also write the cis regions of every window to one .BED, the window size in a 7th column')
+parser.add_argument('--formats', type=str, nargs='+', default=['bed'], choices=sorted(FORMAT_EXTENSIONS), help='formats the cis regions are written in: bed, bed.gz (bgzip with a tabix index), arrow or parquet (need pyarrow)')
 
 if __name__ == '__main__':
 
     args = parser.parse_args()
 
-    main(args.BED_in, args.FASTA_in, args.WINDOW, args.OUT_dir)
+    logSetup(args.log_level)
+
+    main(args.BED_in, args.FASTA_in, args.WINDOW, args.OUT_dir, args.engine, args.threads, args.decision_log, args.emit_fasta, args.cache_dir, args.name_by_window, args.windows_bed, args.formats)
 
 __author__ = "Will Nash"
 __copyright__ = "Copyright 2020, The Earlham Institute"
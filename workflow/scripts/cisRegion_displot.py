@@ -5,74 +5,91 @@ cisRegion_displot.py
 
 This script will make a distribution plot from the bedfile genereated by cisRegion.py
 
+The cis regions may also be read from the .bed.gz, .arrow or .parquet tables
+written by cisRegion.py --formats, .arrow being memory mapped
+
 '''
 
 #import libraries
-import csv
 import argparse
 
 import numpy   as np
-import pandas  as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 
+from regionTable import regionsRead, regionChunks
+
 #Define custom functions
 def parseBEDinput (bed_infile):
     '''
-    Read annotations from bed file into dictionary
-
-    Load dictionary as pandas DataFrame
+    Read annotations from bed file into a typed pandas DataFrame in a single
+    call
 
-    Return both
+    Return the DataFrame
     '''
-    #create blank dictionary
-    bed_dict = {}
+    bed_dataframe = regionsRead(bed_infile, usecols = [1, 2, 3, 5],
+                                names = ['start', 'stop', 'gene_name', 'strand'],
+                                dtype = {'start': np.int64, 'stop': np.int64, 'gene_name': str, 'strand': str})
+    bed_dataframe = bed_dataframe[['gene_name', 'start', 'stop', 'strand']]
 
-    #create blank dataframe
-    bed_dataframe = pd.DataFrame(columns = ['gene_name', 'start', 'stop', 'strand'])
+    #if there is a duplication in the infile throw an error
+    duplicated = bed_dataframe['gene_name'].duplicated()
+    if duplicated.any():
+        gene_name = bed_dataframe['gene_name'][duplicated].iloc[0]
+        raise Exception('\n\tAnnotation dictionary construction stopped\n\tGene {} duplicated in the in file'.format(gene_name))
 
-    # open file and stroe in blank dict above
-    with open(bed_infile) as input_file:
-        for line in csv.reader(input_file, delimiter = '\t'):
+    return(bed_dataframe)
 
-            #extract gene name
-            gene_name = line[3]
+def lengthChunks (bed_infile, chunksize):
+    '''
+    Yield the lengths of the annotations in a bed file chunk by chunk
+    '''
+    for chunk in regionChunks(bed_infile, chunksize, usecols = [1, 2], names = ['start', 'stop'], dtype = {'start': np.int64, 'stop': np.int64}):
+        yield(chunk['stop'].values - chunk['start'].values)
 
-            #check if gene is duplicated in the dict
-            if gene_name not in bed_dict:
-                #if it is not, store the bed line
-                bed_dict[gene_name] = line
+def lengthHistogram (bed_infile, bins, chunksize):
+    '''
+    Bin the annotation lengths of a bed file in constant memory, the first
+    pass finding the range of the bins and the second counting into them
 
-                bed_dataframe = bed_dataframe.append(pd.Series([gene_name, int(line[1]), int(line[2]), line[5]], index = ['gene_name', 'start', 'stop', 'strand']), ignore_index = True)
-            else:
-                #if there is a duplication in the infile throw an error
-                raise Exception('\n\tAnnotation dictionary construction stopped\n\tGene {} duplicated in the in file'.format(gene_name))
+    Return the counts and bin edges
+    '''
+    low, high = np.inf, -np.inf
+    for lengths in lengthChunks(bed_infile, chunksize):
+        if len(lengths):
+            low, high = min(low, lengths.min()), max(high, lengths.max())
 
-    return((bed_dict, bed_dataframe))
+    edges  = np.histogram_bin_edges([low, high] if low <= high else [], bins)
+    counts = np.zeros(bins, dtype = np.int64)
+    for lengths in lengthChunks(bed_infile, chunksize):
+        counts += np.histogram(lengths, edges)[0]
 
+    return((counts, edges))
 
-def main (inBED, out_path):
+def main (inBED, out_path, CHUNKSIZE = None):
     '''
     Uses the seaborn library to plot the distribution of the cisRegion lengths
     '''
-    #parse the annotations in BED format
-    BedAnnotData = parseBEDinput(inBED)
-
-    #extract the dataframe
-    BedAnnotData_df = BedAnnotData[1]
-
     #set plot layout
     plt.figure(figsize = (16, 6))
     plt.tight_layout()
 
-    #calculate length of promoter annotations
-    promoterLengths = BedAnnotData_df['stop'] - BedAnnotData_df['start']
+    if CHUNKSIZE:
+        #bin the lengths of the promoter annotations chunk by chunk
+        counts, edges = lengthHistogram(inBED, 50, CHUNKSIZE)
+
+        #plot the pre-binned histogram
+        dist = sns.histplot(x = edges[:-1], weights = counts, bins = list(edges))
+    else:
+        #parse the annotations in BED format
+        BedAnnotData_df = parseBEDinput(inBED)
+
+        #calculate length of promoter annotations
+        promoterLengths = BedAnnotData_df['stop'] - BedAnnotData_df['start']
 
-    #make the lengths a list
-    promoterLengthList = promoterLengths.values.tolist()
+        #plot the histogram
+        dist = sns.histplot(promoterLengths, bins = 50)
 
-    #plot the histogram
-    dist = sns.distplot(promoterLengthList, bins = 50, kde = False)
     dist.set(xlabel = "Length (nucleotides)", ylabel = "Count")
 
     #write figure
@@ -85,14 +102,15 @@ def main (inBED, out_path):
 #Define arguments used in the script
 parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
 
-parser.add_argument('BED_in',  type=str, help='path to promoter annotation in BED format')
+parser.add_argument('BED_in',  type=str, help='path to promoter annotation in BED format, or .bed.gz, .arrow or .parquet')
 parser.add_argument('out_dir', type=str, help='path to directory where the figure should be written')
+parser.add_argument('--chunksize', type=int, default=None, help='stream the annotation in chunks of this many lines, binning the lengths in constant memory (skips the duplicate gene check)')
 
 if __name__ == '__main__':
 
     args = parser.parse_args()
 
-    main(args.BED_in, args.out_dir)
+    main(args.BED_in, args.out_dir, args.chunksize)
 
 __author__ = "Will Nash"
 __copyright__ = "Copyright 2020, The Earlham Institute"
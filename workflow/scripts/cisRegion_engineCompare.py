@@ -0,0 +1,110 @@
+#!/usr/bin/python
+
+'''
+cisRegion_engineCompare.py
+
+Runs the legacy and sweep cis region calling engines of cisRegion.py on the
+same annotation and genome, and compares the cisRegions.bed and
+same_strand+start.out files they write.
+
+The cis regions are compared line by line. The flagged gene lists are
+compared as sets, as the legacy engine can repeat a gene when more than two
+genes share a start site.
+
+Input: annotation (.bed), genome (.fasta)
+Output: summary of the differences, optionally the differing lines (.tsv)
+'''
+
+#import libraries
+import os
+import sys
+import argparse
+import tempfile
+
+import cisRegion
+from fastaIndex import scaffoldLengths
+
+
+def runEngine(ENGINE, gene_annotation, scaff_limits, ntWINDOW, OUTPUT_DIR):
+    '''
+    Runs one engine, returns its cis region lines and flagged genes
+    '''
+    cisRegion.CALLING_ENGINES[ENGINE](set(gene_annotation), gene_annotation, OUTPUT_DIR, scaff_limits, ntWINDOW)
+
+    with open(os.path.join(OUTPUT_DIR, 'cisRegions.bed')) as bed_file:
+        regions = bed_file.read().splitlines()
+    with open(os.path.join(OUTPUT_DIR, 'same_strand+start.out')) as flag_file:
+        flagged = set(flag_file.read().splitlines())
+    return(regions, flagged)
+
+def main(GENE_BED, GENOME_FASTA, ntWINDOW, DIFF_OUT):
+    '''
+    Compare the outputs of both engines, returns True if they are identical
+    '''
+    gene_annotation = cisRegion.annotationLoad(GENE_BED)
+    scaff_limits    = cisRegion.chromLimitFind(set(gene_annotation), scaffoldLengths(GENOME_FASTA))
+
+    results = {}
+    for engine in ['legacy', 'sweep']:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            try:
+                results[engine] = runEngine(engine, gene_annotation, scaff_limits, ntWINDOW, tmp_dir)
+            except (Exception, SystemExit) as error:
+                print('The ' + engine + ' engine failed on this annotation: ' + repr(error))
+                return(False)
+
+    legacy_regions, legacy_flagged = results['legacy']
+    sweep_regions,  sweep_flagged  = results['sweep']
+
+    legacy_set, sweep_set = set(legacy_regions), set(sweep_regions)
+    only_legacy = [line for line in legacy_regions if line not in sweep_set]
+    only_sweep  = [line for line in sweep_regions  if line not in legacy_set]
+
+    identical = legacy_regions == sweep_regions and legacy_flagged == sweep_flagged
+
+    print('cisRegions.bed')
+    print('\tlegacy regions:\t\t'   + str(len(legacy_regions)))
+    print('\tsweep regions:\t\t'    + str(len(sweep_regions)))
+    print('\tonly in legacy:\t\t'   + str(len(only_legacy)))
+    print('\tonly in sweep:\t\t'    + str(len(only_sweep)))
+    print('\tsame order:\t\t'       + str(legacy_regions == sweep_regions))
+    print('same_strand+start.out')
+    print('\tonly in legacy:\t\t'   + str(len(legacy_flagged - sweep_flagged)))
+    print('\tonly in sweep:\t\t'    + str(len(sweep_flagged - legacy_flagged)))
+    print('\nEngines ' + ('agree' if identical else 'differ'))
+
+    if DIFF_OUT:
+        with open(DIFF_OUT, 'w') as out_file:
+            for line in only_legacy:
+                out_file.write('legacy\tcisRegion\t' + line + '\n')
+            for line in only_sweep:
+                out_file.write('sweep\tcisRegion\t' + line + '\n')
+            for gene in sorted(legacy_flagged - sweep_flagged):
+                out_file.write('legacy\tflagged\t' + gene + '\n')
+            for gene in sorted(sweep_flagged - legacy_flagged):
+                out_file.write('sweep\tflagged\t' + gene + '\n')
+
+    return(identical)
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('BED_in',   type=str, help='path to gene annotation in .BED format')
+parser.add_argument('FASTA_in', type=str, help='path to genome sequences in .FASTA format')
+parser.add_argument('WINDOW',   type=int, help='integer value describing nucleotide length of max cis region to be extracted')
+parser.add_argument('--diff',   type=str, default=None, help='path to write the lines that differ between the engines')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    sys.exit(0 if main(args.BED_in, args.FASTA_in, args.WINDOW, args.diff) else 1)
+
+__author__ = "Will Nash"
+__copyright__ = "Copyright 2020, The Earlham Institute"
+__credits__ = ["Will Nash", "Wilfried Haerty"]
+__license__ = "GPLv3"
+__version__ = "1.0"
+__maintainer__ = "Will Nash"
+__email__ = "will.nash@earlham.ac.uk"
+__status__ = "Testing"
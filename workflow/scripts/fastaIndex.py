@@ -0,0 +1,114 @@
+#!/usr/bin/python
+
+'''
+fastaIndex.py
+
+Reads or builds a samtools style FASTA index (.fai) describing the name,
+length, byte offset and line layout of each sequence in a genome.
+
+The index is built in a single streaming pass that holds no sequence in
+memory, and works on both multi-line and single-line FASTA. Once built it is
+cached next to the genome so later runs only read the (small) index.
+
+Input: genome (.fasta)
+Output: FASTA index (.fasta.fai)
+'''
+
+#import libraries
+import os
+import logging
+import argparse
+
+logger = logging.getLogger('fastaIndex')
+
+
+def faiLoad(FAI_IN):
+    '''
+    Reads a .fai into a dictionary of name: (length, offset, linebases, linewidth)
+    '''
+    fai_dict = {}
+    with open(FAI_IN) as fai_file:
+        for line in fai_file:
+            fields = line.rstrip('\n').split('\t')
+            fai_dict[fields[0]] = tuple(int(x) for x in fields[1:5])
+    return(fai_dict)
+
+def faiBuild(FASTA_IN):
+    '''
+    Streams through a FASTA recording the index entries of each sequence
+    without storing any sequence
+    '''
+    fai_dict = {}
+    name     = None
+    with open(FASTA_IN, 'rb') as seq_file:
+        position = 0
+        for line in seq_file:
+            line_len = len(line)
+            if line[:1] == b'>':
+                name     = line[1:].split()[0].decode()
+                length   = 0
+                offset   = position + line_len
+                linebases, linewidth = 0, 0
+                fai_dict[name] = (length, offset, linebases, linewidth)
+            elif name is not None:
+                bases = len(line.rstrip(b'\r\n'))
+                if bases:
+                    length = length + bases
+                    if linebases == 0:
+                        linebases, linewidth = bases, line_len
+                    fai_dict[name] = (length, offset, linebases, linewidth)
+            position = position + line_len
+    return(fai_dict)
+
+def faiWrite(fai_dict, FAI_OUT):
+    '''
+    Writes the index to disk, via a temporary file so concurrent jobs never
+    read a partial index
+    '''
+    tmp_path = FAI_OUT + '.tmp' + str(os.getpid())
+    with open(tmp_path, 'w') as out_file:
+        for name, entry in fai_dict.items():
+            out_file.write('\t'.join([name] + [str(x) for x in entry]) + '\n')
+    os.replace(tmp_path, FAI_OUT)
+
+def fastaIndex(FASTA_IN):
+    '''
+    Returns the index of a FASTA, reading the cached .fai if it is up to date
+    and otherwise building it and caching it where possible
+    '''
+    fai_path = FASTA_IN + '.fai'
+    if os.path.isfile(fai_path) and os.path.getmtime(fai_path) >= os.path.getmtime(FASTA_IN):
+        return(faiLoad(fai_path))
+
+    fai_dict = faiBuild(FASTA_IN)
+    try:
+        faiWrite(fai_dict, fai_path)
+    except OSError:
+        logger.warning('Could not cache index at ' + fai_path + ' - continuing without it')
+    return(fai_dict)
+
+def scaffoldLengths(FASTA_IN):
+    '''
+    Returns a dictionary of the length of each sequence in a FASTA
+    '''
+    return({name: entry[0] for name, entry in fastaIndex(FASTA_IN).items()})
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('FASTA_in', type=str, help='path to genome sequences in .FASTA format')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    fastaIndex(args.FASTA_in)
+
+__author__ = "Will Nash"
+__copyright__ = "Copyright 2020, The Earlham Institute"
+__credits__ = ["Will Nash", "Wilfried Haerty"]
+__license__ = "GPLv3"
+__version__ = "1.0"
+__maintainer__ = "Will Nash"
+__email__ = "will.nash@earlham.ac.uk"
+__status__ = "Testing"
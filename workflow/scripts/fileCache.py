@@ -0,0 +1,93 @@
+#!/usr/bin/python
+
+'''
+fileCache.py
+
+Caches the result of parsing an input file as a pickle, so reruns load the
+parsed result instead of parsing the file again.
+
+Each cache entry records the size, modification time and content hash of the
+file it was parsed from. An entry whose size and modification time still
+match is used as is. If they differ the file is hashed, and the entry is only
+reparsed if the content has changed.
+'''
+
+#import libraries
+import os
+import pickle
+import hashlib
+
+def fileHash(FILE_IN):
+    '''
+    Returns the sha256 hex digest of the contents of a file
+    '''
+    digest = hashlib.sha256()
+    with open(FILE_IN, 'rb') as in_file:
+        for block in iter(lambda: in_file.read(1 << 20), b''):
+            digest.update(block)
+    return(digest.hexdigest())
+
+def cachePath(SOURCE, NAME, CACHE_DIR):
+    '''
+    Path of the cache entry of the parse NAME of a source file
+    '''
+    source_key = hashlib.sha256(os.path.abspath(SOURCE).encode()).hexdigest()[:16]
+    return(os.path.join(CACHE_DIR, os.path.basename(SOURCE) + '.' + source_key + '.' + NAME + '.pickle'))
+
+def cacheWrite(entry, CACHE_OUT):
+    '''
+    Writes a cache entry via a temporary file, so concurrent jobs never read
+    a partial entry
+    '''
+    tmp_path = CACHE_OUT + '.tmp' + str(os.getpid())
+    with open(tmp_path, 'wb') as out_file:
+        pickle.dump(entry, out_file, protocol = pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, CACHE_OUT)
+
+def cachedParse(SOURCE, PARSER, CACHE_DIR = None):
+    '''
+    Returns PARSER(SOURCE), loading it from the cache in CACHE_DIR when
+    the source is unchanged and caching it otherwise. No cache is used when
+    CACHE_DIR is None
+    '''
+    if CACHE_DIR is None:
+        return(PARSER(SOURCE))
+
+    name       = PARSER.__name__
+    cache_path = cachePath(SOURCE, name, CACHE_DIR)
+    stat       = os.stat(SOURCE)
+    stamp      = (stat.st_size, stat.st_mtime_ns)
+
+    entry = None
+    if os.path.isfile(cache_path):
+        try:
+            with open(cache_path, 'rb') as cache_file:
+                entry = pickle.load(cache_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            entry = None
+
+    if entry is not None and entry['stamp'] == stamp:
+        return(entry['data'])
+
+    content_hash = fileHash(SOURCE)
+    if entry is not None and entry['hash'] == content_hash:
+        data = entry['data']
+    else:
+        data = PARSER(SOURCE)
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok = True)
+        cacheWrite({'stamp': stamp, 'hash': content_hash, 'data': data}, cache_path)
+    except OSError:
+        print('Could not cache ' + name + ' of ' + SOURCE + ' at ' + cache_path + ' - continuing without it')
+
+    return(data)
+
+__author__ = "Will Nash"
+__copyright__ = "Copyright 2020, The Earlham Institute"
+__credits__ = ["Will Nash", "Wilfried Haerty"]
+__license__ = "GPLv3"
+__version__ = "1.0"
+__maintainer__ = "Will Nash"
+__email__ = "will.nash@earlham.ac.uk"
+__status__ = "Testing"
@@ -0,0 +1,111 @@
+#!/usr/bin/python
+
+'''
+gffParse.py
+
+Converts the gene features of a whole genome annotation in .gff or .gff3
+format, as released by NCBI or Ensembl, to the modified .bed used by the
+later EMotEP scripts, in place of annotationPrep.sh.
+
+The annotation, optionally gzip compressed, is streamed once. The attributes
+of each gene are read by key, so NCBI (gene_biotype, ID=gene-) and Ensembl
+(biotype, ID=gene:) annotations are handled alike whatever the order of their
+attributes.
+
+Input: annotation (.gff/.gff3, optionally .gz)
+Output: 6 column .bed with a 7th column of gene names
+'''
+
+#import libraries
+import gzip
+import argparse
+
+# attributes giving the biotype of a gene, and prefixes of gene ids
+BIOTYPE_KEYS = ('biotype', 'gene_biotype')
+ID_PREFIXES  = ('gene-', 'gene:')
+
+#Define custom functions
+def gffOpen(GFF_IN):
+    '''
+    Opens an annotation for text reading, decompressing gzip and bgzip input
+    '''
+    with open(GFF_IN, 'rb') as test_file:
+        magic = test_file.read(2)
+    if magic == b'\x1f\x8b':
+        return(gzip.open(GFF_IN, 'rt'))
+    return(open(GFF_IN, buffering = 1 << 20))
+
+def isGFF(ANNOTATION):
+    '''
+    Whether an annotation path is .gff or .gff3, optionally gzip compressed
+    '''
+    name = ANNOTATION.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    return(name.endswith(('.gff', '.gff3')))
+
+def attributeParse(attributes):
+    '''
+    Parses the key=value pairs of the attribute column of a feature
+    '''
+    return(dict([pair.strip().split('=', 1) for pair in attributes.rstrip(';').split(';') if '=' in pair]))
+
+def geneRecords(GFF_IN, BIOTYPE = 'protein_coding'):
+    '''
+    Yields the chrom, start, stop, id, score, strand and name of each gene of
+    an annotation with the biotype given, with the start made 0 based
+    '''
+    with gffOpen(GFF_IN) as gff_file:
+        for line in gff_file:
+            if line[0] == '#' or not line.strip():
+                continue
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) < 9 or fields[2] != 'gene':
+                continue
+            attributes = attributeParse(fields[8])
+            if BIOTYPE not in [attributes.get(key) for key in BIOTYPE_KEYS]:
+                continue
+            gene_id = attributes.get('ID', '')
+            for prefix in ID_PREFIXES:
+                if gene_id.startswith(prefix):
+                    gene_id = gene_id[len(prefix):]
+                    break
+            yield((fields[0], str(int(fields[3]) - 1), fields[4], gene_id, fields[5], fields[6], attributes.get('Name', gene_id)))
+
+def bedWrite(records, BED_OUT):
+    '''
+    Writes gene records to a .bed, returning the number written
+    '''
+    count = 0
+    with open(BED_OUT, 'w', buffering = 1 << 20) as out_file:
+        for record in records:
+            out_file.write('\t'.join(record) + '\n')
+            count = count + 1
+    return(count)
+
+def main(GFF_IN, BED_OUT = None, BIOTYPE = 'protein_coding'):
+    BED_OUT = BED_OUT or GFF_IN + '.' + BIOTYPE + '.bed'
+    count = bedWrite(geneRecords(GFF_IN, BIOTYPE), BED_OUT)
+    print(str(count) + ' ' + BIOTYPE + ' genes written to ' + BED_OUT)
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('GFF_in',    type=str, help='path to genome annotation in .gff or .gff3 format, optionally gzip compressed')
+parser.add_argument('--out',     type=str, default=None, help='path to write the .bed, GFF_in.<biotype>.bed by default')
+parser.add_argument('--biotype', type=str, default='protein_coding', help='biotype of the genes written')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    main(args.GFF_in, args.out, args.biotype)
+
+__author__ = "Will Nash"
+__copyright__ = "Copyright 2020, The Earlham Institute"
+__credits__ = ["Will Nash", "Wilfried Haerty"]
+__license__ = "GPLv3"
+__version__ = "1.0"
+__maintainer__ = "Will Nash"
+__email__ = "will.nash@earlham.ac.uk"
+__status__ = "Testing"
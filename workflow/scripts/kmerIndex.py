@@ -0,0 +1,285 @@
+#!/usr/bin/python
+
+'''
+kmerIndex.py
+
+Builds a k-mer index of the cis region sequences once, so the motif matches
+of each transcription factor are found by probing the index rather than by
+scanning every sequence again.
+
+The index is a posting list of the positions at which every k-mer starts in
+the concatenated sequences, sorted by k-mer code so the positions of a
+k-mer, or of all the k-mers sharing a prefix, are one slice of a single
+array. The arrays are saved as .npy files and memory mapped when loaded, so
+the jobs scanning each transcription factor share one copy through the page
+cache and none rebuilds it.
+
+A motif is probed at the k columns picking out the fewest positions: only
+k-mers whose score over those columns, plus the best score of the other
+columns, reaches the threshold can start a match, so only their positions
+are scored in full. The reverse strand is probed with the reverse complement
+motif, as motifScan.py scans it, giving the same matches as a scan.
+
+Input: cis region sequences (.fasta), or a genome (.fasta or .2bit) and cis
+       regions (.bed)
+Output: k-mer index (directory of .npy files and index.json)
+'''
+
+#import libraries
+import os
+import json
+import argparse
+
+import numpy as np
+
+from fileCache import fileHash
+from peakMatch import windowCodes
+from motifScan import fastaCodes, regionCodes, sequencesEncode
+
+# length of the k-mers indexed unless given
+DEFAULT_KMER = 8
+
+# bases whose k-mers are coded and placed at once while building
+BUILD_BLOCK = 1 << 24
+
+# candidate sites scored at once
+CANDIDATE_BLOCK = 1 << 22
+
+# arrays of the index, each saved as <name>.npy
+INDEX_ARRAYS = ('offsets', 'positions', 'codes', 'seq_starts')
+
+#Define custom functions
+def kmerCodes(codes, k):
+    '''
+    Code of the k-mer starting at each position of an array of base codes,
+    4 ** k where it holds an N
+    '''
+    kmer_codes = np.full(len(codes), 4 ** k, dtype=np.uint32)
+    for start in range(0, len(codes), BUILD_BLOCK):
+        block_codes, valid = windowCodes(codes[start:start + BUILD_BLOCK + k - 1], k)
+        kmer_codes[start:start + len(block_codes)] = np.where(valid, block_codes, 4 ** k)
+    return(kmer_codes)
+
+def indexBuild(codes, k):
+    '''
+    Builds the posting list of the k-mers of an array of base codes, as the
+    offset of the first position of each k-mer code, and the positions
+    '''
+    n_kmers = 4 ** k
+    kmer_codes = kmerCodes(codes, k)
+    offsets = np.zeros(n_kmers + 1, dtype=np.int64)
+    np.cumsum(np.bincount(kmer_codes, minlength=n_kmers + 1)[:n_kmers], out=offsets[1:])
+
+    # place the positions of each block after those of the blocks before,
+    # so the positions of each k-mer are sorted
+    positions = np.empty(offsets[-1], dtype=np.uint32 if len(codes) < 1 << 32 else np.int64)
+    cursor = offsets[:-1].copy()
+    for start in range(0, len(codes), BUILD_BLOCK):
+        block = kmer_codes[start:start + BUILD_BLOCK]
+        starts = np.flatnonzero(block < n_kmers)
+        block = block[starts]
+        # a stable sort of codes of 16 bits or fewer is a radix sort
+        order = np.argsort(block.astype(np.uint16) if k <= 8 else block, kind='stable')
+        block, starts = block[order], starts[order] + start
+        block_counts = np.bincount(block, minlength=n_kmers)
+        rank = np.arange(len(block)) - (np.cumsum(block_counts) - block_counts)[block]
+        positions[cursor[block] + rank] = starts
+        cursor += block_counts
+    return(offsets, positions)
+
+def indexSource(SEQUENCES_IN, REGIONS_BED = None):
+    '''
+    Content hashes of the inputs an index is built from, telling whether it
+    is out of date
+    '''
+    return({'sequences': fileHash(SEQUENCES_IN), 'regions': fileHash(REGIONS_BED) if REGIONS_BED else None})
+
+class KmerIndex:
+    '''
+    Posting list of the k-mers of a set of sequences, held with the
+    sequences' base codes and starts in the concatenation
+    '''
+    def __init__(self, k, offsets, positions, codes, seq_starts, names):
+        self.k = k
+        self.offsets    = offsets
+        self.positions  = positions
+        self.codes      = codes
+        self.seq_starts = seq_starts
+        self.names      = names
+        self._barriers  = None
+
+    @classmethod
+    def build(cls, names, sequences, k = DEFAULT_KMER):
+        '''
+        Indexes the k-mers of sequences given as arrays of base codes
+        '''
+        codes, seq_starts = sequencesEncode(sequences)
+        return(cls(k, *indexBuild(codes, k), codes, seq_starts, names))
+
+    @classmethod
+    def load(cls, INDEX_DIR):
+        '''
+        Memory maps the arrays of a saved index
+        '''
+        with open(os.path.join(INDEX_DIR, 'index.json')) as index_file:
+            description = json.load(index_file)
+        arrays = [np.load(os.path.join(INDEX_DIR, name + '.npy'), mmap_mode='r') for name in INDEX_ARRAYS]
+        return(cls(description['k'], *arrays, description['names']))
+
+    def save(self, INDEX_DIR, source = None):
+        '''
+        Saves the arrays of the index as .npy files, each via a temporary
+        file, then its description, which marks the index complete
+        '''
+        os.makedirs(INDEX_DIR, exist_ok=True)
+        for name in INDEX_ARRAYS:
+            tmp_path = os.path.join(INDEX_DIR, name + '.tmp' + str(os.getpid()) + '.npy')
+            np.save(tmp_path, getattr(self, name))
+            os.replace(tmp_path, os.path.join(INDEX_DIR, name + '.npy'))
+
+        tmp_path = os.path.join(INDEX_DIR, 'index.json.tmp' + str(os.getpid()))
+        with open(tmp_path, 'w') as index_file:
+            json.dump({'k': self.k, 'source': source, 'names': list(self.names)}, index_file)
+        os.replace(tmp_path, os.path.join(INDEX_DIR, 'index.json'))
+
+    def __len__(self):
+        return(len(self.positions))
+
+    def barriers(self):
+        '''
+        Positions starting a run of N, the separators between sequences
+        included
+        '''
+        if self._barriers is None:
+            is_n = np.asarray(self.codes) == 4
+            self._barriers = np.flatnonzero(is_n & ~np.concatenate([[False], is_n[:-1]]))
+        return(self._barriers)
+
+    def kmerScores(self, scores, column, length):
+        '''
+        Score of every code of length bases over the motif columns from column
+        '''
+        kmer_scores = np.zeros(1, dtype=np.int64)
+        for position in range(column, column + length):
+            kmer_scores = (kmer_scores[:, None] + scores[:4, position]).ravel()
+        return(kmer_scores)
+
+    def probe(self, scores, threshold):
+        '''
+        Chooses the motif columns probed, those picking out the fewest
+        positions, returning the first column, the number of bases probed and
+        the range of k-mer codes of each prefix that can start a match
+        '''
+        width  = scores.shape[1]
+        length = min(self.k, width)
+        best   = scores[:4].max(axis=0)
+        shift  = 2 * (self.k - length)
+        chosen = None
+        for column in range(width - length + 1):
+            rest  = best.sum() - best[column:column + length].sum()
+            codes = np.flatnonzero(self.kmerScores(scores, column, length) + rest >= threshold)
+            lo, hi = codes << shift, (codes + 1) << shift
+            n_sites = int((self.offsets[hi] - self.offsets[lo]).sum())
+            if chosen is None or n_sites < chosen[0]:
+                chosen = (n_sites, column, length, lo, hi)
+        return(chosen[1:])
+
+    def siteScores(self, starts, scores, threshold):
+        '''
+        Keeps the starts of windows scoring at least threshold, returning them
+        with their scores. Columns are added most selective first, dropping
+        windows that cannot reach threshold with the best of the rest
+        '''
+        best    = scores[:4].max(axis=0)
+        columns = np.argsort(scores[:4].min(axis=0) - best, kind='stable')
+        rest    = best[columns[::-1]].cumsum()[::-1].tolist()[1:] + [0]
+        site_scores = np.zeros(len(starts), dtype=np.int64)
+        for column, column_rest in zip(columns, rest):
+            site_scores += scores[self.codes[starts + column], column]
+            keep = site_scores + column_rest >= threshold
+            starts, site_scores = starts[keep], site_scores[keep]
+        return(starts, site_scores)
+
+    def matches(self, scores, threshold):
+        '''
+        Starts and scores of the windows of the sequences scoring at least
+        threshold under a motif score matrix, in order of start
+        '''
+        width = scores.shape[1]
+        column, length, lo, hi = self.probe(scores, threshold)
+        counts = self.offsets[hi] - self.offsets[lo]
+
+        # the positions of the k-mers probed, in blocks bounding their memory
+        candidates = []
+        ends = np.cumsum(counts)
+        block_starts = np.searchsorted(ends, np.arange(0, ends[-1] if len(ends) else 0, CANDIDATE_BLOCK), side='right')
+        for block_start, block_stop in zip(block_starts, list(block_starts[1:]) + [len(counts)]):
+            block_counts = counts[block_start:block_stop]
+            first = np.repeat(np.cumsum(block_counts) - block_counts, block_counts)
+            index = np.repeat(self.offsets[lo[block_start:block_stop]], block_counts) + np.arange(len(first)) - first
+            candidates.append(self.positions[index].astype(np.int64) - column)
+
+        # a motif narrower than k can also match just before an N, where no
+        # k-mer is indexed
+        if length < self.k:
+            candidates.append(np.unique((self.barriers()[:, None] - np.arange(length, self.k)).ravel()))
+
+        starts, site_scores = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+        for block in candidates:
+            block, block_scores = self.siteScores(block[(block >= 0) & (block <= len(self.codes) - width)], scores, threshold)
+            starts.append(block)
+            site_scores.append(block_scores)
+
+        starts, site_scores = np.concatenate(starts), np.concatenate(site_scores)
+        order = np.argsort(starts, kind='stable')
+        return(starts[order], site_scores[order].astype(np.int32))
+
+def indexOpen(INDEX_DIR, SEQUENCES_IN, REGIONS_BED = None, KMER = None):
+    '''
+    Loads the index in INDEX_DIR if it was built from the inputs given, with
+    k KMER where given, and otherwise builds and saves it first
+    '''
+    source = indexSource(SEQUENCES_IN, REGIONS_BED)
+    description_path = os.path.join(INDEX_DIR, 'index.json')
+    if os.path.isfile(description_path):
+        with open(description_path) as index_file:
+            description = json.load(index_file)
+        if description['source'] == source and KMER in (None, description['k']):
+            return(KmerIndex.load(INDEX_DIR))
+
+    if REGIONS_BED:
+        names, sequences = regionCodes(SEQUENCES_IN, REGIONS_BED)
+    else:
+        names, sequences = fastaCodes(SEQUENCES_IN)
+    KmerIndex.build(names, sequences, KMER or DEFAULT_KMER).save(INDEX_DIR, source)
+    return(KmerIndex.load(INDEX_DIR))
+
+def main(SEQUENCES_IN, INDEX_DIR, REGIONS_BED = None, KMER = DEFAULT_KMER):
+    index = indexOpen(INDEX_DIR, SEQUENCES_IN, REGIONS_BED, KMER)
+    print(str(len(index)) + ' ' + str(index.k) + '-mers of ' + str(len(index.names)) + ' sequences indexed in ' + INDEX_DIR)
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('SEQUENCES_in', type=str, help='path to cis region sequences in .FASTA format, or to the genome with --regions')
+parser.add_argument('INDEX_out',    type=str, help='path to the directory the index is written to, left as is if already built from the same inputs')
+parser.add_argument('--regions',    type=str, default=None, help='path to cisRegion annotation in .BED format, indexed directly from the genome given')
+parser.add_argument('--kmer',       type=int, default=DEFAULT_KMER, help='length of the k-mers indexed, 4 to 12')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    if not 4 <= args.kmer <= 12:
+        parser.error('--kmer must be 4 to 12')
+
+    main(args.SEQUENCES_in, args.INDEX_out, args.regions, args.kmer)
+
+__author__ = "Will Nash"
+__copyright__ = "Copyright 2020, The Earlham Institute"
+__credits__ = ["Will Nash", "Wilfried Haerty"]
+__license__ = "GPLv3"
+__version__ = "1.0"
+__maintainer__ = "Will Nash"
+__email__ = "will.nash@earlham.ac.uk"
+__status__ = "Testing"
@@ -0,0 +1,290 @@
+#!/usr/bin/python
+
+'''
+motifScan.py
+
+Scans cis region sequences for matches to JASPAR position frequency
+matrices on both strands, reporting each match with a p-value below the
+threshold given.
+
+Sequences are encoded once as an array of k-mer codes, so each motif is
+scored over every position of every sequence with one array lookup per k
+motif columns. Score thresholds are found from the exact distribution of
+the integer scaled motif scores under the background, as FIMO does, and
+motifs are scanned in parallel.
+
+Given a k-mer index built by kmerIndex.py, each motif is instead matched by
+probing the index for the k-mers that can start a match, and only those
+windows are scored, giving the same matches without scanning every window.
+
+Input: motifs (JASPAR format), cis region sequences (.fasta), or a genome
+       (.fasta or .2bit) and cis regions (.bed)
+Output: motif matches (.tsv)
+'''
+
+#import libraries
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from sequenceExtract import genomeOpen, bedRegions
+from motifThresholds import SCALE, BASE_CODES, jasparParse, motifScores, scoreThreshold, backgroundLoad, thresholdTables
+
+# motif columns looked up together, codes are A, C, G, T and N
+KMER     = 4
+ALPHABET = 5
+KMERS    = ALPHABET ** KMER
+
+# codes of the .2bit alphabet (T, C, A, G, N)
+TWOBIT_CODES = np.array([3, 1, 0, 2, 4], dtype=np.uint8)
+
+# windows scored at once, small enough for the scores to stay in cache
+BLOCK_SIZE = 1 << 15
+
+#Define custom functions
+def reverseScores(scores):
+    '''
+    Score matrix of the reverse complement of a motif
+    '''
+    return(np.vstack([scores[3::-1, ::-1], scores[4:, ::-1]]))
+
+def kmerTable(scores):
+    '''
+    Sums the score matrix over each group of KMER columns, giving a table of
+    the score of every k-mer code for each group
+    '''
+    width  = -(-scores.shape[1] // KMER) * KMER
+    padded = np.zeros((ALPHABET, width), dtype=np.int64)
+    padded[:, :scores.shape[1]] = scores
+
+    kmers = np.arange(KMERS)
+    table = np.zeros((width // KMER, KMERS), dtype=np.int64)
+    for position in range(KMER):
+        base = (kmers // ALPHABET ** (KMER - 1 - position)) % ALPHABET
+        table = table + padded[base, position::KMER].T
+    return(table.astype(np.int32))
+
+def kmerEncode(codes):
+    '''
+    Returns the code of the k-mer starting at each position of an array of
+    base codes
+    '''
+    padded = np.concatenate([codes, np.full(KMER - 1, 4, dtype=np.uint8)]).astype(np.int16)
+    kmers  = np.zeros(len(codes), dtype=np.int16)
+    for position in range(KMER):
+        kmers = kmers * ALPHABET + padded[position:position + len(codes)]
+    return(kmers)
+
+def windowScores(kmers, table, start, stop, scores):
+    '''
+    Scores of the windows starting from start to stop, written into scores
+    '''
+    scores = scores[:stop - start]
+    np.take(table[0], kmers[start:stop], out=scores)
+    for group in range(1, len(table)):
+        scores += table[group].take(kmers[start + group * KMER:stop + group * KMER])
+    return(scores)
+
+def sequencesEncode(sequences):
+    '''
+    Concatenates the code arrays of the sequences, separated by N and padded
+    for the widest motif, returning the codes and the start of each sequence
+    '''
+    starts, position = [], 0
+    for codes in sequences:
+        starts.append(position)
+        position = position + len(codes) + 1
+    joined = np.full(position, 4, dtype=np.uint8)
+    for start, codes in zip(starts, sequences):
+        joined[start:start + len(codes)] = codes
+    return(joined, np.array(starts + [position], dtype=np.int64))
+
+def fastaCodes(FASTA_IN):
+    '''
+    Reads the names and code arrays of the sequences in a .fasta
+    '''
+    names, sequences, lines = [], [], []
+    with open(FASTA_IN, 'rb') as seq_file:
+        for line in list(seq_file) + [b'>']:
+            if line[:1] == b'>':
+                if names:
+                    sequences.append(BASE_CODES[np.frombuffer(b''.join(lines), dtype=np.uint8)])
+                names.append(line[1:].strip().decode())
+                lines = []
+            else:
+                lines.append(line.strip())
+    return(names[:-1], sequences)
+
+def regionCodes(GENOME, REGIONS_BED):
+    '''
+    Slices the code arrays of the regions of a .bed from a genome, reverse
+    complementing those on the negative strand
+    '''
+    names, sequences = [], []
+    with genomeOpen(GENOME) as genome:
+        for scaffold, start, stop, name, strand in bedRegions(REGIONS_BED):
+            if hasattr(genome, 'codes'):
+                codes = TWOBIT_CODES[genome.codes(scaffold, start, stop)]
+            else:
+                codes = BASE_CODES[np.frombuffer(genome.fetch(scaffold, start, stop), dtype=np.uint8)]
+            if strand == '-':
+                codes = np.where(codes < 4, 3 - codes, 4)[::-1].astype(np.uint8)
+            names.append('%s::%s:%d-%d(%s)' % (name, scaffold, start, stop, strand))
+            sequences.append(codes)
+    return(names, sequences)
+
+def scanInit(kmers, seq_starts, background, PVALUE, PSEUDOCOUNT):
+    '''
+    Hold the encoded sequences and scanning settings in each worker
+    '''
+    global scan_state
+    scan_state = (kmers, seq_starts, background, PVALUE, PSEUDOCOUNT)
+
+def probeInit(INDEX_DIR, background, PVALUE, PSEUDOCOUNT):
+    '''
+    Hold the memory mapped k-mer index and scanning settings in each worker
+    '''
+    # imported here as kmerIndex builds on the encoding functions above
+    from kmerIndex import KmerIndex
+    global scan_state
+    scan_state = (KmerIndex.load(INDEX_DIR), background, PVALUE, PSEUDOCOUNT)
+
+def motifScan(motif):
+    '''
+    Scan both strands of every sequence for one motif, given with its
+    precomputed score distribution, returning the window starts, strands,
+    scores and p-values of the matches
+    '''
+    kmers, seq_starts, background, PVALUE, PSEUDOCOUNT = scan_state
+    motif_id, name, counts, low, tail = motif
+
+    scores = motifScores(counts, background, PSEUDOCOUNT)
+    threshold = scoreThreshold(low, tail, PVALUE)
+
+    width = scores.shape[1]
+    n_windows = len(kmers) - (-(-width // KMER) * KMER)
+    hits = []
+    block_scores = np.empty(BLOCK_SIZE, dtype=np.int32)
+    for strand, strand_scores in [('+', scores), ('-', reverseScores(scores))]:
+        table = kmerTable(strand_scores)
+        for block in range(0, max(n_windows, 0), BLOCK_SIZE):
+            window_scores = windowScores(kmers, table, block, min(block + BLOCK_SIZE, n_windows), block_scores)
+            passing = np.flatnonzero(window_scores >= threshold)
+            if len(passing):
+                hits.append((passing + block, strand, window_scores[passing]))
+
+    starts  = np.concatenate([hit[0] for hit in hits]) if hits else np.zeros(0, dtype=np.int64)
+    strands = np.concatenate([np.full(len(hit[0]), hit[1]) for hit in hits]) if hits else np.zeros(0, dtype=str)
+    match_scores = np.concatenate([hit[2] for hit in hits]) if hits else np.zeros(0, dtype=np.int32)
+    pvalues = tail[match_scores - low]
+    return(motif_id, name, width, starts, strands, match_scores, pvalues)
+
+def motifProbe(motif):
+    '''
+    Match one motif on both strands of every sequence through the k-mer
+    index, returning the matches as motifScan does
+    '''
+    index, background, PVALUE, PSEUDOCOUNT = scan_state
+    motif_id, name, counts, low, tail = motif
+
+    scores = motifScores(counts, background, PSEUDOCOUNT)
+    threshold = scoreThreshold(low, tail, PVALUE)
+
+    hits = [index.matches(strand_scores, threshold) + (strand,) for strand, strand_scores in [('+', scores), ('-', reverseScores(scores))]]
+    starts  = np.concatenate([hit[0] for hit in hits])
+    strands = np.concatenate([np.full(len(hit[0]), hit[2]) for hit in hits])
+    match_scores = np.concatenate([hit[1] for hit in hits])
+    pvalues = tail[match_scores - low]
+    return(motif_id, name, scores.shape[1], starts, strands, match_scores, pvalues)
+
+def hitsFormat(names, seq_starts, result):
+    '''
+    Format the matches of a motif as .tsv lines, positions relative to the
+    start of the sequence
+    '''
+    motif_id, name, width, starts, strands, scores, pvalues = result
+    seq_index = np.searchsorted(seq_starts, starts, side='right') - 1
+    return(['%s\t%d\t%d\t%s\t%s\t%s\t%.2f\t%.3g\n' % (names[seq], start - seq_starts[seq], start - seq_starts[seq] + width, strand, motif_id, name, score / SCALE, pvalue)
+            for seq, start, strand, score, pvalue in zip(seq_index, starts, strands, scores, pvalues)])
+
+def main(MOTIFS_IN, SEQUENCES_IN, HITS_OUT, REGIONS_BED = None, PVALUE = 1e-4, PSEUDOCOUNT = 0.1, BACKGROUND = None, THREADS = 1, BACKGROUND_GENOME = None, THRESHOLD_TABLE = None, INDEX = None, INDEX_KMER = None, MOTIF_IDS = None):
+    motifs = jasparParse(MOTIFS_IN)
+    if MOTIF_IDS:
+        motifs = [motif for motif in motifs if motif[0] in MOTIF_IDS or motif[1] in MOTIF_IDS]
+    if BACKGROUND:
+        background = np.array(BACKGROUND, dtype=float)
+    elif BACKGROUND_GENOME:
+        background = backgroundLoad(BACKGROUND_GENOME)
+    else:
+        background = np.full(4, 0.25)
+    background = background / background.sum()
+    # both strands are scanned, so the background is made strand symmetric
+    background = (background + background[::-1]) / 2
+
+    # score distributions of each motif, reused from the table where given
+    thresholds = thresholdTables(motifs, background, PSEUDOCOUNT, THRESHOLD_TABLE)
+    motifs = [(motif_id, name, counts) + tuple(thresholds[motif_id]) for motif_id, name, counts in motifs]
+
+    if INDEX:
+        # probe the index, built first if missing or out of date
+        from kmerIndex import indexOpen
+        index = indexOpen(INDEX, SEQUENCES_IN, REGIONS_BED, INDEX_KMER)
+        names, seq_starts = index.names, np.asarray(index.seq_starts)
+        del index
+        init, scan, settings = probeInit, motifProbe, (INDEX, background, PVALUE, PSEUDOCOUNT)
+    else:
+        # encode every sequence once
+        if REGIONS_BED:
+            names, sequences = regionCodes(SEQUENCES_IN, REGIONS_BED)
+        else:
+            names, sequences = fastaCodes(SEQUENCES_IN)
+        codes, seq_starts = sequencesEncode(sequences)
+        kmers = kmerEncode(np.concatenate([codes, np.full(max([motif[2].shape[1] for motif in motifs] + [0]) + KMER, 4, dtype=np.uint8)]))
+        del sequences
+        init, scan, settings = scanInit, motifScan, (kmers, seq_starts, background, PVALUE, PSEUDOCOUNT)
+
+    with open(HITS_OUT, 'w', buffering = 1 << 20) as out_file:
+        out_file.write('sequence\tstart\tstop\tstrand\tmotif_id\tmotif_name\tscore\tpvalue\n')
+        if THREADS > 1 and len(motifs) > 1:
+            with multiprocessing.Pool(min(THREADS, len(motifs)), init, settings) as pool:
+                for result in pool.imap(scan, motifs):
+                    out_file.write(''.join(hitsFormat(names, seq_starts, result)))
+        else:
+            init(*settings)
+            for motif in motifs:
+                out_file.write(''.join(hitsFormat(names, seq_starts, scan(motif))))
+
+    print(str(len(motifs)) + ' motifs scanned over ' + str(len(names)) + ' sequences')
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('MOTIFS_in',     type=str, help='path to motif matrices in JASPAR format')
+parser.add_argument('SEQUENCES_in',  type=str, help='path to cis region sequences in .FASTA format, or to the genome with --regions')
+parser.add_argument('HITS_out',      type=str, help='path to write the motif matches in .tsv format')
+parser.add_argument('--regions',     type=str, default=None, help='path to cisRegion annotation in .BED format, scanned directly from the genome given')
+parser.add_argument('--pvalue',      type=float, default=1e-4, help='p-value threshold of a match')
+parser.add_argument('--pseudocount', type=float, default=0.1, help='pseudocount added to the motif counts')
+parser.add_argument('--background',  type=float, nargs=4, default=None, metavar=('A', 'C', 'G', 'T'), help='background nucleotide frequencies, uniform by default')
+parser.add_argument('--background-genome', type=str, default=None, help='path to the genome in .FASTA or .2bit format giving the background, cached beside it')
+parser.add_argument('--thresholds',  type=str, default=None, help='path to the threshold table written by motifThresholds.py, reused and updated')
+parser.add_argument('--threads',     type=int, default=1, help='number of processes scanning motifs in parallel')
+parser.add_argument('--index',       type=str, default=None, help='path to the k-mer index directory of kmerIndex.py probed in place of a scan, built there if missing or out of date')
+parser.add_argument('--index-kmer',  type=int, default=None, help='length of the k-mers of the index, that of an existing index or 8 by default')
+parser.add_argument('--motif-ids',   type=str, nargs='+', default=None, help='ids or names of the motifs matched, all by default')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    main(args.MOTIFS_in, args.SEQUENCES_in, args.HITS_out, args.regions, args.pvalue, args.pseudocount, args.background, args.threads, args.background_genome, args.thresholds, args.index, args.index_kmer, args.motif_ids)
+
+__author__ = "Will Nash"
+__copyright__ = "Copyright 2020, The Earlham Institute"
+__credits__ = ["Will Nash", "Wilfried Haerty"]
+__license__ = "GPLv3"
+__version__ = "1.0"
+__maintainer__ = "Will Nash"
+__email__ = "will.nash@earlham.ac.uk"
+__status__ = "Testing"
@@ -0,0 +1,203 @@
+#!/usr/bin/python
+
+'''
+motifThresholds.py
+
+Precomputes the score distribution of each JASPAR motif, from which motif
+scanning converts a p-value cutoff to a score threshold, and the background
+nucleotide composition of a genome.
+
+The score distributions are kept in a table file keyed by the background and
+pseudocount used, with each motif keyed by its id and matrix, so any scan
+with the same settings reuses them and only new or changed motifs are
+computed. The background composition of a genome is cached beside it.
+
+Input: motifs (JASPAR format), optionally genome (.fasta or .2bit)
+Output: threshold table (.pickle), genome background (.background)
+'''
+
+#import libraries
+import os
+import pickle
+import hashlib
+import argparse
+
+import numpy as np
+
+from fileCache import cacheWrite
+from sequenceExtract import genomeOpen
+
+# motif scores are held as integers of 1/SCALE bits, N scoring N_SCORE so no
+# window containing N reaches a threshold
+SCALE   = 100
+N_SCORE = -10 ** 6
+
+# code of each base, A, C, G, T and N
+BASE_CODES = np.full(256, 4, dtype=np.uint8)
+for code, base in enumerate(b'ACGT'):
+    BASE_CODES[base] = code
+    BASE_CODES[base + 32] = code
+
+# bases of a genome counted at once
+COUNT_BLOCK = 1 << 24
+
+#Define custom functions
+def jasparParse(JASPAR_IN):
+    '''
+    Read the motifs of a JASPAR format file into a list of (id, name, counts)
+    with counts an array of 4 rows (A, C, G, T) by motif width
+    '''
+    motifs = []
+    with open(JASPAR_IN) as motif_file:
+        motif_id, name, rows = None, None, []
+        for line in list(motif_file) + ['>']:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('>'):
+                if motif_id is not None:
+                    motifs.append((motif_id, name, np.array(rows, dtype=float)))
+                fields   = line[1:].split()
+                motif_id = fields[0] if fields else None
+                name     = fields[1] if len(fields) > 1 else motif_id
+                rows     = []
+            else:
+                rows.append([float(x) for x in line.replace('[', ' ').replace(']', ' ').split() if x not in 'ACGT'])
+    return(motifs)
+
+def motifScores(counts, background, pseudocount = 0.1):
+    '''
+    Converts a motif's counts to an integer log-odds score matrix of 5 rows
+    (A, C, G, T, N) by motif width, in 1/SCALE bits
+    '''
+    totals = counts.sum(axis=0)
+    freqs  = (counts + pseudocount * background[:, None]) / (totals + pseudocount)
+    scores = np.round(np.log2(freqs / background[:, None]) * SCALE).astype(np.int64)
+    return(np.vstack([scores, np.full(scores.shape[1], N_SCORE)]))
+
+def scoreTail(scores, background):
+    '''
+    Returns the lowest possible score and the probability of each score or
+    higher under the background, by dynamic programming over the columns
+    '''
+    low  = scores[:4].min(axis=0)
+    dist = np.ones(1)
+    for column, column_low in zip(scores[:4].T, low):
+        offsets = column - column_low
+        new = np.zeros(len(dist) + offsets.max())
+        for offset, prob in zip(offsets, background):
+            new[offset:offset + len(dist)] += dist * prob
+        dist = new
+    return(int(low.sum()), np.cumsum(dist[::-1])[::-1])
+
+def scoreThreshold(low, tail, PVALUE):
+    '''
+    Lowest score with a p-value at or below PVALUE
+    '''
+    passing = np.flatnonzero(tail <= PVALUE)
+    return(low + int(passing[0]) if len(passing) else low + len(tail))
+
+def backgroundCount(GENOME):
+    '''
+    Returns the frequency of A, C, G and T in a genome, counted in blocks
+    '''
+    counts = np.zeros(5, dtype=np.int64)
+    with genomeOpen(GENOME) as genome:
+        for chrom, length in genome.lengths().items():
+            for start in range(0, length, COUNT_BLOCK):
+                seq = genome.fetch(chrom, start, start + COUNT_BLOCK)
+                counts += np.bincount(BASE_CODES[np.frombuffer(seq, dtype=np.uint8)], minlength=5)
+    if not counts[:4].sum():
+        return(np.full(4, 0.25))
+    return(counts[:4] / counts[:4].sum())
+
+def backgroundLoad(GENOME):
+    '''
+    Returns the background composition of a genome, reading it from the
+    .background beside the genome if that is up to date and otherwise
+    counting it and caching it there where possible
+    '''
+    background_path = GENOME + '.background'
+    if os.path.isfile(background_path) and os.path.getmtime(background_path) >= os.path.getmtime(GENOME):
+        with open(background_path) as background_file:
+            return(np.array([float(line.split('\t')[1]) for line in background_file]))
+
+    background = backgroundCount(GENOME)
+    tmp_path   = background_path + '.tmp' + str(os.getpid())
+    try:
+        with open(tmp_path, 'w') as out_file:
+            out_file.write(''.join(['%s\t%.8f\n' % (base, freq) for base, freq in zip('ACGT', background)]))
+        os.replace(tmp_path, background_path)
+    except OSError:
+        print('Could not cache background at ' + background_path + ' - continuing without it')
+    return(background)
+
+def thresholdKey(background, PSEUDOCOUNT):
+    '''
+    Key of the score distributions computed with a background and pseudocount
+    '''
+    return('scale=%d;pseudocount=%g;background=%s' % (SCALE, PSEUDOCOUNT, ','.join(['%.6f' % freq for freq in background])))
+
+def thresholdTables(motifs, background, PSEUDOCOUNT, TABLE_PATH = None):
+    '''
+    Returns the lowest score and score tail probabilities of each motif,
+    reusing those in the table at TABLE_PATH computed with the same settings
+    and matrix, and adding any new ones to it
+    '''
+    tables = {}
+    if TABLE_PATH and os.path.isfile(TABLE_PATH):
+        try:
+            with open(TABLE_PATH, 'rb') as table_file:
+                tables = pickle.load(table_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            tables = {}
+    table = tables.setdefault(thresholdKey(background, PSEUDOCOUNT), {})
+
+    thresholds, changed = {}, False
+    for motif_id, name, counts in motifs:
+        digest = hashlib.sha256(counts.tobytes()).hexdigest()
+        if motif_id not in table or table[motif_id][0] != digest:
+            low, tail = scoreTail(motifScores(counts, background, PSEUDOCOUNT), background)
+            table[motif_id] = (digest, low, tail)
+            changed = True
+        thresholds[motif_id] = table[motif_id][1:]
+
+    if TABLE_PATH and changed:
+        try:
+            cacheWrite(tables, TABLE_PATH)
+        except OSError:
+            print('Could not write threshold table at ' + TABLE_PATH + ' - continuing without it')
+    return(thresholds)
+
+def main(MOTIFS_IN, TABLE_OUT, GENOME = None, PSEUDOCOUNT = 0.1):
+    motifs = jasparParse(MOTIFS_IN)
+    background = backgroundLoad(GENOME) if GENOME else np.full(4, 0.25)
+    # both strands are scanned, so the background is made strand symmetric
+    background = (background + background[::-1]) / 2
+
+    thresholdTables(motifs, background, PSEUDOCOUNT, TABLE_OUT)
+
+    print('Score distributions of ' + str(len(motifs)) + ' motifs in ' + TABLE_OUT)
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('MOTIFS_in',     type=str, help='path to motif matrices in JASPAR format')
+parser.add_argument('TABLE_out',     type=str, help='path to the threshold table, updated if it exists')
+parser.add_argument('--genome',      type=str, default=None, help='path to the genome in .FASTA or .2bit format giving the background, uniform otherwise')
+parser.add_argument('--pseudocount', type=float, default=0.1, help='pseudocount added to the motif counts')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    main(args.MOTIFS_in, args.TABLE_out, args.genome, args.pseudocount)
+
+__author__ = "Will Nash"
+__copyright__ = "Copyright 2020, The Earlham Institute"
+__credits__ = ["Will Nash", "Wilfried Haerty"]
+__license__ = "GPLv3"
+__version__ = "1.0"
+__maintainer__ = "Will Nash"
+__email__ = "will.nash@earlham.ac.uk"
+__status__ = "Testing"
@@ -0,0 +1,187 @@
+#!/usr/bin/python
+
+'''
+orthology.py
+
+Loads a table of orthologous genes between the reference and target species
+and joins it with the peaks of each transcription factor near the reference
+genes, the cis regions of the target genes and, optionally, the motif
+matches in them, writing only the gene pairs left to be scanned.
+
+Ortholog tables are read as two columns of gene ids, one per species, with
+comma separated lists of genes expanded to pairs as in OrthoFinder output.
+Each pair is classed one2one, one2many, many2one or many2many from the number
+of orthologs of each gene. All joins are made over whole tables at once.
+
+Input: ortholog table (.tsv), reference peak counts per gene (.tsv, from
+       peakIndex.py), target cis regions (.bed, .bed.gz, .arrow or .parquet),
+       optionally motif matches
+       (.tsv, from motifScan.py)
+Output: gene pairs and transcription factors to scan (.tsv)
+'''
+
+#import libraries
+import argparse
+
+import numpy  as np
+import pandas as pd
+
+from regionTable import regionsRead
+
+HOMOLOGY_TYPES = ['one2one', 'one2many', 'many2one', 'many2many']
+
+#Define custom functions
+def tableColumn(table, COLUMN):
+    '''
+    Selects a column of a table by name, or by position when given as a number
+    '''
+    if str(COLUMN).isdigit():
+        return(table.iloc[:, int(COLUMN)])
+    return(table[COLUMN])
+
+def orthologyLoad(ORTHOLOGY_IN, REF_COLUMN = 0, TARGET_COLUMN = 1):
+    '''
+    Reads the reference and target gene columns of an ortholog table into a
+    DataFrame of gene pairs, each classed by its homology type
+    '''
+    table = pd.read_csv(ORTHOLOGY_IN, sep = '\t', dtype = str)
+    pairs = pd.DataFrame({'ref_gene':    tableColumn(table, REF_COLUMN),
+                          'target_gene': tableColumn(table, TARGET_COLUMN)}).dropna()
+
+    # expand lists of genes in a cell to one pair per gene
+    for column in ['ref_gene', 'target_gene']:
+        pairs[column] = pairs[column].str.split(',')
+        pairs = pairs.explode(column)
+        pairs[column] = pairs[column].str.strip()
+    pairs = pairs[(pairs['ref_gene'] != '') & (pairs['target_gene'] != '')].drop_duplicates(ignore_index = True)
+
+    # class each pair by the number of orthologs of each of its genes
+    ref_many    = pairs.groupby('ref_gene')['target_gene'].transform('size').to_numpy() > 1
+    target_many = pairs.groupby('target_gene')['ref_gene'].transform('size').to_numpy() > 1
+    pairs['homology'] = np.select([~ref_many & ~target_many, ref_many & ~target_many, ~ref_many & target_many],
+                                  HOMOLOGY_TYPES[:3], HOMOLOGY_TYPES[3])
+    return(pairs)
+
+def geneIDs(BED_IN):
+    '''
+    Reads the gene id and gene name columns of a 7 column .bed annotation
+    '''
+    return(pd.read_csv(BED_IN, sep = '\t', header = None, usecols = [3, 6], names = ['gene_id', 'gene_name'], dtype = str))
+
+def idNormalise(genes, gene_ids):
+    '''
+    Converts any gene names in a Series of genes to the gene ids of an
+    annotation, leaving ids and unknown genes as they are
+    '''
+    name_ids = gene_ids.drop_duplicates('gene_name', keep = False).set_index('gene_name')['gene_id']
+    return(genes.where(genes.isin(gene_ids['gene_id']) | ~genes.isin(name_ids.index), genes.map(name_ids)))
+
+class OrthologyMap:
+    '''
+    Ortholog pairs held as a DataFrame for joins, with hashed maps from each
+    reference gene to its target orthologs and back
+    '''
+    def __init__(self, pairs):
+        self.pairs = pairs
+        self.ref_to_target = pairs.groupby('ref_gene', sort = False)['target_gene'].agg(tuple).to_dict()
+        self.target_to_ref = pairs.groupby('target_gene', sort = False)['ref_gene'].agg(tuple).to_dict()
+
+    @classmethod
+    def fromTable(cls, ORTHOLOGY_IN, REF_COLUMN = 0, TARGET_COLUMN = 1, TYPES = HOMOLOGY_TYPES, REF_BED = None, TARGET_BED = None):
+        '''
+        Builds the map from an ortholog table, keeping the homology types
+        given and converting gene names to the ids of the annotations given
+        '''
+        pairs = orthologyLoad(ORTHOLOGY_IN, REF_COLUMN, TARGET_COLUMN)
+        pairs = pairs[pairs['homology'].isin(TYPES)].reset_index(drop = True)
+        if REF_BED:
+            pairs['ref_gene'] = idNormalise(pairs['ref_gene'], geneIDs(REF_BED))
+        if TARGET_BED:
+            pairs['target_gene'] = idNormalise(pairs['target_gene'], geneIDs(TARGET_BED))
+        return(cls(pairs))
+
+    def __len__(self):
+        return(len(self.pairs))
+
+    def targets(self, ref_gene):
+        '''
+        Target orthologs of a reference gene
+        '''
+        return(self.ref_to_target.get(ref_gene, ()))
+
+    def references(self, target_gene):
+        '''
+        Reference orthologs of a target gene
+        '''
+        return(self.target_to_ref.get(target_gene, ()))
+
+def motifCounts(HITS_IN):
+    '''
+    Counts the motif matches of each motif in the cis region of each gene,
+    from the sequence names written by cisRegion.py
+    '''
+    hits = pd.read_csv(HITS_IN, sep = '\t', usecols = ['sequence', 'motif_name'], dtype = str)
+    hits['target_gene'] = hits.pop('sequence').str.split('::', n = 1).str[0]
+    hits['motif_name']  = hits['motif_name'].str.lower()
+    return(hits.groupby(['target_gene', 'motif_name'], sort = False).size().rename('motif_hits').reset_index())
+
+def scanPairs(orthology, peak_counts, cis_regions, motif_counts = None):
+    '''
+    Joins ortholog pairs with the peaks of each transcription factor near the
+    reference gene and the cis region of the target gene, keeping only the
+    pairs with both, along with the motif matches of the factor where given
+    '''
+    pairs = orthology.pairs.merge(peak_counts.rename(columns = {'gene_id': 'ref_gene', 'peaks': 'ref_peaks'}), on = 'ref_gene')
+    pairs = pairs.merge(cis_regions.rename(columns = {'gene_id': 'target_gene', 'start': 'cis_start', 'stop': 'cis_stop'}), on = 'target_gene')
+
+    if motif_counts is not None:
+        pairs['motif_name'] = pairs['tf_gene_name'].str.lower()
+        pairs = pairs.merge(motif_counts, on = ['target_gene', 'motif_name'], how = 'left').drop(columns = 'motif_name')
+        pairs['motif_hits'] = pairs['motif_hits'].fillna(0).astype(np.int64)
+
+    return(pairs.sort_values(['ref_gene', 'target_gene', 'tf_ensembl_id'], kind = 'mergesort', ignore_index = True))
+
+def main(ORTHOLOGY_IN, PEAK_COUNTS, CIS_REGIONS, PAIRS_OUT, MOTIF_HITS = None, REF_COLUMN = 0, TARGET_COLUMN = 1, TYPES = HOMOLOGY_TYPES, REF_BED = None, TARGET_BED = None, MIN_MOTIFS = 0):
+    orthology = OrthologyMap.fromTable(ORTHOLOGY_IN, REF_COLUMN, TARGET_COLUMN, TYPES, REF_BED, TARGET_BED)
+
+    peak_counts  = pd.read_csv(PEAK_COUNTS, sep = '\t', dtype = {'gene_id': str, 'tf_ensembl_id': str, 'tf_gene_name': str, 'peaks': np.int64})
+    cis_regions  = regionsRead(CIS_REGIONS, usecols = [0, 1, 2, 3], names = ['chrom', 'start', 'stop', 'gene_id'],
+                               dtype = {'chrom': str, 'start': np.int64, 'stop': np.int64, 'gene_id': str})
+    motif_counts = motifCounts(MOTIF_HITS) if MOTIF_HITS else None
+
+    pairs = scanPairs(orthology, peak_counts, cis_regions, motif_counts)
+    if motif_counts is not None and MIN_MOTIFS:
+        pairs = pairs[pairs['motif_hits'] >= MIN_MOTIFS]
+    pairs.to_csv(PAIRS_OUT, sep = '\t', index = False)
+
+    print(str(len(pairs)) + ' gene pairs and transcription factors to scan, from ' + str(len(orthology)) + ' ortholog pairs')
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('ORTHOLOGY_in',    type=str, help='path to the ortholog table in .tsv format, with a header')
+parser.add_argument('PEAK_COUNTS_in',  type=str, help='path to the peak counts of the reference cis regions written by peakIndex.py')
+parser.add_argument('CIS_REGIONS_in',  type=str, help='path to the target cisRegion annotation in .BED format, or .bed.gz, .arrow or .parquet')
+parser.add_argument('PAIRS_out',       type=str, help='path to write the gene pairs to scan in .tsv format')
+parser.add_argument('--motif-hits',    type=str, default=None, help='path to the motif matches in the target cis regions written by motifScan.py')
+parser.add_argument('--min-motifs',    type=int, default=0, help='only keep pairs with at least this many matches to the motif of the transcription factor')
+parser.add_argument('--ref-column',    type=str, default='0', help='name or position of the reference gene column of the ortholog table')
+parser.add_argument('--target-column', type=str, default='1', help='name or position of the target gene column of the ortholog table')
+parser.add_argument('--types',         type=str, nargs='+', default=HOMOLOGY_TYPES, choices=HOMOLOGY_TYPES, help='homology types of the pairs kept')
+parser.add_argument('--ref-bed',       type=str, default=None, help='path to the reference annotation in .BED format, to convert gene names in the table to ids')
+parser.add_argument('--target-bed',    type=str, default=None, help='path to the target annotation in .BED format, to convert gene names in the table to ids')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    main(args.ORTHOLOGY_in, args.PEAK_COUNTS_in, args.CIS_REGIONS_in, args.PAIRS_out, args.motif_hits, args.ref_column, args.target_column, args.types, args.ref_bed, args.target_bed, args.min_motifs)
+
+__author__ = "Will Nash"
+__copyright__ = "Copyright 2020, The Earlham Institute"
+__credits__ = ["Will Nash", "Wilfried Haerty"]
+__license__ = "GPLv3"
+__version__ = "1.0"
+__maintainer__ = "Will Nash"
+__email__ = "will.nash@earlham.ac.uk"
+__status__ = "Testing"
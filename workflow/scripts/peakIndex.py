@@ -0,0 +1,161 @@
+#!/usr/bin/python
+
+'''
+peakIndex.py
+
+Indexes the ChIP-seq peaks written by GTRD_parse_bigBed.py and reports the
+peaks of each transcription factor overlapping each cis region written by
+cisRegion.py, in place of one bedtools intersect per transcription factor.
+
+The peaks of every transcription factor are loaded once into per scaffold
+NumPy arrays sorted by start. All cis regions of a scaffold are then queried
+together with binary searches, so the cost grows with the number of overlaps
+rather than the number of peaks times regions.
+
+Input: cis regions (.bed), peaks (.bed, one or more), either also as .bed.gz,
+       .arrow or .parquet
+Output: peak counts per gene and TF (.tsv), optionally every overlap (.tsv,
+        or .tsv.gz, .arrow or .parquet)
+'''
+
+#import libraries
+import argparse
+
+import numpy  as np
+import pandas as pd
+
+from regionTable import regionsRead, regionsWrite
+
+class PeakIndex:
+    '''
+    Peaks of many transcription factors held per scaffold as arrays sorted by
+    start, along with the longest peak of the scaffold to bound the search
+    '''
+    def __init__(self, peaks):
+        # number the (ensembl id, gene name) of each transcription factor
+        tf_codes, tf_index = pd.factorize(pd.MultiIndex.from_frame(peaks[['ensembl_id', 'gene_name']]))
+        self.tfs = list(tf_index)
+
+        self.chroms = {}
+        peaks = peaks.assign(tf = tf_codes)
+        for chrom, chrom_peaks in peaks.groupby('chrom', sort = False):
+            chrom_peaks = chrom_peaks.sort_values('start', kind = 'mergesort')
+            starts = chrom_peaks['start'].to_numpy(dtype = np.int64)
+            stops  = chrom_peaks['stop'].to_numpy(dtype = np.int64)
+            self.chroms[chrom] = (starts, stops, chrom_peaks['tf'].to_numpy(), int((stops - starts).max()))
+
+    @classmethod
+    def fromBED(cls, BED_LIST):
+        '''
+        Builds the index from peak .bed files of chrom, start, stop, Ensembl
+        id and gene name
+        '''
+        peaks = pd.concat([regionsRead(bed, usecols = [0, 1, 2, 3, 4],
+                                       names = ['chrom', 'start', 'stop', 'ensembl_id', 'gene_name'],
+                                       dtype = {'chrom': str, 'start': np.int64, 'stop': np.int64, 'ensembl_id': str, 'gene_name': str})
+                           for bed in BED_LIST], ignore_index = True)
+        return(cls(peaks))
+
+    def __len__(self):
+        return(sum([len(entry[0]) for entry in self.chroms.values()]))
+
+    def overlap(self, chrom, q_starts, q_stops):
+        '''
+        Returns the index of each query and the index of each peak of chrom
+        overlapping it, for arrays of query starts and stops
+        '''
+        if chrom not in self.chroms:
+            return(np.zeros(0, dtype = np.int64), np.zeros(0, dtype = np.int64))
+        starts, stops, _, max_length = self.chroms[chrom]
+
+        # candidate peaks start before the query stops, and after the query
+        # start less the longest peak
+        hi = np.searchsorted(starts, q_stops, side = 'left')
+        lo = np.searchsorted(starts, q_starts - max_length, side = 'right')
+        counts = np.maximum(hi - lo, 0)
+
+        query = np.repeat(np.arange(len(q_starts)), counts)
+        first = np.repeat(np.cumsum(counts) - counts, counts)
+        peak  = lo[query] + np.arange(len(query)) - first
+
+        keep = stops[peak] > q_starts[query]
+        return(query[keep], peak[keep])
+
+def regionsLoad(BED_IN):
+    '''
+    Reads the cis regions of a .bed, or any table written by cisRegion.py,
+    into a DataFrame
+    '''
+    return(regionsRead(BED_IN, usecols = [0, 1, 2, 3],
+                       names = ['chrom', 'start', 'stop', 'gene_id'],
+                       dtype = {'chrom': str, 'start': np.int64, 'stop': np.int64, 'gene_id': str}))
+
+def regionPeaks(regions, peak_index):
+    '''
+    Returns a DataFrame of every peak overlapping each region
+    '''
+    hits = []
+    for chrom, chrom_regions in regions.groupby('chrom', sort = False):
+        query, peak = peak_index.overlap(chrom, chrom_regions['start'].to_numpy(), chrom_regions['stop'].to_numpy())
+        if not len(query):
+            continue
+        starts, stops, tf_codes, _ = peak_index.chroms[chrom]
+        hits.append(pd.DataFrame({'gene_id':    chrom_regions['gene_id'].to_numpy()[query],
+                                  'chrom':      chrom,
+                                  'cis_start':  chrom_regions['start'].to_numpy()[query],
+                                  'cis_stop':   chrom_regions['stop'].to_numpy()[query],
+                                  'tf':         tf_codes[peak],
+                                  'peak_start': starts[peak],
+                                  'peak_stop':  stops[peak]}))
+
+    columns = ['gene_id', 'chrom', 'cis_start', 'cis_stop', 'tf_ensembl_id', 'tf_gene_name', 'peak_start', 'peak_stop']
+    if not hits:
+        return(pd.DataFrame(columns = columns))
+
+    hits = pd.concat(hits, ignore_index = True)
+    tfs  = pd.DataFrame(peak_index.tfs, columns = ['tf_ensembl_id', 'tf_gene_name'])
+    hits = pd.concat([hits, tfs.iloc[hits.pop('tf')].reset_index(drop = True)], axis = 1)
+    return(hits[columns])
+
+def peakCounts(hits):
+    '''
+    Returns the number of peaks of each TF overlapping the cis region of each
+    gene
+    '''
+    return(hits.groupby(['gene_id', 'tf_ensembl_id', 'tf_gene_name'], sort = True).size().rename('peaks').reset_index())
+
+def main(REGIONS_BED, PEAK_BEDS, COUNTS_OUT, HITS_OUT = None):
+    # index the peaks of every transcription factor once
+    peak_index = PeakIndex.fromBED(PEAK_BEDS)
+
+    # query all the cis regions against the index
+    hits = regionPeaks(regionsLoad(REGIONS_BED), peak_index)
+
+    peakCounts(hits).to_csv(COUNTS_OUT, sep = '\t', index = False)
+    if HITS_OUT:
+        regionsWrite(hits, HITS_OUT, HEADER = True, COORDINATES = ('chrom', 'cis_start', 'cis_stop'))
+
+    print(str(len(hits)) + ' overlaps between cis regions and ' + str(len(peak_index)) + ' peaks of ' + str(len(peak_index.tfs)) + ' transcription factors')
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('BED_in',     type=str, help='path to cisRegion annotation in .BED format, or .bed.gz, .arrow or .parquet')
+parser.add_argument('COUNTS_out', type=str, help='path to write the peak counts per gene and transcription factor in .tsv format')
+parser.add_argument('PEAKS_in',   type=str, nargs='+', help='path(s) to peaks in the .BED format written by GTRD_parse_bigBed.py, or .bed.gz, .arrow or .parquet')
+parser.add_argument('--hits',     type=str, default=None, help='path to write the coordinates of every overlapping peak in .tsv format, or .tsv.gz, .arrow or .parquet by extension')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    main(args.BED_in, args.PEAKS_in, args.COUNTS_out, args.hits)
+
+__author__ = "Will Nash"
+__copyright__ = "Copyright 2020, The Earlham Institute"
+__credits__ = ["Will Nash", "Wilfried Haerty"]
+__license__ = "GPLv3"
+__version__ = "1.0"
+__maintainer__ = "Will Nash"
+__email__ = "will.nash@earlham.ac.uk"
+__status__ = "Testing"
@@ -0,0 +1,265 @@
+#!/usr/bin/python
+
+'''
+peakMatch.py
+
+Finds the sequences of the reference ChIP-seq peaks of a transcription
+factor within the cis regions of the target genome, as every k-mer of the
+peaks matched exactly or within a small number of mismatches, on both
+strands.
+
+The distinct k-mers of all the peaks are packed to 2 bit integer codes and
+sorted once, forming the dictionary every cis region is matched against.
+Cis regions are streamed through in batches, the code of every window of a
+batch computed with array operations and looked up in the dictionary with a
+binary search, so a batch is matched in one pass whatever the number of
+peaks. Mismatches are found by seed and extend: a k-mer split into
+mismatches + 1 seeds has at least one seed matching exactly, and each seed
+hit is extended to the whole k-mer and its mismatches counted.
+
+Input: peaks (.bed), reference genome (.fasta or .2bit), cis region
+       sequences (.fasta)
+Output: k-mer matches (.tsv)
+'''
+
+#import libraries
+import argparse
+
+import numpy as np
+
+from sequenceExtract import genomeOpen, bedRegions
+from motifThresholds import BASE_CODES
+
+# bases of cis region sequence matched at once
+BATCH_SIZE = 1 << 23
+
+# seed hits extended at once
+CANDIDATE_BLOCK = 1 << 22
+
+# seeds of up to 12 bases are looked up in a table of every seed code
+TABLE_SIZE = 1 << 24
+
+# alternate bits of a 2 bit code, for counting mismatching bases
+LOW_BITS = np.uint64(0x5555555555555555)
+
+# number of set bits of each byte value
+BYTE_COUNTS = np.array([bin(value).count('1') for value in range(256)], dtype=np.uint8)
+
+#Define custom functions
+def windowCodes(codes, k):
+    '''
+    Returns the 2 bit code of the k-mer starting at each position of an array
+    of base codes (A, C, G, T, N), and whether each k-mer is free of N
+    '''
+    n_windows = max(len(codes) - k + 1, 0)
+    kmer_codes = np.zeros(n_windows, dtype=np.uint64)
+    for position in range(k):
+        kmer_codes = (kmer_codes << np.uint64(2)) | (codes[position:position + n_windows] & 3).astype(np.uint64)
+    n_counts = np.concatenate([[0], np.cumsum(codes == 4)])
+    return(kmer_codes, n_counts[k:k + n_windows] == n_counts[:n_windows])
+
+def mismatchCount(a, b):
+    '''
+    Number of bases differing between arrays of 2 bit k-mer codes
+    '''
+    diff = a ^ b
+    diff = (diff | (diff >> np.uint64(1))) & LOW_BITS
+    return(BYTE_COUNTS[diff.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.int64))
+
+class KmerDictionary:
+    '''
+    Sorted 2 bit codes of the distinct k-mers of a set of sequences, with the
+    number of sequences containing each, and their seeds for mismatches
+    '''
+    def __init__(self, sequences, k, MISMATCHES = 0):
+        self.k = k
+        self.mismatches = MISMATCHES
+        per_sequence = []
+        for codes in sequences:
+            kmer_codes, valid = windowCodes(codes, k)
+            per_sequence.append(np.unique(kmer_codes[valid]))
+        all_codes = np.concatenate(per_sequence) if per_sequence else np.zeros(0, dtype=np.uint64)
+        self.codes, self.counts = np.unique(all_codes, return_counts=True)
+
+        # seeds of seed_length bases at each slot, sorted with the k-mer they
+        # came from, exact matching being a single seed of the whole k-mer
+        self.seed_length = k // (MISMATCHES + 1)
+        self.seeds = []
+        seed_mask = np.uint64((1 << (2 * self.seed_length)) - 1)
+        for slot in range(MISMATCHES + 1):
+            shift = np.uint64(2 * (k - (slot + 1) * self.seed_length))
+            slot_seeds = (self.codes >> shift) & seed_mask
+            order = np.argsort(slot_seeds, kind='stable')
+            slot_seeds = slot_seeds[order]
+            # short seeds are bucketed by code, giving their range without a search
+            if 4 ** self.seed_length <= TABLE_SIZE:
+                buckets = np.zeros(4 ** self.seed_length + 1, dtype=np.int32)
+                np.cumsum(np.bincount(slot_seeds.astype(np.int64), minlength=4 ** self.seed_length), out=buckets[1:])
+            else:
+                buckets = None
+            self.seeds.append((slot_seeds, order, buckets))
+
+    def __len__(self):
+        return(len(self.codes))
+
+    def seedRanges(self, slot, window_seeds):
+        '''
+        Returns the first and last + 1 position among the sorted seeds of a
+        slot of each seed code given
+        '''
+        slot_seeds, _, buckets = self.seeds[slot]
+        if buckets is not None:
+            window_seeds = window_seeds.astype(np.int64)
+            return(buckets[window_seeds], buckets[window_seeds + 1])
+        return(np.searchsorted(slot_seeds, window_seeds, side='left'), np.searchsorted(slot_seeds, window_seeds, side='right'))
+
+    def match(self, codes):
+        '''
+        Returns the start, dictionary index and mismatches of each k-mer of
+        the base codes within the mismatch budget
+        '''
+        kmer_codes, valid = windowCodes(codes, self.k)
+        seed_codes = windowCodes(codes, self.seed_length)[0] if self.mismatches else kmer_codes
+        found = []
+        for slot in range(len(self.seeds)):
+            # windows whose seed at this slot matches the same slot of a k-mer
+            offset = slot * self.seed_length
+            lo, hi = self.seedRanges(slot, seed_codes[offset:offset + len(kmer_codes)])
+            hits = hi - lo
+            hits[~valid] = 0
+            ends = np.cumsum(hits)
+
+            # expand the seed hits in blocks of windows, bounding their memory
+            block_starts = np.searchsorted(ends, np.arange(0, ends[-1] if len(ends) else 0, CANDIDATE_BLOCK), side='right')
+            for block_start, block_stop in zip(block_starts, list(block_starts[1:]) + [len(hits)]):
+                block_hits = hits[block_start:block_stop]
+                starts = np.repeat(np.arange(block_start, block_stop), block_hits)
+                first  = np.repeat(np.cumsum(block_hits) - block_hits, block_hits)
+                index  = self.seeds[slot][1][lo[starts] + np.arange(len(starts)) - first]
+
+                # extend each seed hit to the whole k-mer
+                mismatches = mismatchCount(kmer_codes[starts], self.codes[index])
+                keep = mismatches <= self.mismatches
+                found.append((starts[keep], index[keep], mismatches[keep]))
+
+        if not found:
+            return(np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64))
+        starts, index, mismatches = [np.concatenate(columns) for columns in zip(*found)]
+        if self.mismatches:
+            # k-mers with several matching seeds are reported once
+            unique = np.unique(np.stack([starts, index]), axis=1, return_index=True)[1]
+            starts, index, mismatches = starts[unique], index[unique], mismatches[unique]
+        return(starts, index, mismatches)
+
+    def kmerStrings(self, index):
+        '''
+        Bases of the k-mers at an array of indices of the dictionary
+        '''
+        shifts = np.arange(2 * (self.k - 1), -1, -2, dtype=np.uint64)
+        bases = np.frombuffer(b'ACGT', dtype=np.uint8)[(self.codes[index][:, None] >> shifts) & np.uint64(3)]
+        return(bases.view('S' + str(self.k))[:, 0].astype(str))
+
+def peakSequences(PEAKS_BED, GENOME, TF = None):
+    '''
+    Slices the base codes of each peak of a .bed from the reference genome,
+    only those named TF when given
+    '''
+    with genomeOpen(GENOME) as genome:
+        return([BASE_CODES[np.frombuffer(genome.fetch(scaffold, start, stop), dtype=np.uint8)]
+                for scaffold, start, stop, name, _ in bedRegions(PEAKS_BED) if TF is None or name == TF])
+
+def fastaBatches(FASTA_IN, BATCH_SIZE = BATCH_SIZE):
+    '''
+    Streams the names and base codes of the sequences of a .fasta in batches
+    of around BATCH_SIZE bases
+    '''
+    batch, batch_bases = [], 0
+    name, lines = None, []
+    with open(FASTA_IN, 'rb') as seq_file:
+        for line in seq_file:
+            if line[:1] == b'>':
+                if name is not None:
+                    batch.append((name, BASE_CODES[np.frombuffer(b''.join(lines), dtype=np.uint8)]))
+                    batch_bases = batch_bases + len(batch[-1][1])
+                    if batch_bases >= BATCH_SIZE:
+                        yield(batch)
+                        batch, batch_bases = [], 0
+                name, lines = line[1:].strip().decode(), []
+            else:
+                lines.append(line.strip())
+    if name is not None:
+        batch.append((name, BASE_CODES[np.frombuffer(b''.join(lines), dtype=np.uint8)]))
+    if batch:
+        yield(batch)
+
+def batchMatch(batch, dictionary):
+    '''
+    Matches both strands of a batch of sequences in one pass each, returning
+    .tsv lines of the matches with offsets on the forward strand
+    '''
+    k = dictionary.k
+    seq_starts, position = [], 0
+    for _, codes in batch:
+        seq_starts.append(position)
+        position = position + len(codes) + 1
+    joined = np.full(position, 4, dtype=np.uint8)
+    for start, (_, codes) in zip(seq_starts, batch):
+        joined[start:start + len(codes)] = codes
+    seq_starts = np.array(seq_starts, dtype=np.int64)
+
+    lines = []
+    for strand in ['+', '-']:
+        if strand == '+':
+            starts, index, mismatches = dictionary.match(joined)
+        else:
+            # match the reverse complement, mapping back to forward offsets
+            starts, index, mismatches = dictionary.match(np.where(joined < 4, 3 - joined, 4)[::-1])
+            starts = len(joined) - starts - k
+        seq_index = np.searchsorted(seq_starts, starts, side='right') - 1
+        offsets = starts - seq_starts[seq_index]
+        for seq, offset, kmer, mismatch, peaks in zip(seq_index, offsets, dictionary.kmerStrings(index), mismatches, dictionary.counts[index]):
+            lines.append('%s\t%d\t%d\t%s\t%s\t%d\t%d\n' % (batch[seq][0], offset, offset + k, strand, kmer, mismatch, peaks))
+    return(lines)
+
+def main(PEAKS_BED, GENOME, SEQUENCES_IN, HITS_OUT, KMER = 12, MISMATCHES = 0, TF = None):
+    # build the dictionary of peak k-mers once
+    dictionary = KmerDictionary(peakSequences(PEAKS_BED, GENOME, TF), KMER, MISMATCHES)
+
+    matches = 0
+    with open(HITS_OUT, 'w', buffering = 1 << 20) as out_file:
+        out_file.write('sequence\tstart\tstop\tstrand\tkmer\tmismatches\tpeaks\n')
+        for batch in fastaBatches(SEQUENCES_IN):
+            lines = batchMatch(batch, dictionary)
+            matches = matches + len(lines)
+            out_file.write(''.join(lines))
+
+    print(str(matches) + ' matches to ' + str(len(dictionary)) + ' peak ' + str(KMER) + '-mers')
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('PEAKS_in',     type=str, help='path to the peaks of a transcription factor in .BED format')
+parser.add_argument('GENOME_in',    type=str, help='path to the reference genome in .FASTA or .2bit format')
+parser.add_argument('SEQUENCES_in', type=str, help='path to cis region sequences in .FASTA format')
+parser.add_argument('HITS_out',     type=str, help='path to write the k-mer matches in .tsv format')
+parser.add_argument('--kmer',       type=int, default=12, help='length of the peak k-mers matched, at most 32')
+parser.add_argument('--mismatches', type=int, default=0, help='number of mismatching bases allowed in a match')
+parser.add_argument('--tf',         type=str, default=None, help='Ensembl id of the transcription factor whose peaks are matched, from a merged GTRD .BED')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    if not 0 < args.kmer <= 32 or not 0 <= args.mismatches < args.kmer:
+        parser.error('--kmer must be 1 to 32 and --mismatches less than --kmer')
+
+    main(args.PEAKS_in, args.GENOME_in, args.SEQUENCES_in, args.HITS_out, args.kmer, args.mismatches, args.tf)
+
+__author__ = "Will Nash"
+__copyright__ = "Copyright 2020, The Earlham Institute"
+__credits__ = ["Will Nash", "Wilfried Haerty"]
+__license__ = "GPLv3"
+__version__ = "1.0"
+__maintainer__ = "Will Nash"
+__email__ = "will.nash@earlham.ac.uk"
+__status__ = "Testing"
@@ -0,0 +1,372 @@
+#!/usr/bin/python
+
+'''
+regionTable.py
+
+Reads and writes the region tables passed between EMotEP stages, such as the
+cis regions, the GTRD peaks and the peak hits, in text or columnar formats
+chosen by the file extension:
+
+    .bed, .tsv         plain text, as before
+    .bed.gz, .tsv.gz   bgzip compressed text with a tabix .tbi index, for
+                       tabix, IGV or pysam region queries
+    .arrow, .feather   Arrow IPC, uncompressed so it is memory mapped and read
+                       without copying the coordinate columns
+    .parquet           Parquet, compressed, the smallest on disk
+
+Coordinates are written as 64 bit integers and the chrom and strand columns
+as categoricals (dictionary encoded). The columnar formats need pyarrow,
+which is optional: the text formats are written and read without it.
+
+Run as a script it converts a table from one format to another.
+
+Input: region table (any format above)
+Output: region table (any format above)
+'''
+
+#import libraries
+import os
+import zlib
+import struct
+import argparse
+
+import numpy  as np
+import pandas as pd
+
+try:
+    import pyarrow         as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# formats written by name, and the extension each is written with
+FORMAT_EXTENSIONS = {'bed': '.bed', 'bed.gz': '.bed.gz', 'arrow': '.arrow', 'parquet': '.parquet'}
+
+# names of the columns of a 6 column .bed
+BED_COLUMNS = ['chrom', 'start', 'stop', 'name', 'score', 'strand']
+
+# columns written as categoricals in every format
+CATEGORICAL_COLUMNS = ('chrom', 'strand')
+
+# uncompressed bytes per BGZF block, and the empty block ending a BGZF file
+BGZF_BLOCK = 0xff00
+BGZF_EOF   = bytes.fromhex('1f8b08040000000000ff0600424302001b0003000000000000000000')
+
+# tabix preset of 0 based, half open .bed coordinates, and the pseudo bin
+# holding the span and record count of each scaffold
+TABIX_UCSC = 0x10000
+TABIX_META = 37450
+
+# first bin of each level of the binning scheme, smallest bins first, and
+# the compressed span below which a bin is merged into its parent
+BIN_LEVELS      = (4681, 585, 73, 9, 1)
+MIN_MARKER_DIST = 0x10000
+
+#Define custom functions
+def tableFormat(PATH):
+    '''
+    Format of a table from its extension
+    '''
+    name = PATH.lower()
+    if name.endswith('.parquet'):
+        return('parquet')
+    if name.endswith(('.arrow', '.feather', '.ipc')):
+        return('arrow')
+    if name.endswith('.gz'):
+        return('bed.gz')
+    return('bed')
+
+def arrowRequire(PATH):
+    '''
+    Raises an error naming the table if pyarrow is not installed
+    '''
+    if pa is None:
+        raise ImportError('pyarrow is needed to read and write ' + PATH + ', install it or use the .bed or .bed.gz formats')
+
+def bgzfBlock(data, LEVEL = 6):
+    '''
+    Compresses up to BGZF_BLOCK bytes into one BGZF block, a gzip member whose
+    header records its compressed size
+    '''
+    compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, -15)
+    deflated   = compressor.compress(data) + compressor.flush()
+    header     = struct.pack('<4BI2BH2sHH', 0x1f, 0x8b, 8, 4, 0, 0, 0xff, 6, b'BC', 2, len(deflated) + 25)
+    return(header + deflated + struct.pack('<II', zlib.crc32(data), len(data)))
+
+def bgzfCompress(data, line_ends = None, LEVEL = 6):
+    '''
+    Compresses data to BGZF blocks ended by the EOF block, ending each block
+    at a line end where one falls within it. Returns the compressed bytes and
+    the uncompressed and compressed offset at which each block starts, the
+    last being the EOF block
+    '''
+    line_ends = np.zeros(0, dtype = np.int64) if line_ends is None else line_ends
+    blocks, data_starts, file_starts = [], [], []
+    data_start, file_start = 0, 0
+    while data_start < len(data):
+        data_stop = data_start + BGZF_BLOCK
+        if data_stop < len(data):
+            last_end = np.searchsorted(line_ends, data_stop, side = 'right') - 1
+            if last_end >= 0 and line_ends[last_end] >= data_start:
+                data_stop = int(line_ends[last_end]) + 1
+        block = bgzfBlock(data[data_start:data_stop], LEVEL)
+        blocks.append(block)
+        data_starts.append(data_start)
+        file_starts.append(file_start)
+        data_start, file_start = data_stop, file_start + len(block)
+    data_starts.append(len(data))
+    file_starts.append(file_start)
+    return(b''.join(blocks) + BGZF_EOF, np.array(data_starts, dtype = np.int64), np.array(file_starts, dtype = np.uint64))
+
+def virtualOffsets(positions, data_starts, file_starts):
+    '''
+    BGZF virtual offsets, the compressed offset of the block shifted 16 bits
+    and the offset within the block, of uncompressed positions
+    '''
+    block = np.searchsorted(data_starts, positions, side = 'right') - 1
+    return((file_starts[block] << np.uint64(16)) | (positions - data_starts[block]).astype(np.uint64))
+
+def regionBins(begs, ends):
+    '''
+    The smallest bin of the UCSC binning scheme, as used by tabix, holding
+    each 0 based, half open region
+    '''
+    ends = ends - 1
+    bins = np.zeros(len(begs), dtype = np.int64)
+    done = np.zeros(len(begs), dtype = bool)
+    for shift, first_bin in zip((14, 17, 20, 23, 26), BIN_LEVELS):
+        same = ~done & ((begs >> shift) == (ends >> shift))
+        bins[same] = first_bin + (begs[same] >> shift)
+        done |= same
+    return(bins)
+
+def binsCompress(chunks):
+    '''
+    Compresses the chunks of each bin of a scaffold as htslib does: a bin
+    whose chunks span less than one BGZF block is merged into its parent bin,
+    where that exists, working up from the smallest bins, then the chunks of
+    each bin starting in the block the chunk before ends in are joined
+    '''
+    for level_first in BIN_LEVELS:
+        for bin_id in [bin_id for bin_id in chunks if bin_id >= level_first]:
+            bin_chunks = sorted(chunks[bin_id])
+            parent = (bin_id - 1) >> 3
+            if (bin_chunks[-1][1] >> 16) - (bin_chunks[0][0] >> 16) < MIN_MARKER_DIST and parent in chunks:
+                chunks[parent].extend(chunks.pop(bin_id))
+
+    for bin_id, bin_chunks in chunks.items():
+        merged = []
+        for chunk_beg, chunk_end in sorted(bin_chunks):
+            if merged and merged[-1][1] >> 16 >= chunk_beg >> 16:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], chunk_end))
+            else:
+                merged.append((chunk_beg, chunk_end))
+        chunks[bin_id] = merged
+    return(chunks)
+
+def tabixIndex(chrom_codes, chroms, begs, ends, voff_begs, voff_ends, COLUMNS = (1, 2, 3), SKIP = 0):
+    '''
+    Builds a tabix index of records sorted by scaffold then start, from each
+    record's scaffold code, coordinates and virtual offsets. COLUMNS are the
+    1 based chrom, start and stop columns. Returns the index uncompressed
+    '''
+    ends  = np.maximum(ends, begs + 1)
+    bins  = regionBins(begs, ends)
+    names = b''.join([chrom.encode() + b'\0' for chrom in chroms])
+    index = [b'TBI\1', struct.pack('<8i', len(chroms), TABIX_UCSC, COLUMNS[0], COLUMNS[1], COLUMNS[2], ord('#'), SKIP, len(names)), names]
+
+    ref_bounds = np.searchsorted(chrom_codes, np.arange(len(chroms) + 1))
+    for ref_start, ref_stop in zip(ref_bounds[:-1], ref_bounds[1:]):
+        ref_bins = bins[ref_start:ref_stop]
+        if ref_start == ref_stop:
+            index.append(struct.pack('<2i', 0, 0))
+            continue
+
+        # consecutive records in the same bin share a chunk of the file
+        run_starts = np.flatnonzero(np.concatenate([[True], ref_bins[1:] != ref_bins[:-1]]))
+        run_stops  = np.concatenate([run_starts[1:], [len(ref_bins)]]) - 1
+        chunks = {}
+        for bin_id, chunk_beg, chunk_end in zip(ref_bins[run_starts].tolist(), voff_begs[ref_start + run_starts].tolist(), voff_ends[ref_start + run_stops].tolist()):
+            chunks.setdefault(bin_id, []).append((chunk_beg, chunk_end))
+        chunks = binsCompress(chunks)
+
+        index.append(struct.pack('<i', len(chunks) + 1))
+        for bin_id in sorted(chunks):
+            index.append(struct.pack('<Ii', bin_id, len(chunks[bin_id])) + np.array(chunks[bin_id], dtype = '<u8').tobytes())
+        index.append(struct.pack('<Ii4Q', TABIX_META, 2, voff_begs[ref_start], voff_ends[ref_stop - 1], ref_stop - ref_start, 0))
+
+        # linear index of the first record overlapping each 16kb window, empty
+        # windows taking the offset of the window after
+        firsts  = begs[ref_start:ref_stop] >> 14
+        counts  = ((ends[ref_start:ref_stop] - 1) >> 14) - firsts + 1
+        windows = np.repeat(firsts, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        voffs   = np.repeat(voff_begs[ref_start:ref_stop], counts)
+        linear  = np.full(windows.max() + 1, np.iinfo(np.uint64).max, dtype = np.uint64)
+        np.minimum.at(linear, windows, voffs)
+        linear  = np.minimum.accumulate(linear[::-1])[::-1]
+        index.append(struct.pack('<i', len(linear)) + linear.astype('<u8').tobytes())
+
+    index.append(struct.pack('<Q', 0))
+    return(b''.join(index))
+
+def replaceWrite(data, FILE_OUT):
+    '''
+    Writes bytes via a temporary file renamed over FILE_OUT
+    '''
+    tmp_path = FILE_OUT + '.tmp' + str(os.getpid())
+    with open(tmp_path, 'wb') as out_file:
+        out_file.write(data)
+    os.replace(tmp_path, FILE_OUT)
+
+def categorise(frame):
+    '''
+    Returns a copy of a table with the chrom and strand columns categorical
+    and the coordinate columns 64 bit integers
+    '''
+    frame = frame.copy()
+    for column in frame.columns:
+        if column in CATEGORICAL_COLUMNS:
+            frame[column] = frame[column].astype('category')
+        elif pd.api.types.is_integer_dtype(frame[column]):
+            frame[column] = frame[column].astype(np.int64)
+    return(frame)
+
+def bgzipWrite(frame, TABLE_OUT, HEADER = False, COORDINATES = ('chrom', 'start', 'stop')):
+    '''
+    Writes a table as bgzip compressed text sorted by scaffold, in order of
+    first appearance, then start, along with its tabix index TABLE_OUT.tbi
+    '''
+    chrom, start, stop = COORDINATES
+    chrom_codes, chroms = pd.factorize(frame[chrom].astype(str))
+    order = np.lexsort([frame[start].to_numpy(), chrom_codes])
+    frame = frame.iloc[order]
+
+    data      = frame.to_csv(sep = '\t', header = HEADER, index = False).encode()
+    line_ends = np.flatnonzero(np.frombuffer(data, dtype = np.uint8) == 10)
+    compressed, data_starts, file_starts = bgzfCompress(data, line_ends)
+
+    # records start after the header line, if any
+    skip = 1 if HEADER else 0
+    record_begs = np.concatenate([[0], line_ends[:-1] + 1])[skip:]
+    record_ends = line_ends[skip:] + 1
+    index = tabixIndex(chrom_codes[order], list(chroms), frame[start].to_numpy(dtype = np.int64), frame[stop].to_numpy(dtype = np.int64),
+                       virtualOffsets(record_begs, data_starts, file_starts), virtualOffsets(record_ends, data_starts, file_starts),
+                       [list(frame.columns).index(column) + 1 for column in COORDINATES], skip)
+
+    replaceWrite(compressed, TABLE_OUT)
+    replaceWrite(bgzfCompress(index)[0], TABLE_OUT + '.tbi')
+
+def regionsWrite(frame, TABLE_OUT, HEADER = False, COORDINATES = ('chrom', 'start', 'stop')):
+    '''
+    Writes a table of regions in the format of its extension, via a temporary
+    file so an interrupted run never leaves it partly written. HEADER writes
+    the column names to the text formats, the columnar formats always having
+    them. COORDINATES are the columns indexed by tabix
+    '''
+    table_format = tableFormat(TABLE_OUT)
+    if table_format == 'bed':
+        replaceWrite(frame.to_csv(sep = '\t', header = HEADER, index = False).encode(), TABLE_OUT)
+        return
+    if table_format == 'bed.gz':
+        bgzipWrite(frame, TABLE_OUT, HEADER, COORDINATES)
+        return
+
+    arrowRequire(TABLE_OUT)
+    table    = pa.Table.from_pandas(categorise(frame), preserve_index = False)
+    tmp_path = TABLE_OUT + '.tmp' + str(os.getpid())
+    if table_format == 'parquet':
+        pq.write_table(table, tmp_path)
+    else:
+        with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, TABLE_OUT)
+
+def arrowTable(TABLE_IN, usecols = None):
+    '''
+    Reads the columns at the positions given of a columnar table, memory
+    mapping it so Arrow IPC columns are not copied
+    '''
+    arrowRequire(TABLE_IN)
+    if tableFormat(TABLE_IN) == 'parquet':
+        parquet_file = pq.ParquetFile(TABLE_IN, memory_map = True)
+        names = parquet_file.schema_arrow.names
+        return(parquet_file.read(columns = None if usecols is None else [names[n] for n in usecols]))
+    table = pa.ipc.open_file(pa.memory_map(TABLE_IN)).read_all()
+    return(table if usecols is None else table.select(list(usecols)))
+
+def arrowFrame(table, names = None, dtype = None):
+    '''
+    Converts an Arrow table to a DataFrame, renaming its columns and casting
+    them to the types given as pandas.read_csv would. Integer columns are
+    handed over without a copy where Arrow allows
+    '''
+    frame = table.to_pandas(split_blocks = True)
+    if names is not None:
+        frame.columns = list(names)
+    for column, column_type in (dtype or {}).items():
+        if column_type != 'category':
+            frame[column] = frame[column].astype(column_type, copy = False)
+    return(frame)
+
+def regionsRead(TABLE_IN, usecols = None, names = None, dtype = None, header = None):
+    '''
+    Reads a table of regions in any format into a DataFrame, taking the
+    arguments of pandas.read_csv for the columns kept, their names and types
+    and, for text, the header line
+    '''
+    if tableFormat(TABLE_IN) in ('bed', 'bed.gz'):
+        return(pd.read_csv(TABLE_IN, sep = '\t', header = header, usecols = usecols, names = names, dtype = dtype))
+    return(arrowFrame(arrowTable(TABLE_IN, usecols), names, dtype))
+
+def regionChunks(TABLE_IN, chunksize, usecols = None, names = None, dtype = None, header = None):
+    '''
+    Yields a table of regions in any format as DataFrames of up to chunksize
+    rows, Arrow IPC chunks being slices of the memory mapped file
+    '''
+    table_format = tableFormat(TABLE_IN)
+    if table_format in ('bed', 'bed.gz'):
+        yield from pd.read_csv(TABLE_IN, sep = '\t', header = header, usecols = usecols, names = names, dtype = dtype, chunksize = chunksize)
+        return
+
+    arrowRequire(TABLE_IN)
+    if table_format == 'parquet':
+        parquet_file = pq.ParquetFile(TABLE_IN, memory_map = True)
+        columns = None if usecols is None else [parquet_file.schema_arrow.names[n] for n in usecols]
+        batches = parquet_file.iter_batches(batch_size = chunksize, columns = columns)
+    else:
+        batches = arrowTable(TABLE_IN, usecols).to_batches(max_chunksize = chunksize)
+    for batch in batches:
+        yield(arrowFrame(pa.Table.from_batches([batch]), names, dtype))
+
+def main(TABLE_IN, TABLE_OUT, HEADER = False, NAMES = None):
+    frame = regionsRead(TABLE_IN, header = 0 if HEADER else None)
+    if NAMES:
+        frame.columns = list(NAMES) + list(frame.columns[len(NAMES):])
+    elif not HEADER and tableFormat(TABLE_IN) in ('bed', 'bed.gz'):
+        frame.columns = (BED_COLUMNS + ['column_' + str(n) for n in range(len(BED_COLUMNS), len(frame.columns))])[:len(frame.columns)]
+    regionsWrite(frame, TABLE_OUT, HEADER)
+
+    print(str(len(frame)) + ' regions written to ' + TABLE_OUT)
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('TABLE_in',  type=str, help='path to a region table in .bed, .bed.gz, .arrow or .parquet format')
+parser.add_argument('TABLE_out', type=str, help='path to write the table, in the format of its extension')
+parser.add_argument('--header',  action='store_true', help='the text table has a line of column names, as the .tsv tables do')
+parser.add_argument('--names',   type=str, nargs='+', default=None, help='names of the leading columns of a .bed, chrom start stop name score strand by default')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    main(args.TABLE_in, args.TABLE_out, args.header, args.names)
+
+__author__ = "Will Nash"
+__copyright__ = "Copyright 2020, The Earlham Institute"
+__credits__ = ["Will Nash", "Wilfried Haerty"]
+__license__ = "GPLv3"
+__version__ = "1.0"
+__maintainer__ = "Will Nash"
+__email__ = "will.nash@earlham.ac.uk"
+__status__ = "Testing"
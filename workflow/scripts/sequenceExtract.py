@@ -0,0 +1,151 @@
+#!/usr/bin/python
+
+'''
+sequenceExtract.py
+
+Extracts the sequences of the regions in a .bed from an indexed FASTA or
+packed (.2bit) genome, reverse complementing regions on the negative strand,
+as with bedtools getfasta -s -name.
+
+The genome is memory mapped and each region sliced directly from the mapped
+file using its index, so no sequence is parsed beyond the regions
+requested. Records are streamed to the output as they are extracted.
+
+Input: regions (.bed, or .bed.gz, .arrow or .parquet), genome (.fasta or .2bit)
+Output: region sequences (.fasta)
+'''
+
+#import libraries
+import os
+import mmap
+import argparse
+
+from fastaIndex import fastaIndex
+from regionTable import tableFormat, regionsRead
+
+# complement of the IUPAC nucleotide codes, keeping soft masking
+COMPLEMENT = bytes.maketrans(b'ACGTURYKMSWBDHVNacgturykmswbdhvn',
+                             b'TGCAAYRMKSWVHDBNtgcaayrmkswvhdbn')
+
+def reverseComplement(seq):
+    '''
+    Returns the reverse complement of a sequence held as bytes
+    '''
+    return(seq.translate(COMPLEMENT)[::-1])
+
+class IndexedGenome:
+    '''
+    Read only view of a FASTA through its index and a memory map, slicing
+    regions without loading the genome
+    '''
+    def __init__(self, FASTA_IN):
+        self.fai = fastaIndex(FASTA_IN)
+        self._file = open(FASTA_IN, 'rb')
+        if os.fstat(self._file.fileno()).st_size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access = mmap.ACCESS_READ)
+        else:
+            self._map = b''
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return(False)
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def lengths(self):
+        '''
+        Returns a dictionary of the length of each sequence
+        '''
+        return({name: entry[0] for name, entry in self.fai.items()})
+
+    def fetch(self, chrom, start, stop):
+        '''
+        Returns the bases of chrom from start to stop (0-based, half open)
+        '''
+        length, offset, linebases, linewidth = self.fai[chrom]
+        start, stop = max(0, start), min(stop, length)
+        if stop <= start:
+            return(b'')
+        first = offset + (start // linebases) * linewidth + start % linebases
+        last  = offset + (stop  // linebases) * linewidth + stop  % linebases
+        seq   = self._map[first:last]
+        if linewidth != linebases:
+            seq = seq.replace(b'\n', b'').replace(b'\r', b'')
+        return(seq)
+
+def genomeOpen(GENOME):
+    '''
+    Opens a genome for slicing, packed (.2bit) or as an indexed FASTA
+    '''
+    if GENOME.endswith('.2bit'):
+        # imported here as twoBit builds on IndexedGenome, and needs numpy
+        from twoBit import TwoBitGenome
+        return(TwoBitGenome(GENOME))
+    return(IndexedGenome(GENOME))
+
+def bedRegions(BED_IN):
+    '''
+    Yields the scaffold, start, stop, name and strand of each region in a .bed,
+    or in a table of any format written by regionTable.py
+    '''
+    if tableFormat(BED_IN) != 'bed':
+        regions = regionsRead(BED_IN)
+        names   = [regions.iloc[:, n].astype(str) if n < regions.shape[1] else ['.'] * len(regions) for n in (3, 5)]
+        yield from zip(regions.iloc[:, 0].astype(str), regions.iloc[:, 1].tolist(), regions.iloc[:, 2].tolist(), *names)
+        return
+
+    with open(BED_IN) as bed_file:
+        for line in bed_file:
+            if not line.strip() or line.startswith(('#', 'track', 'browser')):
+                continue
+            fields = line.rstrip('\n').split('\t')
+            name   = fields[3] if len(fields) > 3 else '.'
+            strand = fields[5] if len(fields) > 5 else '.'
+            yield(fields[0], int(fields[1]), int(fields[2]), name, strand)
+
+def fastaWrite(regions, genome, FASTA_OUT):
+    '''
+    Streams the sequence of each (scaffold, start, stop, name, strand) region
+    to a .fasta, headed name::scaffold:start-stop(strand) as bedtools does
+    '''
+    with open(FASTA_OUT, 'wb', buffering = 1 << 20) as out_file:
+        for scaffold, start, stop, name, strand in regions:
+            seq = genome.fetch(scaffold, start, stop)
+            if strand == '-':
+                seq = reverseComplement(seq)
+            header = '>%s::%s:%d-%d(%s)\n' % (name, scaffold, start, stop, strand)
+            out_file.write(header.encode())
+            out_file.write(seq)
+            out_file.write(b'\n')
+
+def main(BED_IN, GENOME, FASTA_OUT):
+    with genomeOpen(GENOME) as genome:
+        fastaWrite(bedRegions(BED_IN), genome, FASTA_OUT)
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('BED_in',    type=str, help='path to regions in .BED format, or .bed.gz, .arrow or .parquet')
+parser.add_argument('GENOME_in', type=str, help='path to genome sequences in .FASTA or packed .2bit format')
+parser.add_argument('FASTA_out', type=str, help='path to write the region sequences in .FASTA format')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    main(args.BED_in, args.GENOME_in, args.FASTA_out)
+
+__author__ = "Will Nash"
+__copyright__ = "Copyright 2020, The Earlham Institute"
+__credits__ = ["Will Nash", "Wilfried Haerty"]
+__license__ = "GPLv3"
+__version__ = "1.0"
+__maintainer__ = "Will Nash"
+__email__ = "will.nash@earlham.ac.uk"
+__status__ = "Testing"
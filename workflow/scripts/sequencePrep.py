@@ -0,0 +1,93 @@
+#!/usr/bin/python
+
+'''
+sequencePrep.py
+
+Converts a multi-line fasta to single line fasta, simplifying each header to
+a single term by splitting on whitespace.
+
+The genome (plain, gzip or bgzip compressed) is streamed in a single pass
+with no intermediate file, and the FASTA index (.fai) of the output is built
+in the same pass.
+
+Input: genome (.fasta or .fasta.gz)
+Output: single line genome (.singleLine.simpleHeader), its index (.fai)
+'''
+
+#import libraries
+import gzip
+import argparse
+
+from fastaIndex import faiWrite
+
+def fastaOpen(FASTA_IN):
+    '''
+    Opens a FASTA for binary reading, decompressing gzip and bgzip input
+    '''
+    with open(FASTA_IN, 'rb') as test_file:
+        magic = test_file.read(2)
+    if magic == b'\x1f\x8b':
+        return(gzip.open(FASTA_IN, 'rb'))
+    return(open(FASTA_IN, 'rb', buffering = 1 << 20))
+
+def faiEntry(length, offset):
+    '''
+    Index entry of a single line sequence, empty sequences having no lines
+    '''
+    return((length, offset, length, length + 1) if length else (0, offset, 0, 0))
+
+def sequencePrep(FASTA_IN, FASTA_OUT):
+    '''
+    Streams a FASTA to single line, simple header FASTA, returning the index
+    entries of the output
+    '''
+    fai_dict = {}
+    name     = None
+    with fastaOpen(FASTA_IN) as seq_file, open(FASTA_OUT, 'wb', buffering = 1 << 22) as out_file:
+        position = 0
+        for line in seq_file:
+            if line[:1] == b'>':
+                if name is not None:
+                    out_file.write(b'\n')
+                    fai_dict[name] = faiEntry(length, offset)
+                    position = position + 1
+                header   = line.split()[0] + b'\n'
+                name     = header[1:-1].decode()
+                length   = 0
+                offset   = position + len(header)
+                position = offset
+                out_file.write(header)
+            else:
+                bases    = line.rstrip(b'\r\n')
+                length   = length + len(bases)
+                position = position + len(bases)
+                out_file.write(bases)
+        out_file.write(b'\n')
+        if name is not None:
+            fai_dict[name] = faiEntry(length, offset)
+    return(fai_dict)
+
+def main(FASTA_IN, FASTA_OUT):
+    fai_dict = sequencePrep(FASTA_IN, FASTA_OUT)
+    faiWrite(fai_dict, FASTA_OUT + '.fai')
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('FASTA_in', type=str, help='path to genome sequences in .FASTA format, optionally gzip or bgzip compressed')
+parser.add_argument('--out',    type=str, default=None, help='path to write the single line .FASTA, defaults to FASTA_in.singleLine.simpleHeader')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    main(args.FASTA_in, args.out or args.FASTA_in + '.singleLine.simpleHeader')
+
+__author__ = "Will Nash"
+__copyright__ = "Copyright 2020, The Earlham Institute"
+__credits__ = ["Will Nash", "Wilfried Haerty"]
+__license__ = "GPLv3"
+__version__ = "1.0"
+__maintainer__ = "Will Nash"
+__email__ = "will.nash@earlham.ac.uk"
+__status__ = "Testing"
@@ -0,0 +1,227 @@
+#!/usr/bin/python
+
+'''
+twoBit.py
+
+Converts a genome to the UCSC .2bit format, packing four bases to a byte
+with the runs of N and of soft masked (lower case) bases held as blocks, and
+reads it back through a memory map.
+
+Opening a .2bit only reads its index, and the packed bases of each scaffold
+are a NumPy view of the mapped file, so regions are sliced without parsing
+or loading the genome and a quarter of the memory of the sequence text.
+
+Input: genome (.fasta)
+Output: packed genome (.2bit)
+'''
+
+#import libraries
+import mmap
+import struct
+import argparse
+
+import numpy as np
+
+from sequenceExtract import IndexedGenome
+
+TWOBIT_SIGNATURE = 0x1A412743
+
+# base held by each 2 bit code, and the code of each base
+BASES = np.frombuffer(b'TCAGN', dtype=np.uint8)
+CODES = np.zeros(256, dtype=np.uint8)
+for code, base in enumerate(b'TCAG'):
+    CODES[base] = code
+    CODES[base + 32] = code
+
+# bases stored as an N block
+IS_N = np.ones(256, dtype=bool)
+IS_N[list(b'ACGTacgt')] = False
+
+def blockRuns(flags):
+    '''
+    Returns the starts and sizes of the runs of True in a boolean array
+    '''
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], flags.view(np.int8), [0]))))
+    return(edges[0::2], edges[1::2] - edges[0::2])
+
+def recordPack(seq):
+    '''
+    Packs the bases of one sequence (bytes) into a .2bit record
+    '''
+    bases = np.frombuffer(seq, dtype=np.uint8)
+    n_starts, n_sizes       = blockRuns(IS_N[bases])
+    mask_starts, mask_sizes = blockRuns(bases >= ord('a'))
+
+    codes = np.zeros(-(-len(bases) // 4) * 4, dtype=np.uint8)
+    codes[:len(bases)] = CODES[bases]
+    codes  = codes.reshape(-1, 4)
+    packed = (codes[:, 0] << 6) | (codes[:, 1] << 4) | (codes[:, 2] << 2) | codes[:, 3]
+
+    return(b''.join([struct.pack('<II', len(bases), len(n_starts)),
+                     n_starts.astype('<u4').tobytes(), n_sizes.astype('<u4').tobytes(),
+                     struct.pack('<I', len(mask_starts)),
+                     mask_starts.astype('<u4').tobytes(), mask_sizes.astype('<u4').tobytes(),
+                     struct.pack('<I', 0),
+                     packed.astype(np.uint8).tobytes()]))
+
+def twoBitWrite(FASTA_IN, TWOBIT_OUT):
+    '''
+    Writes a FASTA to .2bit one scaffold at a time, only ever holding a
+    single scaffold in memory
+    '''
+    with IndexedGenome(FASTA_IN) as genome:
+        names = list(genome.fai)
+        index_size = sum([1 + len(name.encode()) + 8 for name in names])
+
+        with open(TWOBIT_OUT, 'wb') as out_file:
+            # header and index are rewritten once the record offsets are known
+            out_file.write(b'\0' * (16 + index_size))
+            offsets = []
+            for name in names:
+                offsets.append(out_file.tell())
+                out_file.write(recordPack(genome.fetch(name, 0, genome.fai[name][0])))
+
+            version = 0 if out_file.tell() < 1 << 32 else 1
+            out_file.seek(0)
+            out_file.write(struct.pack('<IIII', TWOBIT_SIGNATURE, version, len(names), 0))
+            for name, offset in zip(names, offsets):
+                name_bytes = name.encode()
+                out_file.write(struct.pack('<B', len(name_bytes)) + name_bytes)
+                out_file.write(struct.pack('<Q' if version else '<I', offset))
+            out_file.write(b'\0' * (16 + index_size - out_file.tell()))
+
+class TwoBitGenome:
+    '''
+    Read only view of a .2bit genome through a memory map, with the same
+    interface as sequenceExtract.IndexedGenome
+    '''
+    def __init__(self, TWOBIT_IN):
+        self._file = open(TWOBIT_IN, 'rb')
+        self._map  = mmap.mmap(self._file.fileno(), 0, access = mmap.ACCESS_READ)
+        self._records = {}
+
+        for order in '<>':
+            signature, version, seq_count, _ = struct.unpack_from(order + 'IIII', self._map, 0)
+            if signature == TWOBIT_SIGNATURE:
+                break
+        else:
+            raise ValueError(TWOBIT_IN + ' is not a .2bit file')
+        self._order = order
+
+        self.offsets = {}
+        position = 16
+        for _ in range(seq_count):
+            name_size = self._map[position]
+            name      = self._map[position + 1:position + 1 + name_size].decode()
+            position  = position + 1 + name_size
+            self.offsets[name] = struct.unpack_from(order + ('Q' if version else 'I'), self._map, position)[0]
+            position  = position + (8 if version else 4)
+
+    def __enter__(self):
+        return(self)
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return(False)
+
+    def close(self):
+        self._records.clear()
+        try:
+            self._map.close()
+        except BufferError:
+            # views handed out are still alive, the map closes when they go
+            pass
+        self._file.close()
+
+    def _uint32(self, count, offset):
+        return(np.frombuffer(self._map, dtype=self._order + 'u4', count=count, offset=offset))
+
+    def record(self, chrom):
+        '''
+        Returns the length, N blocks, mask blocks and packed bases of a
+        scaffold, the arrays being views of the mapped file
+        '''
+        if chrom not in self._records:
+            position = self.offsets[chrom]
+            length, n_count = self._uint32(2, position)
+            n_starts = self._uint32(n_count, position + 8)
+            n_sizes  = self._uint32(n_count, position + 8 + 4 * n_count)
+            position = position + 8 + 8 * n_count
+            mask_count  = self._uint32(1, position)[0]
+            mask_starts = self._uint32(mask_count, position + 4)
+            mask_sizes  = self._uint32(mask_count, position + 4 + 4 * mask_count)
+            position = position + 8 + 8 * mask_count
+            packed   = np.frombuffer(self._map, dtype=np.uint8, count=-(-int(length) // 4), offset=position)
+            self._records[chrom] = (int(length), n_starts, n_sizes, mask_starts, mask_sizes, packed)
+        return(self._records[chrom])
+
+    def lengths(self):
+        '''
+        Returns a dictionary of the length of each sequence
+        '''
+        return({name: int(self._uint32(1, offset)[0]) for name, offset in self.offsets.items()})
+
+    def codes(self, chrom, start, stop):
+        '''
+        Returns the bases of chrom from start to stop (0-based, half open) as
+        an array of codes, 0-3 for T, C, A and G and 4 for N
+        '''
+        length, n_starts, n_sizes, _, _, packed = self.record(chrom)
+        start, stop = max(0, start), min(stop, length)
+        if stop <= start:
+            return(np.zeros(0, dtype=np.uint8))
+
+        window   = packed[start // 4:(stop + 3) // 4]
+        unpacked = np.empty((len(window), 4), dtype=np.uint8)
+        unpacked[:, 0] = window >> 6
+        unpacked[:, 1] = (window >> 4) & 3
+        unpacked[:, 2] = (window >> 2) & 3
+        unpacked[:, 3] = window & 3
+        codes = unpacked.reshape(-1)[start % 4:start % 4 + stop - start]
+
+        for block_start, block_stop in blockOverlap(n_starts, n_sizes, start, stop):
+            codes[block_start:block_stop] = 4
+        return(codes)
+
+    def fetch(self, chrom, start, stop):
+        '''
+        Returns the bases of chrom from start to stop (0-based, half open),
+        soft masking restored
+        '''
+        _, _, _, mask_starts, mask_sizes, _ = self.record(chrom)
+        seq = BASES[self.codes(chrom, start, stop)]
+        start = max(0, start)
+        for block_start, block_stop in blockOverlap(mask_starts, mask_sizes, start, start + len(seq)):
+            seq[block_start:block_stop] |= 0x20
+        return(seq.tobytes())
+
+def blockOverlap(block_starts, block_sizes, start, stop):
+    '''
+    Yields the part of each sorted block overlapping start to stop, relative
+    to start
+    '''
+    first = np.searchsorted(block_starts + block_sizes, start, side='right')
+    last  = np.searchsorted(block_starts, stop, side='left')
+    for block_start, block_size in zip(block_starts[first:last], block_sizes[first:last]):
+        yield(max(int(block_start), start) - start, min(int(block_start + block_size), stop) - start)
+
+#Define arguments used in the script
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+
+parser.add_argument('FASTA_in',   type=str, help='path to genome sequences in .FASTA format')
+parser.add_argument('TWOBIT_out', type=str, help='path to write the packed genome in .2bit format')
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    twoBitWrite(args.FASTA_in, args.TWOBIT_out)
+
+__author__ = "Will Nash"
+__copyright__ = "Copyright 2020, The Earlham Institute"
+__credits__ = ["Will Nash", "Wilfried Haerty"]
+__license__ = "GPLv3"
+__version__ = "1.0"
+__maintainer__ = "Will Nash"
+__email__ = "will.nash@earlham.ac.uk"
+__status__ = "Testing"